@@ -61,9 +61,21 @@ def main():
         "--add-data=code/delete_sm_improved.py;.",
         "--add-data=code/detect_polish_text.py;.",
         "--add-data=code/social_media_post.py;.",
+        "--add-data=code/silence_detection.py;.",
         "--add-data=code/transcribe_api.py;.",
+        "--add-data=code/audio_chunking.py;.",
+        "--add-data=code/audio_index.py;.",
+        "--add-data=code/ffmpeg_commands.py;.",
+        "--add-data=code/motion_analysis.py;.",
+        "--add-data=code/transcription_cache.py;.",
+        "--add-data=code/transcription_engines.py;.",
+        "--add-data=code/transcription_profiles.py;.",
+        "--add-data=code/transcription_store.py;.",
         "--add-data=code/transcribe_improved.py;.",
+        "--add-data=code/transcription_worker.py;.",
         "--add-data=code/translate.py;.",
+        "--add-data=code/translation_memory.py;.",
+        "--add-data=code/tts_cache.py;.",
         "--add-data=code/white-bottom-logo.py;.",
             "--hidden-import=tkinter",
             "--hidden-import=tkinter.ttk",
@@ -5,6 +5,8 @@ import json
 from datetime import datetime
 import os
 
+from ffmpeg_commands import FfmpegCommand
+
 def add_intro_outro_fast(video_path, intro_path=None, outro_path=None, output_path=None):
     """
     Szybka wersja dodawania intro/outro używająca bezpośrednio ffmpeg.
@@ -90,38 +92,32 @@ def add_intro_outro_fast(video_path, intro_path=None, outro_path=None, output_pa
         return None
     
     # Buduj komendę ffmpeg z filter_complex
-    cmd = ['ffmpeg']
+    command = FfmpegCommand()
     
     # Dodaj wszystkie pliki wejściowe
     for file_path in input_files:
-        cmd.extend(['-i', file_path])
+        command.add_input(file_path)
     
     # Utwórz filter_complex
-    filter_complex = "".join(filter_inputs) + f"concat=n={len(input_files)}:v=1:a=1[outv][outa]"
+    command.add_filter("".join(filter_inputs) + f"concat=n={len(input_files)}:v=1:a=1[outv][outa]")
     
-    cmd.extend([
-        '-filter_complex', filter_complex,
+    output_args = [
         '-map', '[outv]',
         '-map', '[outa]',
         '-c:v', 'libx264',  # Rekodowanie potrzebne dla filter_complex
         '-c:a', 'aac',
         '-crf', '23',  # Dobra jakość
         '-preset', 'fast',  # Szybkie kodowanie
-        '-avoid_negative_ts', 'make_zero',
-        '-y',  # Nadpisz plik wyjściowy
-        str(output_path)
-    ])
+        '-avoid_negative_ts', 'make_zero'
+    ]
     
     print("Uruchamianie ffmpeg z filter_complex...")
-    print(f"Komenda: {' '.join(cmd)}")
+    print(f"Komenda: {' '.join(command.build(output_path, *output_args))}")
     
     start_time = datetime.now()
     
     # Uruchom ffmpeg
-    result = subprocess.run(cmd, 
-                          capture_output=True, 
-                          text=True, 
-                          cwd=str(video_path.parent))
+    result = command.run(output_path, *output_args, cwd=str(video_path.parent))
     
     end_time = datetime.now()
     duration = (end_time - start_time).total_seconds()
@@ -148,36 +144,31 @@ def add_intro_outro_with_reencoding(files_to_concat, output_path):
     """
     print("Używam metody z rekodowaniem (może trwać dłużej)...")
     
-    # Utwórz input args dla ffmpeg
-    input_args = []
+    command = FfmpegCommand()
     for file_path in files_to_concat:
-        input_args.extend(['-i', file_path])
+        command.add_input(file_path)
     
     # Filter complex do łączenia
     filter_complex = ""
     for i in range(len(files_to_concat)):
         filter_complex += f"[{i}:v][{i}:a]"
     filter_complex += f"concat=n={len(files_to_concat)}:v=1:a=1[outv][outa]"
+    command.add_filter(filter_complex)
     
-    cmd = [
-        'ffmpeg',
-        *input_args,
-        '-filter_complex', filter_complex,
+    output_args = [
         '-map', '[outv]',
         '-map', '[outa]',
         '-c:v', 'libx264',
         '-preset', 'veryfast',
         '-crf', '23',
         '-c:a', 'aac',
-        '-movflags', '+faststart',
-        '-y',
-        str(output_path)
+        '-movflags', '+faststart'
     ]
     
-    print(f"Komenda rekodowania: {' '.join(cmd)}")
+    print(f"Komenda rekodowania: {' '.join(command.build(output_path, *output_args))}")
     
     start_time = datetime.now()
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    result = command.run(output_path, *output_args)
     end_time = datetime.now()
     duration = (end_time - start_time).total_seconds()
     
@@ -0,0 +1,104 @@
+import subprocess
+
+import numpy as np
+
+# Wspólne narzędzia do dekodowania audio przez ffmpeg i cięcia go w miejscach ciszy.
+# Bez zależności od Whisper, więc mogą z nich korzystać też skrypty API.
+SAMPLE_RATE = 16000                 # Whisper i API OpenAI pracują na 16kHz mono
+PIPE_BLOCK_SECONDS = 30             # Ile sekund PCM czytamy z pipe ffmpeg na raz
+SPLIT_WINDOW = 0.1                  # Okno RMS przy szukaniu ciszy do cięcia (s)
+SPLIT_SEARCH_SECONDS = 30.0         # Jak daleko od docelowej granicy chunka szukamy ciszy (s)
+
+def probe_duration(path):
+    """Zwraca długość pliku w sekundach według ffprobe (0.0 jeśli nie da się jej odczytać)."""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        str(path)
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        return float(result.stdout.strip())
+    except (OSError, ValueError):
+        return 0.0
+
+def decode_audio_samples(path, sample_rate=SAMPLE_RATE, duration=None):
+    """
+    Dekoduje audio przez ffmpeg (s16le, mono) prosto do tablicy float32 w zakresie [-1, 1].
+    Bufor jest alokowany raz na podstawie długości z ffprobe i wypełniany blokami z pipe.
+    duration - znana (lub szacowana) długość w sekundach; pomija wywołanie ffprobe.
+    Przy błędzie ffmpeg rzuca RuntimeError.
+    """
+    if duration is None:
+        duration = probe_duration(path)
+    samples = np.empty(int(duration * sample_rate) + sample_rate, dtype=np.float32)
+    cmd = [
+        'ffmpeg', '-loglevel', 'error',
+        '-i', str(path),
+        '-vn',
+        '-f', 's16le',
+        '-acodec', 'pcm_s16le',  # 16-bit PCM
+        '-ac', '1',              # Mono
+        '-ar', str(sample_rate),
+        'pipe:1'
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    filled = 0
+    block_bytes = sample_rate * PIPE_BLOCK_SECONDS * 2
+    while True:
+        block = process.stdout.read(block_bytes)
+        if not block:
+            break
+        pcm = np.frombuffer(block, dtype=np.int16)
+        if filled + len(pcm) > len(samples):
+            samples = np.resize(samples, max(len(samples) * 2, filled + len(pcm)))
+        chunk = samples[filled:filled + len(pcm)]
+        chunk[:] = pcm
+        chunk *= 1.0 / 32768.0
+        filled += len(pcm)
+
+    stderr = process.stderr.read()
+    process.wait()
+    if process.returncode != 0:
+        raise RuntimeError(stderr.decode('utf-8', errors='replace'))
+
+    return samples[:filled]
+
+def find_silence_split_points(samples, chunk_seconds, sample_rate=SAMPLE_RATE, max_seconds=None):
+    """
+    Wyznacza punkty cięcia (w sekundach) co ok. chunk_seconds.
+    Każdy punkt leży w najcichszym miejscu (wygładzone RMS) w pobliżu docelowej granicy,
+    żeby nie przecinać słów. max_seconds to opcjonalny twardy limit długości kawałka
+    (np. wynikający z limitu rozmiaru uploadu).
+    """
+    window = int(sample_rate * SPLIT_WINDOW)
+    n_windows = len(samples) // window
+    if n_windows == 0:
+        return []
+
+    rms = np.sqrt(np.mean(samples[:n_windows * window].reshape(n_windows, window) ** 2, axis=1))
+    # Wygładzenie ~0.5s, żeby preferować dłuższe pauzy zamiast pojedynczych cichych okien
+    rms = np.convolve(rms, np.ones(5) / 5, mode='same')
+
+    total_seconds = len(samples) / sample_rate
+    # Nie tniemy, jeśli ostatni kawałek byłby krótszy niż pół chunka (chyba że wymaga tego limit)
+    longest = min(max_seconds, chunk_seconds * 1.5) if max_seconds else chunk_seconds * 1.5
+    split_points = []
+    position = 0.0
+    while total_seconds - position > longest:
+        target = position + chunk_seconds
+        low = max(int((target - SPLIT_SEARCH_SECONDS) / SPLIT_WINDOW), int(position / SPLIT_WINDOW) + 1)
+        high = min(int((target + SPLIT_SEARCH_SECONDS) / SPLIT_WINDOW), n_windows)
+        if max_seconds:
+            high = min(high, int((position + max_seconds) / SPLIT_WINDOW))
+
+        if high > low:
+            quietest = low + int(np.argmin(rms[low:high]))
+            position = (quietest + 0.5) * SPLIT_WINDOW
+        else:
+            position = min(target, position + longest)
+        split_points.append(position)
+
+    return split_points
@@ -0,0 +1,182 @@
+import argparse
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from audio_chunking import probe_duration
+
+# Indeks długości wygenerowanych nagrań (generated/<nazwa>/durations.json).
+# generate.py zapisuje długość każdego output_audio_{i}.mp3 zaraz po syntezie, a skrypty
+# overlay czytają cały indeks jednym odczytem zamiast otwierać każdy plik przez
+# AudioFileClip/ffprobe (proces ffmpeg na zdanie). Wpis jest ważny tylko dla pliku
+# o tym samym rozmiarze i mtime; brakujące lub nieaktualne długości liczymy
+# z nagłówków ramek MP3 (bez procesu), a dopiero w ostateczności przez ffprobe.
+INDEX_NAME = 'durations.json'
+FORMAT_VERSION = 1
+
+# Tabele nagłówka MPEG Audio Layer III
+BITRATES_KBPS = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+}
+SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 2.5: (11025, 12000, 8000)}
+MPEG_VERSIONS = {0: 2.5, 2: 2, 3: 1}
+
+def log(message):
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+def _parse_frame_header(data, pos):
+    """Zwraca (długość ramki, próbki na ramkę, sample rate, kanały) albo None, jeśli pod pos nie ma ramki Layer III."""
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+    version = MPEG_VERSIONS.get((data[pos + 1] >> 3) & 0x03)
+    layer = (data[pos + 1] >> 1) & 0x03
+    bitrate_index = data[pos + 2] >> 4
+    rate_index = (data[pos + 2] >> 2) & 0x03
+    if version is None or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = BITRATES_KBPS[1 if version == 1 else 2][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][rate_index]
+    padding = (data[pos + 2] >> 1) & 0x01
+    channels = 1 if (data[pos + 3] >> 6) == 3 else 2
+    samples = 1152 if version == 1 else 576
+    frame_length = samples // 8 * bitrate // sample_rate + padding
+    return frame_length, samples, sample_rate, channels
+
+def mp3_duration(path):
+    """
+    Liczy długość MP3 z nagłówków: licznik ramek z nagłówka Xing/Info (VBR i LAME CBR),
+    a bez niego suma ramek - ta sama wartość co "Duration" z ffmpeg, czyli AudioFileClip.duration.
+    Zwraca None, gdy plik nie wygląda na MP3 Layer III.
+    """
+    data = Path(path).read_bytes()
+    pos = 0
+    if data[:3] == b'ID3' and len(data) >= 10:
+        # Rozmiar tagu ID3v2 to 4 bajty po 7 bitów
+        pos = 10 + ((data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F))
+
+    # Pierwsza ramka: synchronizujemy się tylko na nagłówku, po którym jest kolejny nagłówek
+    first = None
+    while pos < len(data) - 4:
+        header = _parse_frame_header(data, pos)
+        if header and (pos + header[0] >= len(data) or _parse_frame_header(data, pos + header[0])):
+            first = header
+            break
+        pos += 1
+    if first is None:
+        return None
+
+    frame_length, samples, sample_rate, channels = first
+    side_info = (32 if channels == 2 else 17) if samples == 1152 else (17 if channels == 2 else 9)
+    tag_pos = pos + 4 + side_info
+    if data[tag_pos:tag_pos + 4] in (b'Xing', b'Info'):
+        flags = int.from_bytes(data[tag_pos + 4:tag_pos + 8], 'big')
+        if flags & 0x01:
+            frames = int.from_bytes(data[tag_pos + 8:tag_pos + 12], 'big')
+            return frames * samples / sample_rate
+        pos += frame_length  # Ramka Xing bez licznika nie zawiera dźwięku
+
+    total_samples = 0
+    while True:
+        header = _parse_frame_header(data, pos)
+        if header is None:
+            break
+        total_samples += header[1]
+        pos += header[0]
+    return total_samples / sample_rate
+
+class DurationIndex:
+    """Długości plików audio jednego katalogu; bezpieczny dla wątków generate.py."""
+
+    def __init__(self, audio_dir):
+        self.path = Path(audio_dir) / INDEX_NAME
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == FORMAT_VERSION:
+                self.entries = data.get('files', {})
+        except (OSError, ValueError):
+            pass
+
+    def get(self, audio_path):
+        """Zwraca zapisaną długość albo None, jeśli wpisu nie ma lub plik się zmienił."""
+        audio_path = Path(audio_path)
+        entry = self.entries.get(audio_path.name)
+        if entry is None:
+            return None
+        try:
+            stat = audio_path.stat()
+        except OSError:
+            return None
+        if entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+            return None
+        return entry['duration']
+
+    def record(self, audio_path, duration=None):
+        """Zapisuje długość pliku (liczoną z nagłówków MP3, jeśli nie podano) i ją zwraca."""
+        audio_path = Path(audio_path)
+        if duration is None:
+            duration = mp3_duration(audio_path)
+        if duration is None:
+            duration = probe_duration(audio_path)
+        stat = audio_path.stat()
+        with self.lock:
+            self.entries[audio_path.name] = {
+                'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'duration': round(duration, 6)
+            }
+            self.dirty = True
+        return duration
+
+    def durations(self, audio_paths):
+        """Długości wszystkich plików; nieznane są liczone i dopisywane do indeksu."""
+        result = []
+        for audio_path in audio_paths:
+            duration = self.get(audio_path)
+            result.append(duration if duration is not None else self.record(audio_path))
+        return result
+
+    def save(self):
+        """Zapisuje indeks atomowo (plik tymczasowy + rename), jeśli coś się zmieniło."""
+        with self.lock:
+            if not self.dirty:
+                return
+            tmp_path = self.path.with_name(f"{INDEX_NAME}.{os.getpid()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': FORMAT_VERSION, 'files': self.entries}, f, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+
+def read_durations(audio_paths, audio_dir):
+    """Długości plików z indeksu audio_dir; uzupełnia i zapisuje indeks, gdy czegoś brakowało."""
+    index = DurationIndex(audio_dir)
+    durations = index.durations(audio_paths)
+    try:
+        index.save()
+    except OSError as e:
+        log(f"Warning: could not save duration index: {e}")
+    return durations
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect the audio duration index of a generated folder.")
+    parser.add_argument("command", choices=["build", "show"],
+                        help="build - index all output_audio_*.mp3 files, show - print stored durations")
+    parser.add_argument("audio_dir", help="Folder with output_audio_{i}.mp3 files")
+    args = parser.parse_args()
+
+    audio_dir = Path(args.audio_dir)
+    if args.command == "build":
+        audio_paths = sorted(audio_dir.glob('output_audio_*.mp3'))
+        durations = read_durations(audio_paths, audio_dir)
+        log(f"{audio_dir / INDEX_NAME}: {len(durations)} files, {sum(durations):.1f}s of audio")
+    else:
+        index = DurationIndex(audio_dir)
+        for name, entry in sorted(index.entries.items()):
+            log(f"{name}: {entry['duration']:.3f}s")
+
+if __name__ == "__main__":
+    main()
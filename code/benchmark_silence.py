@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from audio_chunking import probe_duration
+from silence_detection import iter_silent_ranges_with
+
+# Benchmark silników wykrywania ciszy (delete_sm.py / delete_sm_fast.py) na nagraniach fixture.
+# Punkt odniesienia to dotychczasowa ścieżka pydub (WAV 22kHz mono + detect_silence);
+# dla każdego silnika mierzymy czas, szczytowe RSS i zgodność wykrytych zakresów ciszy.
+# Fixture'y: syntetyczne nagrania z benchmark_fixtures/silence (make-fixtures, bez API)
+# oraz nagrania mowy z benchmark_fixtures/transcription, jeśli zostały wygenerowane.
+FIXTURES_DIR = Path(__file__).resolve().parent / 'benchmark_fixtures' / 'silence'
+TRANSCRIPTION_FIXTURES_DIR = Path(__file__).resolve().parent / 'benchmark_fixtures' / 'transcription'
+BENCHMARK_ENGINES = ('pydub', 'rms', 'silencedetect')
+RESULT_MARKER = 'BENCHMARK_RESULT '
+FIXTURE_SAMPLE_RATE = 44100
+
+# Syntetyczne wykłady: "mowa" to szum modulowany sylabami, pauzy mają szum tła o podanym poziomie.
+# Tło -46 dBFS leży tuż pod progiem -40 dB w RMS, ale pojedyncze próbki szumu go przekraczają.
+SYNTHETIC_FIXTURES = {
+    'cisza_studio': {'noise_floor_db': -70, 'seed': 1},
+    'cisza_sala': {'noise_floor_db': -52, 'seed': 2},
+    'cisza_szum_przy_progu': {'noise_floor_db': -46, 'seed': 3},
+}
+
+def log(message):
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+def peak_rss_bytes():
+    """Szczytowe zużycie pamięci bieżącego procesu (Windows: peak working set)."""
+    if os.name == 'nt':
+        import psutil
+        return psutil.Process().memory_info().peak_wset
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Linux podaje KiB
+
+def make_fixtures(fixtures_dir, minutes, overwrite):
+    """Zapisuje syntetyczne nagrania: akapity "mowy" przeplatane pauzami 0.3-8 s z szumem tła."""
+    fixtures_dir = Path(fixtures_dir)
+    fixtures_dir.mkdir(parents=True, exist_ok=True)
+    for name, params in SYNTHETIC_FIXTURES.items():
+        audio_path = fixtures_dir / f"{name}.wav"
+        if audio_path.exists() and not overwrite:
+            log(f"Skipping {audio_path.name} (already exists)")
+            continue
+
+        rng = np.random.default_rng(params['seed'])
+        total = int(minutes * 60 * FIXTURE_SAMPLE_RATE)
+        floor = 10 ** (params['noise_floor_db'] / 20)
+        samples = rng.normal(0.0, floor, total).astype(np.float32)
+        position = 0
+        while position < total:
+            speech = int(rng.uniform(2.0, 15.0) * FIXTURE_SAMPLE_RATE)
+            t = np.arange(min(speech, total - position)) / FIXTURE_SAMPLE_RATE
+            envelope = 0.1 * np.abs(np.sin(2 * np.pi * rng.uniform(2.5, 5.0) * t)) ** 0.5
+            samples[position:position + len(t)] += rng.normal(0.0, 1.0, len(t)) * envelope
+            position += speech + int(rng.uniform(0.3, 8.0) * FIXTURE_SAMPLE_RATE)
+
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+        with wave.open(str(audio_path), 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(FIXTURE_SAMPLE_RATE)
+            f.writeframes(pcm.tobytes())
+        log(f"Fixture written: {audio_path} (noise floor {params['noise_floor_db']} dBFS)")
+
+def list_fixtures(fixtures_dirs):
+    return [path for fixtures_dir in fixtures_dirs for path in sorted(Path(fixtures_dir).glob('*.wav'))]
+
+def pydub_ranges(path, min_silence_len, silence_thresh):
+    """Dotychczasowa ścieżka delete_sm_fast: WAV 22kHz mono na dysk, AudioSegment, detect_silence."""
+    from pydub import AudioSegment
+    from pydub.silence import detect_silence
+
+    with tempfile.TemporaryDirectory(prefix='silence_') as temp_dir:
+        wav_path = os.path.join(temp_dir, 'audio.wav')
+        cmd = ['ffmpeg', '-loglevel', 'error', '-i', str(path), '-vn', '-acodec', 'pcm_s16le',
+               '-ar', '22050', '-ac', '1', '-y', wav_path]
+        subprocess.run(cmd, check=True, capture_output=True)
+        audio = AudioSegment.from_file(wav_path)
+        return detect_silence(audio, min_silence_len=min_silence_len, silence_thresh=silence_thresh)
+
+def measure_engine(engine, path, min_silence_len, silence_thresh):
+    """Uruchamiane w osobnym procesie: jeden silnik na jednym pliku."""
+    start_time = time.time()
+    if engine == 'pydub':
+        ranges = pydub_ranges(path, min_silence_len, silence_thresh)
+    else:
+        ranges = list(iter_silent_ranges_with(engine, path, min_silence_len, silence_thresh))
+    print(RESULT_MARKER + json.dumps({
+        'engine': engine,
+        'seconds': time.time() - start_time,
+        'peak_rss': peak_rss_bytes(),
+        'ranges': [[float(start), float(end)] for start, end in ranges]
+    }), flush=True)
+
+def compare_ranges(reference, candidate):
+    """
+    Zgodność zakresów (w ms): Jaccard czasu ciszy, zakresy referencji bez odpowiednika (missed),
+    zakresy nadmiarowe (extra) i średni błąd granic dla par o największym pokryciu.
+    """
+    def overlap(a, b):
+        return max(0.0, min(a[1], b[1]) - max(a[0], b[0]))
+
+    intersection = sum(overlap(a, b) for a in reference for b in candidate)
+    union = sum(end - start for start, end in reference) + sum(end - start for start, end in candidate) - intersection
+    errors = []
+    missed = 0
+    for ref in reference:
+        best = max(candidate, key=lambda c: overlap(ref, c), default=None)
+        if best is None or overlap(ref, best) == 0:
+            missed += 1
+            continue
+        errors.extend([abs(ref[0] - best[0]), abs(ref[1] - best[1])])
+    extra = sum(1 for c in candidate if not any(overlap(ref, c) > 0 for ref in reference))
+    return {
+        'jaccard': intersection / union if union else 1.0,
+        'missed': missed,
+        'extra': extra,
+        'boundary_error_ms': sum(errors) / len(errors) if errors else 0.0
+    }
+
+def run_benchmark(paths, engines, min_silence_len, silence_thresh, json_path=None):
+    if not paths:
+        log("Error: no fixture audio found - run 'make-fixtures' first or pass files with --files")
+        return False
+    log(f"Benchmarking {len(engines)} engines on {len(paths)} files "
+        f"(min silence {min_silence_len} ms, threshold {silence_thresh} dB)")
+
+    results = []
+    ok = True
+    for path in paths:
+        audio_seconds = probe_duration(path)
+        measured = {}
+        for engine in engines:
+            # Osobny proces na pomiar - szczytowe RSS nie miesza się między silnikami
+            cmd = [sys.executable, str(Path(__file__).resolve()), '_measure', '--engine', engine,
+                   '--min_silence_len', str(min_silence_len), '--silence_thresh', str(silence_thresh), str(path)]
+            process = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
+            lines = [line for line in process.stdout.splitlines() if line.startswith(RESULT_MARKER)]
+            if process.returncode != 0 or not lines:
+                log(f"[BLAD] {engine} on {Path(path).name} failed:\n{process.stderr[-2000:]}")
+                ok = False
+                continue
+            measured[engine] = json.loads(lines[-1][len(RESULT_MARKER):])
+
+        # Odniesienie: pydub, a gdy go nie ma - rms (ten sam algorytm)
+        reference_engine = next((engine for engine in ('pydub', 'rms') if engine in measured), next(iter(measured), None))
+        for engine, result in measured.items():
+            result.update({'file': str(path), 'audio_seconds': audio_seconds, 'reference': reference_engine})
+            result.update(compare_ranges(measured[reference_engine]['ranges'], result['ranges']))
+            results.append(result)
+
+    print("-" * 112)
+    print(f"{'File':<26} {'Engine':<14} {'Time [s]':>9} {'Speed':>8} {'Peak RSS [MB]':>14} {'Ranges':>7} "
+          f"{'Jaccard':>8} {'Missed':>7} {'Extra':>6} {'|Δ| [ms]':>9}")
+    for result in results:
+        speed = f"{result['audio_seconds'] / result['seconds']:.0f}x" if result['seconds'] else '-'
+        print(f"{Path(result['file']).stem[:26]:<26} {result['engine']:<14} {result['seconds']:>9.2f} {speed:>8} "
+              f"{result['peak_rss'] / 1024 / 1024:>14.0f} {len(result['ranges']):>7} {result['jaccard']:>8.3f} "
+              f"{result['missed']:>7} {result['extra']:>6} {result['boundary_error_ms']:>9.1f}")
+    print("-" * 112)
+    print("Speed = sekundy audio na sekundę pracy; Jaccard = wspólny czas ciszy / suma czasu ciszy (1.0 = identycznie)")
+    print("Missed/Extra/|Δ| - względem silnika odniesienia (pydub, a bez niego rms)")
+
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        log(f"Results saved to {json_path}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark silence detection engines (speed, peak RSS, agreement).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmark on the fixtures")
+    run_parser.add_argument("--engines", nargs="+", default=list(BENCHMARK_ENGINES), choices=list(BENCHMARK_ENGINES))
+    run_parser.add_argument("--files", nargs="+", help="Audio/video files to use instead of the fixtures")
+    run_parser.add_argument("--min_silence_len", type=int, default=2000, help="Minimum silence length (ms)")
+    run_parser.add_argument("--silence_thresh", type=int, default=-40, help="Silence detection threshold (dB)")
+    run_parser.add_argument("--json", help="Also save the results to this JSON file")
+
+    make_parser = subparsers.add_parser("make-fixtures", help="Write synthetic lecture audio fixtures")
+    make_parser.add_argument("--fixtures", default=str(FIXTURES_DIR), help="Fixtures directory")
+    make_parser.add_argument("--minutes", type=float, default=5.0, help="Length of each fixture (min)")
+    make_parser.add_argument("--overwrite", action="store_true", help="Regenerate existing fixtures")
+
+    measure_parser = subparsers.add_parser("_measure")  # Wewnętrzne - proces pomiarowy jednego silnika
+    measure_parser.add_argument("--engine", required=True)
+    measure_parser.add_argument("--min_silence_len", type=int, default=2000)
+    measure_parser.add_argument("--silence_thresh", type=int, default=-40)
+    measure_parser.add_argument("path")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        paths = args.files or list_fixtures([FIXTURES_DIR, TRANSCRIPTION_FIXTURES_DIR])
+        sys.exit(0 if run_benchmark(paths, args.engines, args.min_silence_len, args.silence_thresh, args.json) else 1)
+    elif args.command == "make-fixtures":
+        make_fixtures(args.fixtures, args.minutes, args.overwrite)
+    elif args.command == "_measure":
+        measure_engine(args.engine, args.path, args.min_silence_len, args.silence_thresh)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from audio_chunking import SAMPLE_RATE, decode_audio_samples
+from transcription_engines import DEFAULT_ENGINE, ENGINES
+from transcription_profiles import PROFILES
+
+# Benchmark profili transkrypcji na syntetycznych nagraniach wykładów.
+# Każdy fixture to <nazwa>.txt (tekst referencyjny, akapity oddzielone pustą linią)
+# i <nazwa>.wav (mowa syntetyczna 16kHz mono z pauzami między akapitami) - nagrania
+# tworzy make-fixtures, domyślnie offline przez espeak-ng.
+FIXTURES_DIR = Path(__file__).resolve().parent / 'benchmark_fixtures' / 'transcription'
+RESULT_MARKER = 'BENCHMARK_RESULT '
+
+def log(message):
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+def peak_rss_bytes():
+    """Szczytowe zużycie pamięci bieżącego procesu (Windows: peak working set)."""
+    if os.name == 'nt':
+        import psutil
+        return psutil.Process().memory_info().peak_wset
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Linux podaje KiB
+
+def normalize_words(text):
+    return re.sub(r'[^\w\s]', ' ', text.lower()).split()
+
+def word_error_rate(reference, hypothesis):
+    """WER = (podstawienia + usunięcia + wstawienia) / liczba słów referencji."""
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    # Odległość Levenshteina na słowach, jeden wiersz tablicy naraz
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / len(ref)
+
+def read_fixture_text(text_path):
+    with open(text_path, encoding='utf-8') as f:
+        return [paragraph.strip() for paragraph in f.read().split('\n\n') if paragraph.strip()]
+
+def list_fixtures(fixtures_dir):
+    fixtures = []
+    for text_path in sorted(Path(fixtures_dir).glob('*.txt')):
+        audio_path = text_path.with_suffix('.wav')
+        if audio_path.exists():
+            fixtures.append((audio_path, ' '.join(read_fixture_text(text_path))))
+        else:
+            log(f"Warning: missing audio for fixture {text_path.name} - run 'make-fixtures' first")
+    return fixtures
+
+def write_wav(path, samples, sample_rate=SAMPLE_RATE):
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.tobytes())
+
+def synthesize_espeak(paragraph, audio_path, voice):
+    """Akapit przez espeak-ng (offline, bez klucza API) do pliku WAV."""
+    cmd = ['espeak-ng', '-v', voice or 'pl', '-w', str(audio_path), paragraph]
+    subprocess.run(cmd, check=True, capture_output=True)
+
+def synthesize_openai(paragraph, audio_path, voice):
+    """Akapit przez OpenAI TTS (tts-1) do pliku MP3. Wymaga OPENAI_API_KEY."""
+    from openai import OpenAI
+
+    response = OpenAI().audio.speech.create(model='tts-1', voice=voice or 'alloy', input=paragraph)
+    response.write_to_file(audio_path)
+
+# Silniki TTS dla make-fixtures: (funkcja, rozszerzenie pliku tymczasowego)
+FIXTURE_TTS = {
+    'espeak': (synthesize_espeak, 'wav'),
+    'openai': (synthesize_openai, 'mp3')
+}
+
+def make_fixtures(fixtures_dir, pause_seconds, voice, overwrite, tts='espeak'):
+    """
+    Syntezuje nagrania fixture'ów akapit po akapicie i skleja je z pauzami ciszy,
+    jak w wykładzie z pisaniem na tablicy. Domyślnie espeak-ng - działa offline,
+    jak make-fixtures w benchmark_silence.py; głos mniej naturalny niż OpenAI TTS,
+    więc WER jest wyższy, ale porównanie profili na tych samych nagraniach pozostaje miarodajne.
+    """
+    synthesize, extension = FIXTURE_TTS[tts]
+    pause = np.zeros(int(pause_seconds * SAMPLE_RATE), dtype=np.float32)
+    for text_path in sorted(Path(fixtures_dir).glob('*.txt')):
+        audio_path = text_path.with_suffix('.wav')
+        if audio_path.exists() and not overwrite:
+            log(f"Skipping {audio_path.name} (already exists)")
+            continue
+
+        parts = []
+        for index, paragraph in enumerate(read_fixture_text(text_path)):
+            log(f"Synthesizing {text_path.stem} paragraph {index + 1} ({tts})")
+            part_path = audio_path.with_name(f"{text_path.stem}_tmp{index}.{extension}")
+            try:
+                synthesize(paragraph, part_path, voice)
+                parts.extend([decode_audio_samples(part_path), pause])
+            finally:
+                part_path.unlink(missing_ok=True)
+
+        write_wav(audio_path, np.concatenate(parts))
+        log(f"Fixture written: {audio_path}")
+
+def measure_profile(profile, engine, audio_paths):
+    """Uruchamiane w osobnym procesie: ładuje model profilu raz i transkrybuje wszystkie fixture'y."""
+    from transcription_engines import get_engine
+    from transcription_profiles import get_profile
+
+    model_size, options = get_profile(profile)
+    backend = get_engine(engine)
+    start_time = time.time()
+    model = backend.load_model(model_size)
+    load_seconds = time.time() - start_time
+
+    files = []
+    for audio_path in audio_paths:
+        samples = decode_audio_samples(audio_path)
+        start_time = time.time()
+        result = backend.transcribe(model, samples, options)
+        files.append({
+            'audio': audio_path,
+            'audio_seconds': len(samples) / SAMPLE_RATE,
+            'transcribe_seconds': time.time() - start_time,
+            'text': result['text']
+        })
+
+    print(RESULT_MARKER + json.dumps({
+        'profile': profile,
+        'engine': engine,
+        'model': model_size,
+        'load_seconds': load_seconds,
+        'peak_rss': peak_rss_bytes(),
+        'files': files
+    }, ensure_ascii=False), flush=True)
+
+def run_benchmark(profiles, fixtures_dir, json_path=None, engines=(DEFAULT_ENGINE,)):
+    fixtures = list_fixtures(fixtures_dir)
+    if not fixtures:
+        log(f"Error: no fixtures with audio found in {fixtures_dir}")
+        return False
+    references = {str(audio_path): text for audio_path, text in fixtures}
+    runs = [(engine, profile) for engine in engines for profile in profiles]
+    log(f"Benchmarking {len(profiles)} profiles x {len(engines)} engines on {len(fixtures)} fixtures")
+
+    summary = []
+    for engine, profile in runs:
+        log(f"Profile '{profile}' (model: {PROFILES[profile]['model']}, engine: {engine})...")
+        # Osobny proces na profil - szczytowe RSS nie miesza się między modelami
+        cmd = [sys.executable, str(Path(__file__).resolve()), '_measure', '--profile', profile, '--engine', engine]
+        cmd += [str(audio_path) for audio_path, _ in fixtures]
+        process = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
+        lines = [line for line in process.stdout.splitlines() if line.startswith(RESULT_MARKER)]
+        if process.returncode != 0 or not lines:
+            log(f"[BLAD] Profile '{profile}' ({engine}) failed:\n{process.stderr[-2000:]}")
+            continue
+
+        measured = json.loads(lines[-1][len(RESULT_MARKER):])
+        audio_seconds = sum(f['audio_seconds'] for f in measured['files'])
+        transcribe_seconds = sum(f['transcribe_seconds'] for f in measured['files'])
+        reference_words = sum(len(normalize_words(references[f['audio']])) for f in measured['files'])
+        # WER ważony liczbą słów referencji, żeby dłuższe fixture'y miały większą wagę
+        errors = sum(word_error_rate(references[f['audio']], f['text']) * len(normalize_words(references[f['audio']]))
+                     for f in measured['files'])
+        measured.update({
+            'rtf': transcribe_seconds / audio_seconds if audio_seconds else 0.0,
+            'wer': errors / reference_words if reference_words else 0.0
+        })
+        for f in measured['files']:
+            f['wer'] = word_error_rate(references[f['audio']], f['text'])
+        summary.append(measured)
+
+    print("-" * 96)
+    print(f"{'Engine':<15} {'Profile':<10} {'Model':<10} {'Load [s]':>9} {'RTF':>7} {'Speed':>8} "
+          f"{'Peak RSS [MB]':>14} {'WER':>7}")
+    for measured in summary:
+        speed = f"{1 / measured['rtf']:.1f}x" if measured['rtf'] else '-'
+        print(f"{measured['engine']:<15} {measured['profile']:<10} {measured['model']:<10} "
+              f"{measured['load_seconds']:>9.1f} {measured['rtf']:>7.3f} {speed:>8} "
+              f"{measured['peak_rss'] / 1024 / 1024:>14.0f} {measured['wer'] * 100:>6.1f}%")
+    print("-" * 96)
+    print("RTF = czas transkrypcji / długość audio (bez ładowania modelu); < 1.0 = szybciej niż czas rzeczywisty")
+    print("Speed = sekundy audio przetwarzane w sekundę (przepustowość)")
+
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        log(f"Results saved to {json_path}")
+    return len(summary) == len(runs)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark transcription profiles (RTF, peak RSS, WER).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmark on the fixtures")
+    run_parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    run_parser.add_argument("--fixtures", default=str(FIXTURES_DIR), help="Fixtures directory")
+    run_parser.add_argument("--engines", nargs="+", default=[DEFAULT_ENGINE], choices=list(ENGINES),
+                            help="Inference backends to compare, e.g. --engines whisper faster-whisper")
+    run_parser.add_argument("--json", help="Also save the results to this JSON file")
+
+    make_parser = subparsers.add_parser("make-fixtures", help="Synthesize fixture audio (espeak-ng offline or OpenAI TTS)")
+    make_parser.add_argument("--fixtures", default=str(FIXTURES_DIR), help="Fixtures directory")
+    make_parser.add_argument("--pause", type=float, default=4.0, help="Silence between paragraphs (s)")
+    make_parser.add_argument("--tts", choices=list(FIXTURE_TTS), default="espeak",
+                             help="espeak - espeak-ng, offline (default), openai - OpenAI TTS, needs OPENAI_API_KEY")
+    make_parser.add_argument("--voice", default=None, help="TTS voice (default: 'pl' for espeak, 'alloy' for openai)")
+    make_parser.add_argument("--overwrite", action="store_true", help="Regenerate existing audio files")
+
+    measure_parser = subparsers.add_parser("_measure")  # Wewnętrzne - proces pomiarowy jednego profilu
+    measure_parser.add_argument("--profile", required=True)
+    measure_parser.add_argument("--engine", default=DEFAULT_ENGINE)
+    measure_parser.add_argument("audio_paths", nargs="+")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        sys.exit(0 if run_benchmark(args.profiles, args.fixtures, args.json, args.engines) else 1)
+    elif args.command == "make-fixtures":
+        make_fixtures(args.fixtures, args.pause, args.voice, args.overwrite, args.tts)
+    elif args.command == "_measure":
+        measure_profile(args.profile, args.engine, args.audio_paths)
+
+if __name__ == "__main__":
+    main()
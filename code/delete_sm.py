@@ -5,23 +5,32 @@ from moviepy.editor import VideoFileClip, concatenate_videoclips, ImageClip, Aud
 from pydub import AudioSegment, silence
 from pathlib import Path
 from tqdm import tqdm
+from motion_analysis import FrameReader
+from silence_detection import iter_silencedetect_ranges
 
-def detect_silent_segments(video_path, min_silence_len=2000, silence_thresh=-40, gap_margin=0.5):
-    """Wykrywa segmenty ciszy w audio z video z marginesem bezpieczeństwa."""
-    print("Extracting audio for silence detection...")
-    
-    # Wyciągnij audio z video
-    video = VideoFileClip(video_path)
-    audio_path = "temp_silence_detection.wav"
-    video.audio.write_audiofile(audio_path, verbose=False, logger=None)
-    video.close()
-    
-    print("Detecting silent segments...")
-    audio = AudioSegment.from_file(audio_path)
-    silent_segments = silence.detect_silence(audio, min_silence_len=min_silence_len, silence_thresh=silence_thresh)
-    
-    # Cleanup
-    Path(audio_path).unlink()
+def detect_silent_segments(video_path, min_silence_len=2000, silence_thresh=-40, gap_margin=0.5, engine='pydub'):
+    """
+    Wykrywa segmenty ciszy w audio z video z marginesem bezpieczeństwa.
+    engine - 'pydub' (WAV + detect_silence) albo 'silencedetect' (filtr ffmpeg, bez pliku WAV).
+    """
+    if engine == 'silencedetect':
+        print("Detecting silent segments (ffmpeg silencedetect)...")
+        silent_segments = list(iter_silencedetect_ranges(video_path, min_silence_len, silence_thresh))
+    else:
+        print("Extracting audio for silence detection...")
+        
+        # Wyciągnij audio z video
+        video = VideoFileClip(video_path)
+        audio_path = "temp_silence_detection.wav"
+        video.audio.write_audiofile(audio_path, verbose=False, logger=None)
+        video.close()
+        
+        print("Detecting silent segments...")
+        audio = AudioSegment.from_file(audio_path)
+        silent_segments = silence.detect_silence(audio, min_silence_len=min_silence_len, silence_thresh=silence_thresh)
+        
+        # Cleanup
+        Path(audio_path).unlink()
     
     gaps = []
     for i, (start, end) in enumerate(silent_segments):
@@ -56,14 +65,17 @@ def detect_silent_segments(video_path, min_silence_len=2000, silence_thresh=-40,
     return gaps
 
 def check_movement_in_gaps(video_path, gaps, movement_threshold=20, min_static_pixels=300, debug_mode=False):
-    """Sprawdza ruch w gap'ach ciszy z algorytmem dominacji bezruchu."""
-    cap = cv2.VideoCapture(video_path)
-    fps = cap.get(cv2.CAP_PROP_FPS)
+    """
+    Sprawdza ruch w gap'ach ciszy z algorytmem dominacji bezruchu.
+    Gap'y idą w kolejności czasu, klatki czytane jednym przejściem dekodera (FrameReader).
+    """
+    reader = FrameReader(video_path)
+    fps = reader.fps
     
     gaps_to_compress = []
     DOMINANCE_THRESHOLD = 0.6  # 60% bezruch = kompresuj cały gap
     
-    for gap in tqdm(gaps, desc="Analyzing movement in silent gaps"):
+    for gap in tqdm(sorted(gaps, key=lambda g: g['gap_start']), desc="Analyzing movement in silent gaps"):
         gap_start = gap['gap_start']
         gap_end = gap['gap_end']
         gap_duration = gap['gap_duration']
@@ -93,10 +105,9 @@ def check_movement_in_gaps(video_path, gaps, movement_threshold=20, min_static_p
             frame_step = max(1, (end_frame - start_frame) // 5)  # 5 sprawdzeń na sekundę
             
             for frame_num in range(start_frame, end_frame, frame_step):
-                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
-                ret, frame = cap.read()
+                frame = reader.read(frame_num)
                 
-                if not ret:
+                if frame is None:
                     break
                     
                 frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
@@ -176,8 +187,9 @@ def check_movement_in_gaps(video_path, gaps, movement_threshold=20, min_static_p
             # Ruch dominuje - zachowaj cały gap
             print(f"    [BLAD] ZACHOWAJ GAP: Ruch dominuje ({static_ratio:.1%} < {DOMINANCE_THRESHOLD:.1%})")
     
-    cap.release()
-    print(f"\n[PODSUMOWANIE] Summary: Found {len(gaps_to_compress)} gaps to compress based on {DOMINANCE_THRESHOLD:.0%} dominance rule")
+    reader.release()
+    print(f"\n[INFO] Dekodowanie: {reader.summary()}")
+    print(f"[PODSUMOWANIE] Summary: Found {len(gaps_to_compress)} gaps to compress based on {DOMINANCE_THRESHOLD:.0%} dominance rule")
     return gaps_to_compress
 
 def compress_video_gaps(video_path, output_path, gaps_to_compress, replacement_duration=1.0):
@@ -330,6 +342,8 @@ def main():
     parser.add_argument("--min_silence_len", type=int, default=2000, help="Minimum silence length (ms)")
     parser.add_argument("--silence_thresh", type=int, default=-40, help="Silence detection threshold (dB)")
     parser.add_argument("--gap_margin", type=float, default=0.5, help="Safety margin around detected silence (s)")
+    parser.add_argument("--silence_engine", choices=["pydub", "silencedetect"], default="pydub",
+                        help="pydub - detect_silence on extracted WAV (default), silencedetect - ffmpeg filter")
     parser.add_argument("--replacement_duration", type=float, default=0.5, help="Replacement duration (s)")
     parser.add_argument("--movement_threshold", type=int, default=15, help="Movement detection threshold")
     parser.add_argument("--min_static_pixels", type=int, default=100, help="Min pixels to consider movement")
@@ -344,7 +358,7 @@ def main():
     if not args.report_only:
         print(f"Output: {args.output_file}")
     print(f"Min silence: {args.min_silence_len}ms, Threshold: {args.silence_thresh}dB")
-    print(f"Gap margin: {args.gap_margin}s")
+    print(f"Gap margin: {args.gap_margin}s, silence engine: {args.silence_engine}")
     print("-" * 60)
     
     # Sprawdź plik
@@ -364,7 +378,8 @@ def main():
         str(video_path), 
         min_silence_len=args.min_silence_len,
         silence_thresh=args.silence_thresh,
-        gap_margin=args.gap_margin
+        gap_margin=args.gap_margin,
+        engine=args.silence_engine
     )
     
     if not silent_gaps:
@@ -3,12 +3,12 @@ import numpy as np
 import argparse
 from pathlib import Path
 from moviepy.editor import VideoFileClip, concatenate_videoclips
-from pydub import AudioSegment
-from pydub.silence import detect_silence
 import re
 from tqdm import tqdm
 from datetime import datetime
-import subprocess
+from ffmpeg_commands import FfmpegCommand
+from motion_analysis import FrameReader
+from silence_detection import ENGINES as SILENCE_ENGINES, iter_silent_ranges_with
 
 def parse_translation_file(file_path):
     """Wczytuje plik z tłumaczeniem i wyciąga timestampy."""
@@ -32,81 +32,50 @@ def parse_translation_file(file_path):
 
 def find_silent_gaps_fast(video_path, translation_file_path, 
                          min_silence_len=2000, silence_thresh=-40,
-                         gap_margin=0.5):
+                         gap_margin=0.5, engine='rms'):
     """
     Szybka wersja wykrywania fragmentów ciszy.
-    Używa bezpośrednio ffmpeg zamiast MoviePy do wyciągania audio.
+    Audio czytane strumieniowo z pipe ffmpeg (silence_detection) - bez pliku WAV i bez
+    wczytywania całej ścieżki do pamięci.
+    engine - 'rms' (wynik taki sam jak pydub detect_silence) albo 'silencedetect' (filtr ffmpeg).
     """
     print(f"[INFO] Szybkie wykrywanie ciszy w: {video_path}")
     
-    # Wyciągnij audio używając ffmpeg (szybciej niż MoviePy)
-    audio_path = Path.cwd() / "temp_silence_detection_fast.wav"
-    cmd = [
-        'ffmpeg',
-        '-i', str(video_path),
-        '-vn',  # No video
-        '-acodec', 'pcm_s16le',  # Simple audio codec
-        '-ar', '22050',  # Lower sample rate for faster processing
-        '-ac', '1',  # Mono for faster processing
-        '-y',  # Overwrite
-        str(audio_path)
-    ]
-    
-    print("[INFO] Wyciąganie audio z ffmpeg...")
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"[BLAD] Błąd ffmpeg: {result.stderr}")
-        return []
-    
-    # Sprawdź czy plik został utworzony
-    if not audio_path.exists():
-        print(f"[BLAD] Plik audio nie został utworzony: {audio_path}")
-        print(f"[DEBUG] ffmpeg stdout: {result.stdout}")
-        print(f"[DEBUG] ffmpeg stderr: {result.stderr}")
-        return []
-    
-    # Wykryj fragmenty ciszy (bez używania pliku tłumaczenia)
-    print("[INFO] Wykrywanie fragmentów ciszy...")
+    # Wykryj fragmenty ciszy (bez używania pliku tłumaczenia) z marginesem (jak w oryginalnej wersji).
+    # Fragmenty przychodzą na bieżąco w trakcie dekodowania, więc postęp widać od razu.
+    print(f"[INFO] Wykrywanie fragmentów ciszy (strumieniowo z ffmpeg, silnik: {engine})...")
+    gaps = []
     try:
-        audio = AudioSegment.from_file(str(audio_path))
-        all_silent_segments = detect_silence(audio, min_silence_len=min_silence_len, silence_thresh=silence_thresh)
-    except Exception as e:
+        for i, (start, end) in enumerate(iter_silent_ranges_with(engine, video_path, min_silence_len, silence_thresh)):
+            # Oryginalne wykrycie ciszy
+            original_start = start / 1000  # Convert to seconds
+            original_end = end / 1000
+            original_duration = original_end - original_start
+        
+            # Dodaj margines bezpieczeństwa (gap_margin na początku i końcu)
+            gap_start = original_start + gap_margin
+            gap_end = original_end - gap_margin
+            gap_duration = gap_end - gap_start
+        
+            # Sprawdź czy po dodaniu marginesu gap jest nadal wystarczająco długi
+            if gap_duration >= min_silence_len/1000:
+                gaps.append({
+                    'gap_id': i + 1,
+                    'gap_start': gap_start,
+                    'gap_end': gap_end,
+                    'gap_duration': gap_duration,
+                    'original_start': original_start,
+                    'original_end': original_end,
+                    'original_duration': original_duration
+                })
+            
+                print(f"[OK] Silent gap {i+1}: {original_start:.2f}s to {original_end:.2f}s ({original_duration:.2f}s)")
+                print(f"  -> Adjusted gap: {gap_start:.2f}s to {gap_end:.2f}s ({gap_duration:.2f}s) [margin: ±{gap_margin}s]")
+            else:
+                print(f"[SKIP] Silent gap {i+1}: {original_start:.2f}s to {original_end:.2f}s ({original_duration:.2f}s) - too short after margin adjustment")
+    except (OSError, RuntimeError) as e:
         print(f"[BLAD] Błąd podczas wykrywania ciszy: {e}")
         return []
-    finally:
-        # Cleanup - zawsze usuń plik tymczasowy
-        if audio_path.exists():
-            audio_path.unlink()
-    
-    # Przetwórz fragmenty ciszy z marginesem (jak w oryginalnej wersji)
-    gaps = []
-    for i, (start, end) in enumerate(all_silent_segments):
-        # Oryginalne wykrycie ciszy
-        original_start = start / 1000  # Convert to seconds
-        original_end = end / 1000
-        original_duration = original_end - original_start
-        
-        # Dodaj margines bezpieczeństwa (gap_margin na początku i końcu)
-        gap_start = original_start + gap_margin
-        gap_end = original_end - gap_margin
-        gap_duration = gap_end - gap_start
-        
-        # Sprawdź czy po dodaniu marginesu gap jest nadal wystarczająco długi
-        if gap_duration >= min_silence_len/1000:
-            gaps.append({
-                'gap_id': i + 1,
-                'gap_start': gap_start,
-                'gap_end': gap_end,
-                'gap_duration': gap_duration,
-                'original_start': original_start,
-                'original_end': original_end,
-                'original_duration': original_duration
-            })
-            
-            print(f"[OK] Silent gap {i+1}: {original_start:.2f}s to {original_end:.2f}s ({original_duration:.2f}s)")
-            print(f"  -> Adjusted gap: {gap_start:.2f}s to {gap_end:.2f}s ({gap_duration:.2f}s) [margin: ±{gap_margin}s]")
-        else:
-            print(f"[SKIP] Silent gap {i+1}: {original_start:.2f}s to {original_end:.2f}s ({original_duration:.2f}s) - too short after margin adjustment")
     
     print(f"[INFO] Znaleziono {len(gaps)} fragmentów ciszy >= {min_silence_len/1000}s (z marginesem {gap_margin}s)")
     return gaps
@@ -115,16 +84,18 @@ def check_movement_fast(video_path, gaps, movement_threshold=20, min_static_pixe
     """
     Zoptymalizowana analiza ruchu - 10x szybsza!
     Sprawdza tylko kluczowe klatki zamiast wszystkich.
+    Fragmenty są analizowane w kolejności czasu, a klatki czytane jednym przejściem
+    dekodera (FrameReader) zamiast seeka przed każdą próbką.
     """
     print(f"[INFO] Szybka analiza ruchu w {len(gaps)} fragmentach...")
     
-    cap = cv2.VideoCapture(video_path)
-    fps = cap.get(cv2.CAP_PROP_FPS)
+    reader = FrameReader(video_path)
+    fps = reader.fps
     
     gaps_to_compress = []
     DOMINANCE_THRESHOLD = 0.6  # 60% bezruch = kompresuj cały gap
     
-    for gap in tqdm(gaps, desc="Analyzing movement (FAST)"):
+    for gap in tqdm(sorted(gaps, key=lambda g: g['gap_start']), desc="Analyzing movement (FAST)"):
         gap_start = gap['gap_start']
         gap_end = gap['gap_end']
         gap_duration = gap['gap_duration']
@@ -160,10 +131,9 @@ def check_movement_fast(video_path, gaps, movement_threshold=20, min_static_pixe
                 frame_step = 1
             
             for frame_num in range(start_frame, end_frame, frame_step):
-                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
-                ret, frame = cap.read()
+                frame = reader.read(frame_num)
                 
-                if not ret:
+                if frame is None:
                     break
                 
                 # OPTYMALIZACJA 4: Przeskaluj ramkę dla szybszej analizy
@@ -216,8 +186,9 @@ def check_movement_fast(video_path, gaps, movement_threshold=20, min_static_pixe
         else:
             print(f"    [POMIŃ] Gap {gap_id} ma za dużo ruchu ({static_ratio:.1%} bezruchu < {DOMINANCE_THRESHOLD:.1%})")
     
-    cap.release()
-    print(f"\n[INFO] Znaleziono {len(gaps_to_compress)} fragmentów do kompresji (z {len(gaps)} analizowanych)")
+    reader.release()
+    print(f"\n[INFO] Dekodowanie: {reader.summary()}")
+    print(f"[INFO] Znaleziono {len(gaps_to_compress)} fragmentów do kompresji (z {len(gaps)} analizowanych)")
     return gaps_to_compress
 
 def generate_report_fast(all_gaps, gaps_compressed, output_path, video_path, original_video_path):
@@ -438,28 +409,23 @@ def compress_video_fast(video_path, gaps_to_compress, output_path):
         print("[BLAD] Brak segmentów do zachowania!")
         return False
     
-    # Utwórz filter complex dla ffmpeg
-    inputs = ['-i', str(video_path)]
-    filter_parts = []
+    # Graf trim/atrim + concat (cięcia co do klatki). Przy setkach segmentów graf jest długi,
+    # więc FfmpegCommand zapisuje go do pliku -filter_complex_script (limit linii poleceń Windows)
+    command = FfmpegCommand()
+    command.add_input(video_path)
     segment_refs = []
     
     for i, (start, end) in enumerate(segments):
         # Resetujemy PTS ale z lepszą synchronizacją
-        filter_parts.append(f"[0:v]trim=start={start:.6f}:end={end:.6f},setpts=PTS-STARTPTS[v{i}]")
-        filter_parts.append(f"[0:a]atrim=start={start:.6f}:end={end:.6f},asetpts=PTS-STARTPTS[a{i}]")
+        command.add_filter(f"[0:v]trim=start={start:.6f}:end={end:.6f},setpts=PTS-STARTPTS[v{i}]")
+        command.add_filter(f"[0:a]atrim=start={start:.6f}:end={end:.6f},asetpts=PTS-STARTPTS[a{i}]")
         segment_refs.append(f"[v{i}][a{i}]")
     
     # Połącz wszystkie segmenty
-    concat_filter = f"{''.join(segment_refs)}concat=n={len(segments)}:v=1:a=1[outv][outa]"
-    filter_parts.append(concat_filter)
-    
-    filter_complex = ';'.join(filter_parts)
+    command.add_filter(f"{''.join(segment_refs)}concat=n={len(segments)}:v=1:a=1[outv][outa]")
     
     # Komenda ffmpeg z poprawkami dla timestamp'ów
-    cmd = [
-        'ffmpeg',
-        *inputs,
-        '-filter_complex', filter_complex,
+    output_args = [
         '-map', '[outv]',
         '-map', '[outa]',
         '-c:v', 'libx264',
@@ -468,15 +434,13 @@ def compress_video_fast(video_path, gaps_to_compress, output_path):
         '-c:a', 'aac',
         '-avoid_negative_ts', 'make_zero',  # Napraw problemy z timestamp'ami
         '-fflags', '+genpts',  # Regeneruj timestamp'y
-        '-movflags', '+faststart',
-        '-y',
-        str(output_path)
+        '-movflags', '+faststart'
     ]
     
     print("[INFO] Uruchamianie kompresji ffmpeg...")
     start_time = datetime.now()
     
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    result = command.run(output_path, *output_args)
     
     end_time = datetime.now()
     duration = (end_time - start_time).total_seconds()
@@ -501,6 +465,8 @@ def main():
     parser.add_argument("--min_silence_len", type=int, default=2000, help="Minimum silence length (ms)")
     parser.add_argument("--silence_thresh", type=int, default=-40, help="Silence detection threshold (dB)")
     parser.add_argument("--gap_margin", type=float, default=0.5, help="Safety margin around detected silence (s)")
+    parser.add_argument("--silence_engine", choices=SILENCE_ENGINES, default="rms",
+                        help="rms - windowed RMS like pydub (default), silencedetect - ffmpeg silencedetect filter")
     parser.add_argument("--movement_threshold", type=int, default=15, help="Movement detection threshold")
     parser.add_argument("--min_static_pixels", type=int, default=100, help="Min pixels to consider movement")
     
@@ -510,7 +476,7 @@ def main():
     print(f"[INFO] Video: {args.video_file}")
     print(f"[INFO] Output: {args.output_file}")
     print(f"[INFO] Min cisza: {args.min_silence_len}ms, Próg: {args.silence_thresh}dB")
-    print(f"[INFO] Margines: {args.gap_margin}s")
+    print(f"[INFO] Margines: {args.gap_margin}s, silnik ciszy: {args.silence_engine}")
     print("-" * 60)
     
     # Sprawdź pliki
@@ -528,7 +494,8 @@ def main():
             None,  # Nie używamy pliku tłumaczenia
             min_silence_len=args.min_silence_len,
             silence_thresh=args.silence_thresh,
-            gap_margin=args.gap_margin
+            gap_margin=args.gap_margin,
+            engine=args.silence_engine
         )
         
         if not silent_gaps:
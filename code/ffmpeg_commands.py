@@ -0,0 +1,88 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+# Wspólny budowniczy komend ffmpeg dla grafów z setkami/tysiącami segmentów.
+# Na Windows linia poleceń ma limit 32767 znaków, a graf z jednym trim/atrim albo -i
+# na segment przekracza go przy długich wykładach. Dlatego:
+# - graf filtrów dłuższy niż INLINE_FILTER_LIMIT trafia do pliku (-filter_complex_script),
+# - pliki audio do miksowania mogą być źródłami amovie w grafie zamiast osobnych -i.
+INLINE_FILTER_LIMIT = 2000
+
+def _posix(path):
+    """ffmpeg akceptuje / także na Windows - unikamy escapowania backslashy."""
+    return Path(path).as_posix() if isinstance(path, Path) else str(path).replace('\\', '/')
+
+def escape_filter_value(value):
+    """Escapuje wartość opcji filtra (np. ścieżkę w amovie) na obu poziomach: opcji i grafu."""
+    value = _posix(value)
+    for char in ('\\', "'", ':'):
+        value = value.replace(char, '\\' + char)
+    for char in ('\\', "'", '[', ']', ',', ';'):
+        value = value.replace(char, '\\' + char)
+    return value
+
+class FfmpegCommand:
+    """
+    Buduje i uruchamia jedną komendę ffmpeg. Pliki pomocnicze (skrypt grafu)
+    powstają w katalogu tymczasowym usuwanym po run() albo przy wyjściu z bloku with.
+    """
+
+    def __init__(self, *global_args):
+        self.global_args = list(global_args)
+        self.inputs = []
+        self.filters = []
+        self._temp_dir = None
+
+    def _temp_path(self, name):
+        if self._temp_dir is None:
+            self._temp_dir = tempfile.mkdtemp(prefix='ffmpeg_')
+        return os.path.join(self._temp_dir, name)
+
+    def add_input(self, path, *options):
+        """Dodaje -i (z opcjami wejścia przed nim) i zwraca indeks wejścia do użycia w grafie."""
+        self.inputs.append([*options, '-i', str(path)])
+        return len(self.inputs) - 1
+
+    def add_filter(self, *chains):
+        """Dodaje łańcuchy filtrów grafu (łączone średnikami)."""
+        self.filters.extend(chains)
+
+    def build(self, output_path, *output_args):
+        """Zwraca listę argumentów; długi graf zapisuje do pliku -filter_complex_script."""
+        cmd = ['ffmpeg', *self.global_args]
+        for input_args in self.inputs:
+            cmd.extend(input_args)
+        if self.filters:
+            graph = ';\n'.join(self.filters)
+            if len(graph) > INLINE_FILTER_LIMIT:
+                script_path = self._temp_path('filter_complex.txt')
+                with open(script_path, 'w', encoding='utf-8') as f:
+                    f.write(graph)
+                cmd.extend(['-filter_complex_script', script_path])
+            else:
+                cmd.extend(['-filter_complex', graph.replace('\n', '')])
+        cmd.extend([*output_args, '-y', str(output_path)])
+        return cmd
+
+    def run(self, output_path, *output_args, **kwargs):
+        """Buduje i uruchamia komendę (subprocess.run, domyślnie z przechwyceniem wyjścia)."""
+        kwargs.setdefault('capture_output', True)
+        kwargs.setdefault('text', True)
+        try:
+            return subprocess.run(self.build(output_path, *output_args), **kwargs)
+        finally:
+            self.cleanup()
+
+    def cleanup(self):
+        if self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cleanup()
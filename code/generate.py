@@ -1,13 +1,32 @@
 import os
 import re
+import time
+import random
+import threading
 import requests
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+from tts_cache import TTSCache
+from audio_index import DurationIndex
 
 # API key should be set via environment variable
-CHUNK_SIZE = 1024  # Size of chunks to read/write at a time
+CHUNK_SIZE = 64 * 1024  # Size of chunks to read/write at a time
 XI_API_KEY = os.getenv('ELEVENLABS_API_KEY')  # Your API key for authentication
+# Adres API - do testów można wskazać lokalną atrapę (mock_elevenlabs_server.py)
+ELEVENLABS_BASE_URL = os.getenv('ELEVENLABS_BASE_URL', 'https://api.elevenlabs.io').rstrip('/')
 VOICE_ID = "XfNU2rGpBa01ckF309OY"  # ID of the voice model to use
+# Ile zdań syntezujemy jednocześnie. ElevenLabs limituje równoległe zapytania wg planu
+# (Free 2, Starter 3, Creator 5, Pro 10, Scale 15) - nadmiarowe dostają 429.
+DEFAULT_CONCURRENCY = 3
+MAX_RETRIES = 6           # Ile razy ponawiamy zdanie po 429 / błędzie serwera
+BASE_BACKOFF = 1.0        # Pierwsze opóźnienie po błędzie (s), potem rośnie wykładniczo
+MAX_BACKOFF = 60.0
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+SUCCESSES_TO_GROW = 10    # Po tylu udanych zapytaniach z rzędu podnosimy obniżoną równoległość o 1
+PARTIAL_SUFFIX = '.partial'  # Znacznik zapisywany przez translate.py --stream, dopóki tłumaczenie trwa
+LINE_PATTERN = re.compile(r'Start: ([\d.]+), End: ([\d.]+), Sentence: (.+)')
 
 def read_translated_file(file_path):
     with open(file_path, 'r', encoding='utf-8') as file:
@@ -17,7 +36,7 @@ def read_translated_file(file_path):
     sentences = []
     for line in lines:
         # Use regular expressions to extract start, end, and sentence
-        match = re.match(r'Start: ([\d.]+), End: ([\d.]+), Sentence: (.+)', line)
+        match = LINE_PATTERN.match(line)
         if match:
             start = float(match.group(1))
             end = float(match.group(2))
@@ -27,8 +46,115 @@ def read_translated_file(file_path):
 
     return timestamps, sentences
 
-def generate_audio(text, api_key, voice_id, output_path):
-    tts_url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}/stream"
+def follow_translated_file(file_path, poll_interval=0.5, timeout=600):
+    """
+    Czyta plik _en zapisywany na bieżąco przez translate.py --stream i zwraca kolejne
+    ((start, end), zdanie), gdy tylko pojawi się pełna linia. Kończy, gdy znacznik
+    <plik>.partial zniknie (tłumaczenie gotowe); "failed" w znaczniku przerywa generowanie.
+    timeout - ile sekund bez nowych linii uznajemy za zawieszenie tłumaczenia.
+    """
+    file_path = Path(file_path)
+    marker = Path(f"{file_path}{PARTIAL_SUFFIX}")
+    position = 0
+    buffer = b''
+    last_progress = time.time()
+
+    while True:
+        # Stan znacznika sprawdzamy PRZED czytaniem - jeśli już go nie ma, plik jest kompletny
+        finished = not marker.exists() and file_path.exists()
+        if marker.exists() and marker.read_text(encoding='utf-8').strip() == 'failed':
+            raise Exception(f"Translation failed, no more sentences in {file_path}")
+
+        if file_path.exists():
+            with open(file_path, 'rb') as f:
+                f.seek(position)
+                data = f.read()
+            position += len(data)
+            buffer += data
+            *complete, buffer = buffer.split(b'\n')
+            if complete:
+                last_progress = time.time()
+            for raw_line in complete:
+                match = LINE_PATTERN.match(raw_line.decode('utf-8'))
+                if match:
+                    yield (float(match.group(1)), float(match.group(2))), match.group(3).strip()
+
+        if finished:
+            if buffer.strip():
+                match = LINE_PATTERN.match(buffer.decode('utf-8'))
+                if match:
+                    yield (float(match.group(1)), float(match.group(2))), match.group(3).strip()
+            return
+        if time.time() - last_progress > timeout:
+            raise Exception(f"No new sentences in {file_path} for {timeout}s - is translate.py still running?")
+        time.sleep(poll_interval)
+
+class RateLimitGate:
+    """
+    Wspólna pauza dla wszystkich wątków: po 429 nikt nie wysyła zapytań do czasu
+    resume_at, zamiast każdy wątek osobno uderzać w limit.
+    max_concurrency - dodatkowo pilnuje liczby zapytań w locie: 429 zmniejsza ją o jeden
+    (raz na pauzę), a seria udanych zapytań przywraca ją stopniowo do max_concurrency.
+    Dzięki temu --concurrency ponad limit planu nie kończy się wyczerpaniem ponowień.
+    """
+
+    def __init__(self, max_concurrency=None):
+        self.condition = threading.Condition()
+        self.resume_at = 0.0
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.active = 0
+        self.successes = 0
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                delay = self.resume_at - time.time()
+                if delay <= 0 and (self.limit is None or self.active < self.limit):
+                    self.active += 1
+                    return
+                self.condition.wait(delay if delay > 0 else None)
+
+    def release(self, success=False):
+        with self.condition:
+            self.active -= 1
+            if success and self.limit is not None and self.limit < self.max_concurrency:
+                self.successes += 1
+                if self.successes >= SUCCESSES_TO_GROW:
+                    self.limit += 1
+                    self.successes = 0
+            self.condition.notify_all()
+
+    def pause(self, seconds):
+        with self.condition:
+            if self.limit is not None and self.limit > 1 and time.time() >= self.resume_at:
+                self.limit -= 1
+                print(f"Rate limited - lowering concurrency to {self.limit}\n", end='', flush=True)
+            self.successes = 0
+            self.resume_at = max(self.resume_at, time.time() + seconds)
+            self.condition.notify_all()
+
+def create_session(concurrency=DEFAULT_CONCURRENCY):
+    """Jedna sesja keep-alive na cały przebieg, z pulą połączeń na wszystkie wątki."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def retry_delay(response, attempt):
+    """Opóźnienie przed ponowieniem: Retry-After z odpowiedzi albo wykładniczy backoff z jitterem."""
+    if response is not None:
+        try:
+            retry_after = response.headers.get('retry-after')
+            if retry_after is not None:
+                return min(float(retry_after), MAX_BACKOFF)
+        except ValueError:
+            pass
+    return min(BASE_BACKOFF * 2 ** attempt, MAX_BACKOFF) * random.uniform(0.5, 1.0)
+
+def generate_audio(text, api_key, voice_id, output_path, session=None, gate=None, cache=None):
+    tts_url = f"{ELEVENLABS_BASE_URL}/v1/text-to-speech/{voice_id}/stream"
     headers = {
         "Accept": "application/json",
         "xi-api-key": api_key
@@ -43,56 +169,148 @@ def generate_audio(text, api_key, voice_id, output_path):
             "use_speaker_boost": True
         }
     }
+    if cache:
+        cache_key = cache.make_key(voice_id, data)
+        if cache.fetch(cache_key, output_path):
+            return output_path
 
-    response = requests.post(tts_url, headers=headers, json=data, stream=True)
+    session = session or requests
+    gate = gate or RateLimitGate()
+    # Zapis do pliku tymczasowego - przerwany strumień nie zostawia uciętego mp3
+    temp_path = f"{output_path}.part"
 
-    if response.ok:
-        with open(output_path, "wb") as f:
-            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
-                f.write(chunk)
-        return output_path
-    else:
-        print(f"Failed to generate audio for text: {text}")
-        print(f"ElevenLabs error: {response.text}")
-        
-        # Sprawdź czy to problem z limitem lub kluczem API
-        try:
-            error_data = response.json()
-            if "detail" in error_data:
-                detail = error_data["detail"]
-                if isinstance(detail, dict):
-                    status = detail.get("status", "unknown")
-                    message = detail.get("message", "Unknown error")
-                    
-                    if "quota" in message.lower() or "limit" in message.lower():
-                        print("❌ BŁĄD: Przekroczony limit ElevenLabs API")
-                        print("💡 Rozwiązanie: Sprawdź swój plan ElevenLabs lub poczekaj do następnego miesiąca")
-                    elif "unauthorized" in message.lower() or "invalid" in message.lower():
-                        print("❌ BŁĄD: Nieprawidłowy klucz ElevenLabs API")
-                        print("💡 Rozwiązanie: Sprawdź klucz API w konfiguracji")
-                    else:
-                        print(f"❌ BŁĄD ElevenLabs: {status} - {message}")
-        except:
-            pass
-        
-        # Fallback - utwórz pusty plik audio żeby nie przerywać całego procesu
-        print("⚠️ Tworzę pusty plik audio jako fallback...")
+    for attempt in range(MAX_RETRIES + 1):
+        gate.acquire()
+        response = None
+        success = False
         try:
-            # Utwórz krótki plik audio z ciszą (1 sekunda)
-            from pydub import AudioSegment
-            silence = AudioSegment.silent(duration=1000)  # 1 sekunda ciszy
-            silence.export(output_path, format="mp3")
-            print(f"✅ Utworzono pusty plik audio: {output_path}")
-            return output_path
-        except Exception as e:
-            print(f"❌ Nie udało się utworzyć fallback audio: {e}")
-            raise Exception(f"Failed to generate audio: {response.text}")
+            response = session.post(tts_url, headers=headers, json=data, stream=True)
+            if response.ok:
+                with open(temp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+                os.replace(temp_path, output_path)
+                success = True
+                if cache:
+                    cache.put(cache_key, output_path)  # Tylko prawdziwe audio - fallback z ciszą nie trafia do cache
+                return output_path
+            if response.status_code not in RETRY_STATUS_CODES:
+                break
+            reason = f"HTTP {response.status_code}"
+        except requests.exceptions.RequestException as e:
+            reason = type(e).__name__
+        finally:
+            gate.release(success)
+            if not success:
+                Path(temp_path).unlink(missing_ok=True)  # Ucięty strumień nie zostaje w generated/
+        if attempt == MAX_RETRIES:
+            break
+        delay = retry_delay(response, attempt)
+        if response is not None and response.status_code == 429:
+            gate.pause(delay)  # Limit jest wspólny dla klucza API - wstrzymujemy wszystkie wątki
+        if response is not None:
+            response.close()
+        print(f"Sentence '{text[:40]}': {reason}, retrying in {delay:.1f}s ({attempt + 1}/{MAX_RETRIES})\n",
+              end='', flush=True)
+        time.sleep(delay)
+
+    if response is None or response.ok:
+        # Błędy połączenia / przerwany strumień - nie ma odpowiedzi z błędem do analizy poniżej
+        print(f"Failed to generate audio for text: {text}")
+        raise Exception(f"Failed to generate audio: connection to ElevenLabs failed after {MAX_RETRIES} retries")
+
+    print(f"Failed to generate audio for text: {text}")
+    print(f"ElevenLabs error: {response.text}")
+    
+    # Sprawdź czy to problem z limitem lub kluczem API
+    try:
+        error_data = response.json()
+        if "detail" in error_data:
+            detail = error_data["detail"]
+            if isinstance(detail, dict):
+                status = detail.get("status", "unknown")
+                message = detail.get("message", "Unknown error")
+                
+                if "quota" in message.lower() or "limit" in message.lower():
+                    print("❌ BŁĄD: Przekroczony limit ElevenLabs API")
+                    print("💡 Rozwiązanie: Sprawdź swój plan ElevenLabs lub poczekaj do następnego miesiąca")
+                elif "unauthorized" in message.lower() or "invalid" in message.lower():
+                    print("❌ BŁĄD: Nieprawidłowy klucz ElevenLabs API")
+                    print("💡 Rozwiązanie: Sprawdź klucz API w konfiguracji")
+                else:
+                    print(f"❌ BŁĄD ElevenLabs: {status} - {message}")
+    except:
+        pass
+    
+    # Fallback - utwórz pusty plik audio żeby nie przerywać całego procesu
+    print("⚠️ Tworzę pusty plik audio jako fallback...")
+    try:
+        # Utwórz krótki plik audio z ciszą (1 sekunda)
+        from pydub import AudioSegment
+        silence = AudioSegment.silent(duration=1000)  # 1 sekunda ciszy
+        # Nowy plik + rename zamiast nadpisywania w miejscu starego output_audio_{i}.mp3
+        silence.export(temp_path, format="mp3")
+        os.replace(temp_path, output_path)
+        print(f"✅ Utworzono pusty plik audio: {output_path}")
+        return output_path
+    except Exception as e:
+        Path(temp_path).unlink(missing_ok=True)
+        print(f"❌ Nie udało się utworzyć fallback audio: {e}")
+        raise Exception(f"Failed to generate audio: {response.text}")
+
+def generate_all(sentences, api_key, voice_id, output_dir, concurrency=DEFAULT_CONCURRENCY, cache=None):
+    """
+    Syntezuje zdania równolegle (najwyżej concurrency zapytań naraz) przez wspólną sesję.
+    sentences może być generatorem (tryb --follow) - zdania trafiają do puli, gdy się pojawią.
+    Pliki nazywają się output_audio_{i}.mp3 wg pozycji zdania, niezależnie od kolejności ukończenia.
+    cache - TTSCache; zdania bez zmian (ten sam tekst, głos i ustawienia) nie idą do API.
+    Długości plików trafiają do indeksu durations.json (audio_index), z którego korzystają skrypty overlay.
+    """
+    session = create_session(concurrency)
+    gate = RateLimitGate(concurrency)
+    durations = DurationIndex(output_dir)
+
+    def synthesize(i, sentence):
+        audio_file_path = output_dir / f"output_audio_{i}.mp3"
+        generate_audio(sentence, api_key, voice_id, str(audio_file_path), session, gate, cache)
+        durations.record(audio_file_path)
+        # Jedno wywołanie write na linię - komunikaty z wątków się nie przeplatają
+        print(f"Generated audio file for sentence {i}: {audio_file_path}\n", end='', flush=True)
+
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    futures = []
+    try:
+        for i, sentence in enumerate(sentences):
+            futures.append(executor.submit(synthesize, i, sentence))
+            # Błąd wcześniejszego zdania przerywa przebieg od razu, a nie dopiero na końcu pliku
+            for future in futures:
+                if future.done() and future.exception():
+                    raise future.exception()
+        for future in futures:
+            future.result()
+    finally:
+        # Przy błędzie nie zaczynamy zdań czekających w kolejce
+        executor.shutdown(wait=True, cancel_futures=True)
+        session.close()
+        # Także po błędzie - gotowe pliki nie będą ponownie skanowane przez overlay
+        durations.save()
+    return len(futures)
 
 def main():
     parser = argparse.ArgumentParser(description="Generate audio files from translated text file.")
     parser.add_argument("input_file", help="Path to the input text file")
     parser.add_argument("video_file", help="Path to the video file")
+    parser.add_argument("--follow", action="store_true",
+                        help="Generate audio while translate.py --stream is still writing the input file")
+    parser.add_argument("--follow-timeout", type=float, default=600,
+                        help="Give up after this many seconds without new sentences (default: 600)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Synthesize every sentence again instead of reusing cached audio")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Parallel TTS requests, match your ElevenLabs plan limit (default: {DEFAULT_CONCURRENCY})")
     args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error(f"--concurrency must be at least 1 (got {args.concurrency})")
 
     input_file = Path(args.input_file)
     video_file = Path(args.video_file)
@@ -103,16 +321,24 @@ def main():
 
     elevenlabs_api_key = XI_API_KEY
 
-    timestamps, sentences = read_translated_file(input_file)
+    if args.follow:
+        sentences = (sentence for _, sentence in follow_translated_file(input_file, timeout=args.follow_timeout))
+    else:
+        timestamps, sentences = read_translated_file(input_file)
 
-    for i, sentence in enumerate(sentences):
-        audio_file_path = output_dir / f"output_audio_{i}.mp3"
-        generate_audio(sentence, elevenlabs_api_key, VOICE_ID, str(audio_file_path))
-        print(f"Generated audio file for sentence {i}: {audio_file_path}")
+    start_time = time.time()
+    cache = None if args.no_cache else TTSCache()
+    count = generate_all(sentences, elevenlabs_api_key, VOICE_ID, output_dir, args.concurrency, cache)
+    print(f"Generated {count} audio files in {time.time() - start_time:.1f}s (concurrency: {args.concurrency})")
+    if cache:
+        print(f"TTS cache: {cache.hits} sentences reused, {cache.misses} synthesized")
 
 # Dodaj dźwięk zakończenia
-    import winsound
-    winsound.Beep(1000, 500)  # Sygnał o częstotliwości 1000Hz trwający 500ms
+    try:
+        import winsound
+        winsound.Beep(1000, 500)  # Sygnał o częstotliwości 1000Hz trwający 500ms
+    except ImportError:
+        pass  # Poza Windows (np. benchmark na atrapie API) bez sygnału
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
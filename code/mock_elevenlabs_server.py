@@ -0,0 +1,304 @@
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Lokalna atrapa endpointu ElevenLabs /v1/text-to-speech/{voice}/stream do strojenia
+# równoległości generate.py bez zużywania płatnego limitu. Zwraca syntetyczne MP3 (cisza)
+# o długości zależnej od tekstu; opóźnienia, błędy 5xx i limity 429 są konfigurowalne.
+# generate.py kieruje zapytania tutaj, gdy ELEVENLABS_BASE_URL wskazuje na atrapę.
+MOCK_API_KEY = 'xi-mock-local'
+CHARS_PER_SECOND = 15.0   # Tempo "mowy" atrapy - wyznacza długość zwracanego audio
+STREAM_BLOCK_SIZE = 4096
+
+# Ramka MPEG-1 Layer III, 128 kbps, 44.1 kHz, mono: nagłówek + zerowe side info i dane = cisza
+MP3_FRAME_HEADER = bytes([0xFF, 0xFB, 0x90, 0xC0])
+MP3_FRAME_BYTES = 417          # 144 * 128000 / 44100 (bez paddingu)
+MP3_FRAME_SECONDS = 1152 / 44100
+
+def log(message):
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+def synthetic_mp3(duration):
+    """Poprawny strumień MP3 z ciszą o podanej długości (co najmniej jedna ramka)."""
+    frames = max(1, round(duration / MP3_FRAME_SECONDS))
+    return (MP3_FRAME_HEADER + bytes(MP3_FRAME_BYTES - len(MP3_FRAME_HEADER))) * frames
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+class MockElevenLabsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive jak w prawdziwym API - sesja generate.py używa puli połączeń
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            log(f"[MOCK] {format % args}")
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        match = re.fullmatch(r'/v1/text-to-speech/([^/]+)/stream', self.path.split('?')[0])
+        if not match:
+            self.send_json(404, {'detail': {'status': 'not_found', 'message': f"Unknown endpoint: {self.path}"}})
+            return
+        if not self.headers.get('xi-api-key'):
+            self.send_json(401, {'detail': {'status': 'invalid_api_key', 'message': 'Invalid API key (mock)'}})
+            return
+        try:
+            text = json.loads(body)['text']
+        except (ValueError, KeyError, TypeError):
+            self.send_json(400, {'detail': {'status': 'invalid_request', 'message': "Missing 'text'"}})
+            return
+
+        server = self.server
+        arrived = time.time()
+        outcome = server.admit(text, arrived)
+        if outcome == 'rate_limited':
+            self.send_json(429, {'detail': {'status': 'too_many_concurrent_requests',
+                                            'message': 'Too many concurrent requests (mock limit)'}},
+                           {'Retry-After': str(server.retry_after)})
+            return
+
+        try:
+            time.sleep(server.request_latency(text))
+            if outcome == 'error':
+                self.send_json(503, {'detail': {'status': 'service_unavailable', 'message': 'Mock server error'}})
+                return
+            audio = synthetic_mp3(len(text) / CHARS_PER_SECOND)
+            self.send_response(200)
+            self.send_header('Content-Type', 'audio/mpeg')
+            self.send_header('Content-Length', str(len(audio)))
+            self.end_headers()
+            for offset in range(0, len(audio), STREAM_BLOCK_SIZE):
+                self.wfile.write(audio[offset:offset + STREAM_BLOCK_SIZE])
+            server.record_success(text, time.time())
+        finally:
+            server.release()
+
+class MockElevenLabsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.4, seconds_per_char=0.005, jitter=0.2, error_rate=0.0,
+                 concurrency_limit=0, rate_limit_every=0, retry_after=0.5, seed=None, verbose=False):
+        super().__init__(address, MockElevenLabsHandler)
+        self.latency = latency                      # Stały czas do pierwszego bajtu (s)
+        self.seconds_per_char = seconds_per_char    # Dodatkowy czas syntezy na znak tekstu
+        self.jitter = jitter                        # Losowy rozrzut opóźnienia (ułamek, 0.2 = +-20%)
+        self.error_rate = error_rate                # Prawdopodobieństwo odpowiedzi 503
+        # Jak limit planu ElevenLabs: zapytanie ponad concurrency_limit równoległych dostaje 429 (0 = bez limitu)
+        self.concurrency_limit = concurrency_limit
+        # Dodatkowo co rate_limit_every-te zapytanie dostaje 429 (0 = wyłączone)
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.verbose = verbose
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.lock:
+            self.total_requests = 0
+            self.rate_limited = 0
+            self.errors = 0
+            self.active = 0
+            self.max_active = 0
+            self.first_seen = {}   # tekst -> czas pierwszego zapytania
+            self.latencies = []    # czas od pierwszego zapytania zdania do ukończenia audio (z ponowieniami)
+
+    def admit(self, text, arrived):
+        """Decyduje o losie zapytania: 'ok', 'error' (503) albo 'rate_limited' (429)."""
+        with self.lock:
+            self.total_requests += 1
+            self.first_seen.setdefault(text, arrived)
+            if (self.concurrency_limit and self.active >= self.concurrency_limit) or \
+                    (self.rate_limit_every and self.total_requests % self.rate_limit_every == 0):
+                self.rate_limited += 1
+                return 'rate_limited'
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            if self.random.random() < self.error_rate:
+                self.errors += 1
+                return 'error'
+            return 'ok'
+
+    def release(self):
+        with self.lock:
+            self.active -= 1
+
+    def request_latency(self, text):
+        with self.lock:
+            factor = 1.0 + self.random.uniform(-self.jitter, self.jitter)
+        return max(0.0, (self.latency + len(text) * self.seconds_per_char) * factor)
+
+    def record_success(self, text, finished):
+        with self.lock:
+            self.latencies.append(finished - self.first_seen.get(text, finished))
+
+    def handle_error(self, request, client_address):
+        # Klient zrywa połączenie (timeout, przerwany benchmark) - to nie błąd atrapy, bez tracebacku
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+def start_mock_server(port=0, **kwargs):
+    """Uruchamia atrapę w wątku w tle i zwraca serwer (port=0 - wolny port)."""
+    server = MockElevenLabsServer(('127.0.0.1', port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def write_benchmark_input(path, sentences_count, seed=0):
+    """Plik _en o różnej długości zdań, jak w wykładzie."""
+    rng = random.Random(seed)
+    words = "the integral of this function equals the area under the curve so we check the left side".split()
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(sentences_count):
+            sentence = ' '.join(rng.choice(words) for _ in range(rng.randint(4, 25)))
+            f.write(f"Start: {i * 5:.2f}, End: {i * 5 + 4:.2f}, Sentence: Sentence {i}: {sentence}.\n")
+
+def run_benchmark(concurrency_levels, sentences_count, input_file=None, server_options=None):
+    """
+    Dla każdego poziomu równoległości uruchamia generate.py (bez cache TTS) na atrapie
+    i raportuje przepustowość, rozkład czasu zdania (z ponowieniami) oraz liczbę ponowień.
+    """
+    server = start_mock_server(**(server_options or {}))
+    log(f"Mock ElevenLabs API running at {server.base_url}")
+    generate_script = Path(__file__).resolve().parent / 'generate.py'
+    env = dict(os.environ, ELEVENLABS_BASE_URL=server.base_url, ELEVENLABS_API_KEY=MOCK_API_KEY,
+               PYTHONIOENCODING='utf-8')
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        text_dir = Path(work_dir) / 'text'
+        text_dir.mkdir()
+        if input_file:
+            en_file = Path(input_file)
+        else:
+            en_file = text_dir / 'benchmark_en.txt'
+            write_benchmark_input(en_file, sentences_count)
+        # generate.py zapisuje audio w <folder nad plikiem _en>/generated/<nazwa wideo>
+        video_file = Path(work_dir) / 'benchmark.mp4'
+
+        for concurrency in concurrency_levels:
+            server.reset_stats()
+            log(f"generate.py --concurrency {concurrency}...")
+            start_time = time.time()
+            process = subprocess.run(
+                [sys.executable, str(generate_script), str(en_file), str(video_file),
+                 '--concurrency', str(concurrency), '--no-cache'],
+                capture_output=True, text=True, encoding='utf-8', env=env
+            )
+            elapsed = time.time() - start_time
+            if process.returncode != 0:
+                log(f"[BLAD] generate.py failed (concurrency {concurrency}):\n{process.stderr[-2000:]}")
+                continue
+            sentences = len(server.latencies)
+            results.append({
+                'concurrency': concurrency,
+                'sentences': sentences,
+                'seconds': elapsed,
+                'sentences_per_second': sentences / elapsed if elapsed else 0.0,
+                'p50': percentile(server.latencies, 0.50),
+                'p95': percentile(server.latencies, 0.95),
+                'p99': percentile(server.latencies, 0.99),
+                'max': max(server.latencies, default=0.0),
+                'retries': server.total_requests - sentences,
+                'rate_limited': server.rate_limited,
+                'errors': server.errors,
+                'max_active': server.max_active
+            })
+
+    server.shutdown()
+    print("-" * 100)
+    print(f"{'Concurrency':>11} {'Sentences':>9} {'Time [s]':>9} {'Sent/s':>7} {'p50 [s]':>8} {'p95 [s]':>8} "
+          f"{'p99 [s]':>8} {'Max [s]':>8} {'Retries':>8} {'429':>5} {'5xx':>5}")
+    for r in results:
+        print(f"{r['concurrency']:>11} {r['sentences']:>9} {r['seconds']:>9.1f} {r['sentences_per_second']:>7.2f} "
+              f"{r['p50']:>8.2f} {r['p95']:>8.2f} {r['p99']:>8.2f} {r['max']:>8.2f} {r['retries']:>8} "
+              f"{r['rate_limited']:>5} {r['errors']:>5}")
+    print("-" * 100)
+    print("Czas zdania = od pierwszego zapytania do ukończenia audio, łącznie z ponowieniami po 429/5xx")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the ElevenLabs text-to-speech stream endpoint.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_server_options(subparser):
+        subparser.add_argument("--latency", type=float, default=0.4, help="Time to first byte per request (s)")
+        subparser.add_argument("--seconds-per-char", type=float, default=0.005,
+                               help="Extra synthesis time per character of text")
+        subparser.add_argument("--jitter", type=float, default=0.2, help="Random latency spread (0.2 = +-20%%)")
+        subparser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a 503 response")
+        subparser.add_argument("--concurrency-limit", type=int, default=3,
+                               help="Requests above this many in flight get 429, like a plan limit (0 = none)")
+        subparser.add_argument("--rate-limit-every", type=int, default=0,
+                               help="Additionally answer every N-th request with 429 (0 = never)")
+        subparser.add_argument("--retry-after", type=float, default=0.5, help="Retry-After sent with 429 (s)")
+        subparser.add_argument("--seed", type=int, help="Random seed for latency and errors")
+
+    serve_parser = subparsers.add_parser("serve", help="Run the mock server in the foreground")
+    serve_parser.add_argument("--port", type=int, default=8766)
+    add_server_options(serve_parser)
+
+    benchmark_parser = subparsers.add_parser("benchmark", help="Drive generate.py against the mock")
+    benchmark_parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 3, 5],
+                                  help="generate.py --concurrency values to compare")
+    benchmark_parser.add_argument("--sentences", type=int, default=60, help="Synthetic sentences to generate")
+    benchmark_parser.add_argument("--input", help="Use this _en file instead of synthetic sentences")
+    benchmark_parser.add_argument("--json", help="Also save the results to this JSON file")
+    add_server_options(benchmark_parser)
+
+    args = parser.parse_args()
+    server_options = {
+        'latency': args.latency,
+        'seconds_per_char': args.seconds_per_char,
+        'jitter': args.jitter,
+        'error_rate': args.error_rate,
+        'concurrency_limit': args.concurrency_limit,
+        'rate_limit_every': args.rate_limit_every,
+        'retry_after': args.retry_after,
+        'seed': args.seed
+    }
+
+    if args.command == "serve":
+        server = MockElevenLabsServer(('127.0.0.1', args.port), verbose=True, **server_options)
+        log(f"Mock ElevenLabs API listening at {server.base_url}")
+        log(f"Use: set ELEVENLABS_BASE_URL={server.base_url} and ELEVENLABS_API_KEY={MOCK_API_KEY}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    elif args.command == "benchmark":
+        results = run_benchmark(args.concurrency, args.sentences, args.input, server_options)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            log(f"Results saved to {args.json}")
+        sys.exit(0 if len(results) == len(args.concurrency) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Lokalna atrapa API OpenAI do sprawdzania skryptów bez płacenia za prawdziwe zapytania.
+# Skrypty używają klienta OpenAI, więc wystarczy ustawić OPENAI_BASE_URL na adres atrapy.
+MOCK_API_KEY = 'sk-mock-local'
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024  # Jak w prawdziwym API
+SEGMENT_SECONDS = 5.0                # Długość segmentów zwracanych przez atrapę
+
+def log(message):
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+def parse_multipart(content_type, body):
+    """Zwraca słownik nazwa pola -> bajty z ciała multipart/form-data."""
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode('utf-8') + body
+    )
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        if name:
+            fields[name] = part.get_payload(decode=True)
+    return fields
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """Obsługuje endpointy używane przez skrypty projektu."""
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            log(f"[MOCK] {format % args}")
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message, error_type='invalid_request_error'):
+        self.send_json(status, {'error': {'message': message, 'type': error_type, 'code': None}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.record_request(self.path)
+
+        if self.server.should_rate_limit():
+            self.send_response(429)
+            body = json.dumps({'error': {'message': 'Rate limit reached (mock)', 'type': 'requests',
+                                         'code': 'rate_limit_exceeded'}}).encode('utf-8')
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Retry-After', str(self.server.retry_after))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if self.path.rstrip('/').endswith('/audio/transcriptions'):
+            self.handle_transcription(body)
+        elif self.path.rstrip('/').endswith('/chat/completions'):
+            self.handle_chat_completion(body)
+        else:
+            self.send_error_json(404, f"Unknown endpoint: {self.path}")
+
+    def handle_transcription(self, body):
+        fields = parse_multipart(self.headers.get('Content-Type', ''), body)
+        audio = fields.get('file')
+        if audio is None:
+            self.send_error_json(400, "Missing 'file' field")
+            return
+        if len(audio) > self.server.max_upload_bytes:
+            self.send_error_json(413, f"Maximum content size limit ({self.server.max_upload_bytes}) exceeded")
+            return
+
+        duration = self.server.audio_duration(audio)
+        with self.server.track_active():
+            # Czas "przetwarzania" rośnie z długością audio, jak w prawdziwym API
+            time.sleep(self.server.latency + duration * self.server.seconds_per_audio_second)
+
+        segments = []
+        start = 0.0
+        while start < duration:
+            end = min(start + SEGMENT_SECONDS, duration)
+            segments.append({
+                'id': len(segments), 'seek': 0, 'start': start, 'end': end,
+                'text': f" Segment {len(segments) + 1}.", 'tokens': [], 'temperature': 0.0,
+                'avg_logprob': -0.2, 'compression_ratio': 1.0, 'no_speech_prob': 0.0
+            })
+            start = end
+
+        self.send_json(200, {
+            'task': 'transcribe',
+            'language': 'polish',
+            'duration': duration,
+            'text': ''.join(segment['text'] for segment in segments).strip(),
+            'segments': segments
+        })
+
+    def handle_chat_completion(self, body):
+        request = json.loads(body)
+        content = request['messages'][-1]['content']
+        with self.server.track_active():
+            time.sleep(self.server.latency)
+
+        if (request.get('response_format') or {}).get('type') == 'json_object':
+            reply = json.dumps({'segments': [
+                {'id': segment['id'], 'text': f"[EN] {segment['text']}"}
+                for segment in json.loads(content)['segments'] if not self.server.should_drop_segment()
+            ]}, ensure_ascii=False)
+        else:
+            reply = mock_translate(content)
+        self.send_json(200, {
+            'id': f"chatcmpl-mock-{self.server.requests.get(self.path, 0)}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'gpt-4o'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': reply},
+                'finish_reason': 'stop'
+            }],
+            'usage': {'prompt_tokens': len(content) // 4, 'completion_tokens': len(reply) // 4,
+                      'total_tokens': (len(content) + len(reply)) // 4}
+        })
+
+def mock_translate(text):
+    """"Tłumaczenie" atrapy: zachowuje timestampy i format, a przed zdaniem dokleja [EN]."""
+    lines = []
+    for line in text.split('\n'):
+        if 'Sentence: ' in line:
+            prefix, sentence = line.split('Sentence: ', 1)
+            line = f"{prefix}Sentence: [EN] {sentence}"
+        lines.append(line)
+    return '\n'.join(lines)
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.2, seconds_per_audio_second=0.0,
+                 max_upload_bytes=MAX_UPLOAD_BYTES, verbose=False, rate_limit_every=0, retry_after=0.2,
+                 drop_segment_every=0):
+        super().__init__(address, MockOpenAIHandler)
+        # W trybie JSON co drop_segment_every-ty segment znika z odpowiedzi (0 = wyłączone)
+        self.drop_segment_every = drop_segment_every
+        self.segments_seen = 0
+        self.segments_dropped = 0
+        # Co rate_limit_every-te zapytanie dostaje 429 z nagłówkiem Retry-After (0 = wyłączone)
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.rate_limited = 0
+        self.total_requests = 0
+        self.latency = latency
+        self.seconds_per_audio_second = seconds_per_audio_second
+        self.max_upload_bytes = max_upload_bytes
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.active = 0
+        self.max_active = 0
+
+    def record_request(self, path):
+        with self.lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def should_rate_limit(self):
+        with self.lock:
+            self.total_requests += 1
+            if self.rate_limit_every and self.total_requests % self.rate_limit_every == 0:
+                self.rate_limited += 1
+                return True
+        return False
+
+    def should_drop_segment(self):
+        with self.lock:
+            self.segments_seen += 1
+            if self.drop_segment_every and self.segments_seen % self.drop_segment_every == 0:
+                self.segments_dropped += 1
+                return True
+        return False
+
+    def track_active(self):
+        server = self
+
+        class _Active:
+            def __enter__(self):
+                with server.lock:
+                    server.active += 1
+                    server.max_active = max(server.max_active, server.active)
+
+            def __exit__(self, *exc_info):
+                with server.lock:
+                    server.active -= 1
+
+        return _Active()
+
+    def audio_duration(self, audio):
+        """Długość przesłanego audio według ffprobe (albo szacunek z rozmiaru MP3)."""
+        from audio_chunking import probe_duration
+        with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as tmp:
+            tmp.write(audio)
+        try:
+            duration = probe_duration(tmp.name)
+        finally:
+            os.unlink(tmp.name)
+        return duration if duration > 0 else len(audio) * 8 / 32000  # ~32 kbps
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/v1"
+
+def start_mock_server(port=0, **kwargs):
+    """Uruchamia atrapę w wątku w tle i zwraca serwer (port=0 - wolny port)."""
+    server = MockOpenAIServer(('127.0.0.1', port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def read_sentences(path):
+    import re
+    sentences = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            match = re.match(r'Start: ([\d.]+), End: ([\d.]+), Sentence: (.+)', line)
+            if match:
+                sentences.append((float(match.group(1)), float(match.group(2)), match.group(3)))
+    return sentences
+
+def check_transcription(video_path, parallel, latency, seconds_per_audio_second, max_upload_mb):
+    """
+    Uruchamia transcribe_api.process_video_api na atrapie - raz jednym uploadem, raz w trybie
+    równoległym - i sprawdza, że scalone segmenty mają rosnące timestampy pokrywające całe nagranie.
+    """
+    from audio_chunking import probe_duration
+
+    server = start_mock_server(latency=latency, seconds_per_audio_second=seconds_per_audio_second,
+                               max_upload_bytes=int(max_upload_mb * 1024 * 1024))
+    os.environ['OPENAI_BASE_URL'] = server.base_url
+    log(f"Mock OpenAI API running at {server.base_url}")
+
+    import transcribe_api
+    if max_upload_mb * 1024 * 1024 < transcribe_api.MAX_UPLOAD_BYTES:
+        transcribe_api.MAX_UPLOAD_BYTES = int(max_upload_mb * 1024 * 1024 * 0.95)
+
+    duration = probe_duration(video_path)
+    failures = []
+    timings = {}
+    for mode in (1, parallel):
+        server.max_active = 0
+        start_time = time.time()
+        result = transcribe_api.process_video_api(video_path, MOCK_API_KEY, mode, use_cache=False)
+        timings[mode] = time.time() - start_time
+        if not result:
+            failures.append(f"parallel={mode}: transcription failed")
+            continue
+
+        sentences = read_sentences(result)
+        starts = [start for start, _, _ in sentences]
+        if starts != sorted(starts):
+            failures.append(f"parallel={mode}: segment start times are not increasing")
+        if sentences and abs(sentences[-1][1] - duration) > 1.0:
+            failures.append(f"parallel={mode}: last segment ends at {sentences[-1][1]:.2f}s, audio is {duration:.2f}s")
+        log(f"parallel={mode}: {len(sentences)} segments in {timings[mode]:.1f}s "
+            f"(max concurrent requests: {server.max_active})")
+
+    server.shutdown()
+    print("-" * 60)
+    if parallel in timings and 1 in timings and timings[parallel] > 0:
+        log(f"Speedup with parallel={parallel}: {timings[1] / timings[parallel]:.1f}x")
+    if failures:
+        for failure in failures:
+            log(f"[BLAD] {failure}")
+        return False
+    log("[OK] Mock transcription check passed")
+    return True
+
+def check_translation(sentences_count, concurrency, latency, rate_limit_every, chunk_tokens,
+                      json_segments=False, drop_segment_every=0):
+    """
+    Uruchamia translate.translate_chunks na atrapie (z symulowanymi 429) i sprawdza,
+    że każda linia wróciła przetłumaczona, w oryginalnej kolejności i z timestampami.
+    json_segments - sprawdza tryb JSON (translate_with_memory z json_mode, bez pamięci), opcjonalnie z gubionymi segmentami.
+    """
+    server = start_mock_server(latency=latency, rate_limit_every=rate_limit_every,
+                               drop_segment_every=drop_segment_every)
+    os.environ['OPENAI_BASE_URL'] = server.base_url
+    os.environ.setdefault('OPENAI_API_KEY', MOCK_API_KEY)
+    log(f"Mock OpenAI API running at {server.base_url}")
+
+    import translate
+    translate.OPENAI_API_KEY = translate.OPENAI_API_KEY or MOCK_API_KEY
+    source_lines = [
+        f"Start: {i * 3:.2f}, End: {i * 3 + 2.5:.2f}, Sentence: Zdanie numer {i}."
+        for i in range(sentences_count)
+    ]
+    chunks = translate.pack_chunks('\n'.join(source_lines), input_budget=chunk_tokens)
+
+    failures = []
+    timings = {}
+    for mode in (1, concurrency):
+        server.max_active = 0
+        server.rate_limited = 0
+        start_time = time.time()
+        server.segments_dropped = 0
+        if json_segments:
+            translated = translate.translate_with_memory('\n'.join(source_lines), concurrency=mode,
+                                                         input_budget=chunk_tokens, json_mode=True)
+            output_lines = translated.split('\n')
+        else:
+            translated = translate.translate_chunks(chunks, concurrency=mode)
+            output_lines = '\n'.join(translated).split('\n')
+        timings[mode] = time.time() - start_time
+
+        expected = [mock_translate(line) for line in source_lines]
+        if output_lines != expected:
+            failures.append(f"concurrency={mode}: output lines differ from the expected order/content")
+        log(f"concurrency={mode}: {len(chunks)} chunks in {timings[mode]:.1f}s "
+            f"(max concurrent requests: {server.max_active}, 429 responses: {server.rate_limited}, "
+            f"dropped segments: {server.segments_dropped})")
+        if mode > 1 and server.max_active > mode:
+            failures.append(f"concurrency={mode}: {server.max_active} requests in flight")
+
+    server.shutdown()
+    print("-" * 60)
+    if timings.get(concurrency):
+        log(f"Speedup with concurrency={concurrency}: {timings[1] / timings[concurrency]:.1f}x")
+    if failures:
+        for failure in failures:
+            log(f"[BLAD] {failure}")
+        return False
+    log("[OK] Mock translation check passed")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the OpenAI API endpoints used by this project.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Run the mock server in the foreground")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--latency", type=float, default=0.2, help="Fixed latency per request (s)")
+    serve_parser.add_argument("--seconds-per-audio-second", type=float, default=0.01,
+                              help="Extra transcription latency per second of uploaded audio")
+    serve_parser.add_argument("--max-upload-mb", type=float, default=25.0)
+    serve_parser.add_argument("--rate-limit-every", type=int, default=0,
+                              help="Answer every N-th request with 429 (0 = never)")
+
+    check_parser = subparsers.add_parser("check-transcription",
+                                         help="Run transcribe_api.py against the mock and verify merged segments")
+    check_parser.add_argument("video_path", help="Video or audio file used as input")
+    check_parser.add_argument("--parallel", type=int, default=4)
+    check_parser.add_argument("--latency", type=float, default=0.2)
+    check_parser.add_argument("--seconds-per-audio-second", type=float, default=0.01)
+    check_parser.add_argument("--max-upload-mb", type=float, default=25.0,
+                              help="Lower this to force size-based splitting on short fixtures")
+
+    translation_parser = subparsers.add_parser("check-translation",
+                                               help="Run translate.py chunks against the mock and verify the output")
+    translation_parser.add_argument("--sentences", type=int, default=400)
+    translation_parser.add_argument("--concurrency", type=int, default=4)
+    translation_parser.add_argument("--latency", type=float, default=0.3)
+    translation_parser.add_argument("--rate-limit-every", type=int, default=5,
+                                    help="Answer every N-th request with 429 (0 = never)")
+    translation_parser.add_argument("--chunk-tokens", type=int, default=500,
+                                    help="Input token budget passed to translate.pack_chunks")
+    translation_parser.add_argument("--json-segments", action="store_true",
+                                    help="Check the JSON segment mode instead of free-form chunks")
+    translation_parser.add_argument("--drop-segment-every", type=int, default=0,
+                                    help="JSON mode: omit every N-th segment from responses (0 = never)")
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = MockOpenAIServer(('127.0.0.1', args.port), latency=args.latency,
+                                  seconds_per_audio_second=args.seconds_per_audio_second,
+                                  max_upload_bytes=int(args.max_upload_mb * 1024 * 1024), verbose=True,
+                                  rate_limit_every=args.rate_limit_every)
+        log(f"Mock OpenAI API listening at {server.base_url}")
+        log(f"Use: set OPENAI_BASE_URL={server.base_url} and OPENAI_API_KEY={MOCK_API_KEY}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    elif args.command == "check-transcription":
+        if not Path(args.video_path).exists():
+            log(f"Error: file does not exist: {args.video_path}")
+            sys.exit(1)
+        ok = check_transcription(args.video_path, args.parallel, args.latency,
+                                 args.seconds_per_audio_second, args.max_upload_mb)
+        sys.exit(0 if ok else 1)
+    elif args.command == "check-translation":
+        ok = check_translation(args.sentences, args.concurrency, args.latency,
+                               args.rate_limit_every, args.chunk_tokens,
+                               args.json_segments, args.drop_segment_every)
+        sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
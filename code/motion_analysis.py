@@ -0,0 +1,67 @@
+import cv2
+
+# Odczyt wybranych klatek wideo jednym przejściem dekodera.
+# cap.set(CAP_PROP_POS_FRAMES, n) przed każdą próbką zmusza dekoder H.264 do startu
+# od poprzedniej klatki kluczowej, więc przy GOP 250 każda próbka kosztuje do 250 dekodowań.
+# FrameReader idzie do przodu: klatki pomijane tylko grab() (dekodowanie bez konwersji
+# do BGR), klatki do analizy grab() + retrieve(). Skok dalej niż max_skip_seconds
+# (np. między odległymi fragmentami ciszy) robi jednym seekiem - to tańsze niż
+# dekodowanie całego fragmentu mowy pomiędzy.
+MAX_SKIP_SECONDS = 10.0
+
+class FrameReader:
+    """
+    Zwraca klatki o rosnących numerach (read). Żądanie klatki wcześniejszej niż bieżąca
+    pozycja jest obsługiwane seekiem, więc kolejność próbek warto posortować.
+    Liczniki: decoded (klatki zdekodowane przez grab() przy czytaniu do przodu), retrieved
+    (klatki do analizy) i seeks. decoded nie obejmuje pracy po skoku: po CAP_PROP_POS_FRAMES
+    OpenCV dekoduje wewnętrznie od poprzedniej klatki kluczowej (przy GOP 250 do 250 klatek),
+    a tych klatek nie widać - koszt skoków to osobny sygnał, liczba seeks.
+    """
+
+    def __init__(self, video_path, max_skip_seconds=MAX_SKIP_SECONDS):
+        self.cap = cv2.VideoCapture(video_path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.max_skip_frames = int(max_skip_seconds * self.fps)
+        self.position = 0          # Numer klatki, którą zwróci następny grab()
+        self.last_frame_num = None
+        self.last_frame = None
+        self.decoded = 0           # Tylko grab() - bez dekodowania wewnątrz seeków
+        self.retrieved = 0
+        self.seeks = 0
+
+    def _seek(self, frame_num):
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
+        self.position = frame_num
+        self.seeks += 1
+
+    def read(self, frame_num):
+        """Zwraca klatkę frame_num (BGR) albo None po końcu wideo."""
+        if frame_num == self.last_frame_num:
+            return self.last_frame
+        if frame_num < self.position or frame_num - self.position > self.max_skip_frames:
+            self._seek(frame_num)
+
+        while self.position < frame_num:
+            if not self.cap.grab():
+                return None
+            self.position += 1
+            self.decoded += 1
+
+        if not self.cap.grab():
+            return None
+        self.position += 1
+        self.decoded += 1
+        ret, frame = self.cap.retrieve()
+        if not ret:
+            return None
+        self.retrieved += 1
+        self.last_frame_num, self.last_frame = frame_num, frame
+        return frame
+
+    def summary(self):
+        return (f"{self.decoded} klatek zdekodowanych po kolei, {self.retrieved} analizowanych, "
+                f"{self.seeks} skoków (każdy dodatkowo dekoduje od poprzedniej klatki kluczowej)")
+
+    def release(self):
+        self.cap.release()
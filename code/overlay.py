@@ -3,6 +3,7 @@ import argparse
 from pathlib import Path
 from moviepy.editor import VideoFileClip, AudioFileClip, CompositeAudioClip
 from pydub import AudioSegment
+from audio_index import read_durations
 
 def read_translated_file(file_path):
     with open(file_path, 'r', encoding='utf-8') as file:
@@ -35,9 +36,9 @@ def adjust_timestamps(timestamps, audio_durations):
 def synchronize_audio_with_video(video_file_path, timestamps, audio_dir, output_video_path):
     video_clip = VideoFileClip(str(video_file_path))
     audio_clips = []
-    audio_durations = []
+    audio_paths = []
 
-    # First, get all audio durations
+    # First, check all audio files
     for i, (start, end) in enumerate(timestamps):
         audio_file_path = audio_dir / f"output_audio_{i}.mp3"
         
@@ -48,8 +49,10 @@ def synchronize_audio_with_video(video_file_path, timestamps, audio_dir, output_
             print(f"Error: Audio file {audio_file_path} does not exist.")
             return  # Przerwij działanie skryptu, jeśli plik nie istnieje
         
-        audio_clip = AudioFileClip(str(audio_file_path))
-        audio_durations.append(audio_clip.duration)
+        audio_paths.append(audio_file_path)
+
+    # Długości z indeksu durations.json zapisanego przez generate.py - bez otwierania każdego pliku
+    audio_durations = read_durations(audio_paths, audio_dir)
 
     # Reszta funkcji pozostaje bez zmian
     adjusted_timestamps = adjust_timestamps(timestamps, audio_durations)
@@ -1,10 +1,29 @@
 import subprocess
 import argparse
+import os
+import sys
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import json
 import re
 from datetime import datetime
 
+import numpy as np
+
+from audio_chunking import decode_audio_samples, probe_duration
+from audio_index import read_durations
+from ffmpeg_commands import FfmpegCommand, escape_filter_value
+
+# Silnik "timeline": każdy klip dekodowany raz do float32 i wpisany w jeden bufor osi czasu
+# w swoim punkcie startu (nakładające się fragmenty są sumowane - bez normalizacji głośności
+# jak w amix). Bufor trafia do ffmpeg jako surowe PCM, kodowany raz do AAC, wideo kopiowane.
+MIX_SAMPLE_RATE = 44100   # ElevenLabs zwraca mp3 44.1kHz
+DECODE_WORKERS = min(8, os.cpu_count() or 4)   # Ile klipów dekodujemy jednocześnie (osobne procesy ffmpeg)
+MP3_BITRATE = 128000      # Bitrate mp3 z ElevenLabs - do szacowania długości klipu z rozmiaru pliku
+ENGINES = ('timeline', 'amix')
+
 def read_translated_file(file_path):
     """Wczytuje plik z timestampami i zdaniami."""
     with open(file_path, 'r', encoding='utf-8') as file:
@@ -24,10 +43,129 @@ def read_translated_file(file_path):
 
     return timestamps, sentences
 
-def overlay_audio_fast(video_file_path, timestamps, audio_dir, output_video_path):
+def adjust_timestamps(timestamps, audio_durations):
+    """
+    Dopasowuje timestampy żeby audio się nie nakładało (jak overlay_fixed.adjust_timestamps):
+    zdanie zaczyna się w swoim timestampie albo zaraz po końcu poprzedniego nagrania.
+    """
+    adjusted_timestamps = []
+    current_time = 0
+
+    for i, ((start, end), duration) in enumerate(zip(timestamps, audio_durations)):
+        adjusted_start = max(start, current_time)
+        adjusted_timestamps.append((adjusted_start, adjusted_start + duration))
+        current_time = adjusted_start + duration
+        if adjusted_start != start:
+            print(f"Adjusted segment {i}: {start}s -> {adjusted_start:.2f}s (prevented overlap)")
+
+    return adjusted_timestamps
+
+def render_timeline(audio_files, timeline_path, total_seconds, sample_rate=MIX_SAMPLE_RATE, prevent_overlap=True,
+                    durations=None):
+    """
+    Dekoduje klipy (audio_file, start, end) i wpisuje je w bufor float32 mono o długości
+    total_seconds. Bufor to memmap w pliku timeline_path, więc godzinny wykład nie zajmuje
+    ~600 MB RAM. Klipy są wpisywane po kolei, więc przy prevent_overlap start każdego
+    przesuwamy za koniec poprzedniego (adjust_timestamps) bez osobnego czytania długości.
+    durations - długości klipów z indeksu audio_index (rozmiar bufora dekodowania); bez nich
+    szacujemy je z rozmiaru pliku.
+    Zwraca faktyczne (start, koniec) klipów.
+    """
+    total_samples = max(1, int(total_seconds * sample_rate))
+    timeline = np.memmap(timeline_path, dtype=np.float32, mode='w+', shape=(total_samples,))
+    placed = []
+
+    def place(item, future):
+        audio_file, start, end = item
+        clip = future.result()
+        duration = len(clip) / sample_rate
+        if prevent_overlap and placed and placed[-1][1] > start:
+            # To samo co adjust_timestamps, liczone na bieżąco z długości zdekodowanego klipu
+            print(f"Adjusted segment {len(placed)}: {start}s -> {placed[-1][1]:.2f}s (prevented overlap)")
+            start = placed[-1][1]
+        placed.append((start, start + duration))
+        offset = int(round(start * sample_rate))
+        if offset >= total_samples:
+            print(f"[UWAGA] {audio_file.name} zaczyna się po końcu wideo ({start:.2f}s) - pominięty")
+            return
+        length = min(len(clip), total_samples - offset)
+        timeline[offset:offset + length] += clip[:length]
+
+    with ThreadPoolExecutor(max_workers=DECODE_WORKERS) as executor:
+        # Przesuwne okno zadań - w pamięci są naraz najwyżej 2 x DECODE_WORKERS zdekodowane klipy
+        pending = deque()
+        for i, item in enumerate(audio_files):
+            # Długość z indeksu albo szacowana z rozmiaru zamiast ffprobe - jeden proces na klip zamiast dwóch
+            estimate = durations[i] if durations else item[0].stat().st_size * 8 / MP3_BITRATE
+            pending.append((item, executor.submit(decode_audio_samples, item[0], sample_rate, estimate)))
+            if len(pending) >= 2 * DECODE_WORKERS:
+                place(*pending.popleft())
+        while pending:
+            place(*pending.popleft())
+
+    # Przycinanie blokami, żeby nie tworzyć kopii całej osi czasu w RAM
+    peak = 0.0
+    block = sample_rate * 60
+    for offset in range(0, total_samples, block):
+        part = timeline[offset:offset + block]
+        peak = max(peak, float(np.max(np.abs(part))))
+        np.clip(part, -1.0, 1.0, out=part)
+    if peak > 1.0:
+        print(f"[UWAGA] Nakładające się klipy przesterowywały (szczyt {peak:.2f}) - przycięto do [-1, 1]")
+    timeline.flush()
+    del timeline
+    return placed
+
+def overlay_audio_timeline(video_file_path, audio_files, output_video_path, prevent_overlap=True, durations=None):
+    """Nakłada klipy silnikiem timeline: jeden bufor PCM, jedno kodowanie AAC, wideo bez rekodowania."""
+    start_time = datetime.now()
+    total_seconds = probe_duration(video_file_path) or max(end for _, _, end in audio_files)
+
+    with tempfile.TemporaryDirectory(prefix='overlay_') as temp_dir:
+        timeline_path = os.path.join(temp_dir, 'timeline.f32')
+        print(f"[INFO] Dekodowanie {len(audio_files)} klipów do osi czasu ({total_seconds:.1f}s)...")
+        placed = render_timeline(audio_files, timeline_path, total_seconds, prevent_overlap=prevent_overlap,
+                                 durations=durations)
+        shifted = sum(1 for (_, start, _), (placed_start, _) in zip(audio_files, placed) if placed_start != start)
+        if shifted:
+            print(f"[INFO] Przesunięto {shifted} zdań, żeby nagrania się nie nakładały")
+        print(f"[INFO] Oś czasu gotowa w {(datetime.now() - start_time).total_seconds():.1f}s, kodowanie AAC...")
+
+        cmd = [
+            'ffmpeg',
+            '-i', str(video_file_path),
+            '-f', 'f32le', '-ar', str(MIX_SAMPLE_RATE), '-ac', '1', '-i', timeline_path,
+            '-map', '0:v',   # Video z pierwszego inputu
+            '-map', '1:a',   # Audio z osi czasu
+            '-c:v', 'copy',  # Kopiuj video bez rekodowania (szybko!)
+            '-c:a', 'aac',   # Koduj audio do AAC
+            '-shortest',
+            '-y',
+            str(output_video_path)
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+
+    if result.returncode != 0:
+        print(f"[BLAD] Błąd ffmpeg:")
+        print(result.stderr)
+        return False
+
+    duration = (datetime.now() - start_time).total_seconds()
+    print(f"\n[SUKCES] Audio zostało nałożone w {duration:.1f} sekund!")
+    print(f"[INFO] Plik zapisany: {output_video_path}")
+    if Path(output_video_path).exists():
+        size_mb = Path(output_video_path).stat().st_size / (1024 * 1024)
+        print(f"[INFO] Rozmiar pliku: {size_mb:.1f} MB")
+    return True
+
+def overlay_audio_fast(video_file_path, timestamps, audio_dir, output_video_path, engine='timeline',
+                       prevent_overlap=True):
     """
     Szybka wersja nakładania audio używająca bezpośrednio ffmpeg.
     Znacznie szybsza od MoviePy.
+    engine - 'timeline' (bufor float32, skaluje się do setek klipów) albo 'amix'
+    (filtr adelay + amix, jeden -i na zdanie; głośność dzielona przez liczbę klipów).
+    prevent_overlap - przesuwa zdania za koniec poprzedniego nagrania (jak overlay_fixed.py).
     """
     print(f"[INFO] Szybkie nakładanie audio na video: {video_file_path}")
     video_file_path = Path(video_file_path)
@@ -56,53 +194,54 @@ def overlay_audio_fast(video_file_path, timestamps, audio_dir, output_video_path
     
     print(f"[INFO] Znaleziono {len(audio_files)} plików audio")
     
-    # Utwórz filter complex dla ffmpeg
-    inputs = ['-i', str(video_file_path)]
-    filter_parts = []
-    audio_inputs = []
+    # Długości wszystkich klipów jednym odczytem indeksu durations.json (generate.py)
+    durations = read_durations([audio_file for audio_file, _, _ in audio_files], audio_dir)
+    
+    if engine == 'timeline':
+        try:
+            if overlay_audio_timeline(video_file_path, audio_files, output_video_path, prevent_overlap, durations):
+                return True
+        except (OSError, RuntimeError) as e:
+            print(f"[BLAD] Błąd silnika timeline: {e}")
+        print("[INFO] Próbuję fallback do MoviePy...")
+        return overlay_audio_moviepy_fallback(video_file_path, timestamps, audio_dir, output_video_path,
+                                              prevent_overlap, durations)
+    
+    if prevent_overlap:
+        adjusted = adjust_timestamps([(start, end) for _, start, end in audio_files], durations)
+        audio_files = [(audio_file, start, end) for (audio_file, _, _), (start, end) in zip(audio_files, adjusted)]
     
-    # Dodaj wszystkie pliki audio jako inputy
+    # Graf: pliki audio jako źródła amovie (zamiast -i na zdanie), opóźnione do swoich startów.
+    # Przy setkach zdań graf trafia do pliku -filter_complex_script (limit linii poleceń Windows).
+    command = FfmpegCommand()
+    command.add_input(video_file_path.resolve())
     for i, (audio_file, start, end) in enumerate(audio_files):
-        inputs.extend(['-i', str(audio_file)])
-        audio_inputs.append(f"[{i+1}:a]")
-        # Opóźnij audio o odpowiedni czas
-        filter_parts.append(f"[{i+1}:a]adelay={int(start*1000)}|{int(start*1000)}[a{i}]")
+        delay = int(start * 1000)
+        command.add_filter(f"amovie=filename={escape_filter_value(audio_file.resolve())},"
+                           f"adelay={delay}|{delay}[a{i}]")
     
     # Połącz wszystkie audio z opóźnieniami
     if len(audio_files) == 1:
-        mix_filter = filter_parts[0].replace(f"[a0]", "[mixed]")
+        command.add_filter("[a0]anull[mixed]")
     else:
         # Miksuj wszystkie audio razem
         audio_refs = ''.join([f"[a{i}]" for i in range(len(audio_files))])
-        filter_parts.append(f"{audio_refs}amix=inputs={len(audio_files)}:duration=longest[mixed]")
-    
-    # Kompletny filter complex
-    filter_complex = ';'.join(filter_parts)
+        command.add_filter(f"{audio_refs}amix=inputs={len(audio_files)}:duration=longest[mixed]")
     
-    # Komenda ffmpeg
-    cmd = [
-        'ffmpeg',
-        *inputs,
-        '-filter_complex', filter_complex,
+    output_args = [
         '-map', '0:v',  # Video z pierwszego inputu
         '-map', '[mixed]',  # Zmiksowane audio
         '-c:v', 'copy',  # Kopiuj video bez rekodowania (szybko!)
         '-c:a', 'aac',   # Koduj audio do AAC
-        '-shortest',     # Zakończ gdy najkrótszy stream się skończy
-        '-y',           # Nadpisz plik wyjściowy
-        str(output_video_path)
+        '-shortest'      # Zakończ gdy najkrótszy stream się skończy
     ]
     
     print("[INFO] Uruchamianie ffmpeg...")
-    print(f"[DEBUG] Komenda: {' '.join(cmd[:10])}... (skrócone)")
     
     start_time = datetime.now()
     
     try:
-        result = subprocess.run(cmd, 
-                              capture_output=True, 
-                              text=True, 
-                              cwd=str(video_file_path.parent))
+        result = command.run(output_video_path.resolve(), *output_args, cwd=str(video_file_path.parent))
         
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
@@ -123,16 +262,21 @@ def overlay_audio_fast(video_file_path, timestamps, audio_dir, output_video_path
             
             # Fallback do MoviePy jeśli ffmpeg nie zadziała
             print("[INFO] Próbuję fallback do MoviePy...")
-            return overlay_audio_moviepy_fallback(video_file_path, timestamps, audio_dir, output_video_path)
+            return overlay_audio_moviepy_fallback(video_file_path, timestamps, audio_dir, output_video_path,
+                                                  prevent_overlap, durations)
             
     except Exception as e:
         print(f"[BLAD] Błąd uruchamiania ffmpeg: {e}")
         print("[INFO] Próbuję fallback do MoviePy...")
-        return overlay_audio_moviepy_fallback(video_file_path, timestamps, audio_dir, output_video_path)
+        return overlay_audio_moviepy_fallback(video_file_path, timestamps, audio_dir, output_video_path,
+                                              prevent_overlap, durations)
 
-def overlay_audio_moviepy_fallback(video_file_path, timestamps, audio_dir, output_video_path):
+def overlay_audio_moviepy_fallback(video_file_path, timestamps, audio_dir, output_video_path, prevent_overlap=True,
+                                   durations=None):
     """
     Fallback do MoviePy gdy ffmpeg nie działa.
+    prevent_overlap - przesuwa zdania jak silniki ffmpeg (adjust_timestamps); durations - długości
+    z indeksu audio_index, bez nich brane z wczytanych klipów.
     """
     try:
         from moviepy.editor import VideoFileClip, AudioFileClip, CompositeAudioClip
@@ -144,12 +288,19 @@ def overlay_audio_moviepy_fallback(video_file_path, timestamps, audio_dir, outpu
         audio_clips = []
         
         # Wczytaj pliki audio
+        loaded = []
         for i, (start, end) in enumerate(timestamps):
             audio_file_path = audio_dir / f"output_audio_{i}.mp3"
             if audio_file_path.exists():
-                audio_clip = AudioFileClip(str(audio_file_path))
-                audio_clip = audio_clip.set_start(start)
-                audio_clips.append(audio_clip)
+                loaded.append(((start, end), AudioFileClip(str(audio_file_path))))
+        
+        starts = [start for (start, _), _ in loaded]
+        if prevent_overlap:
+            if durations is None or len(durations) != len(loaded):
+                durations = [clip.duration for _, clip in loaded]
+            starts = [start for start, _ in adjust_timestamps([span for span, _ in loaded], durations)]
+        for start, (_, audio_clip) in zip(starts, loaded):
+            audio_clips.append(audio_clip.set_start(start))
         
         # Połącz audio
         final_audio = CompositeAudioClip(audio_clips)
@@ -191,6 +342,10 @@ def main():
     parser.add_argument("input_file", help="Path to the input text file")
     parser.add_argument("video_file", help="Path to the input video file")
     parser.add_argument("--audio_dir", default="generated", help="Directory containing generated audio files")
+    parser.add_argument("--engine", choices=ENGINES, default="timeline",
+                        help="timeline - decode clips into one PCM buffer (default), amix - ffmpeg adelay/amix graph")
+    parser.add_argument("--allow-overlap", action="store_true",
+                        help="Place every clip at its own timestamp even if it overlaps the previous one")
     args = parser.parse_args()
 
     input_file = Path(args.input_file)
@@ -209,33 +364,36 @@ def main():
     # Sprawdź pliki
     if not input_file.exists():
         print(f"[BLAD] Plik tłumaczenia nie istnieje: {input_file}")
-        return
+        sys.exit(1)
     
     if not video_file.exists():
         print(f"[BLAD] Plik video nie istnieje: {video_file}")
-        return
+        sys.exit(1)
     
     if not audio_dir.exists():
         print(f"[BLAD] Folder audio nie istnieje: {audio_dir}")
-        return
+        sys.exit(1)
 
     timestamps, _ = read_translated_file(input_file)
     
     if not timestamps:
         print("[BLAD] Brak timestampów w pliku tłumaczenia!")
-        return
+        sys.exit(1)
 
     try:
-        success = overlay_audio_fast(video_file, timestamps, audio_dir, output_video_path)
+        success = overlay_audio_fast(video_file, timestamps, audio_dir, output_video_path, args.engine,
+                                     not args.allow_overlap)
         
         if success:
             print(f"\n[SUKCES] Proces zakończony pomyślnie!")
             print(f"[INFO] Wynikowy plik: {output_video_path}")
         else:
             print(f"\n[BLAD] Proces zakończony błędem!")
+            sys.exit(1)  # KOMBO sprawdza kod wyjścia
             
     except Exception as e:
         print(f"[BLAD] Nieoczekiwany błąd: {e}")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,6 +2,7 @@ import os
 import re
 import argparse
 from pathlib import Path
+from audio_index import read_durations
 
 try:
     from moviepy.editor import VideoFileClip, AudioFileClip, CompositeAudioClip
@@ -86,27 +87,25 @@ def synchronize_audio_with_video(video_file_path, timestamps, audio_dir, output_
         return False
     
     audio_clips = []
-    audio_durations = []
 
-    # Pierwsza pętla: wczytaj wszystkie pliki audio i sprawdź długości
+    # Pierwsza pętla: sprawdź pliki audio, długości z indeksu durations.json (bez otwierania plików)
     print("\n--- Checking audio files ---")
+    audio_paths = []
     for i, (start, end) in enumerate(timestamps):
         audio_file_path = audio_dir / f"output_audio_{i}.mp3"
         
-        print(f"Checking audio file {i}: {audio_file_path}")
-        
         if not audio_file_path.exists():
             print(f"[BLAD] Error: Audio file {audio_file_path} does not exist.")
             return False
-        
-        try:
-            audio_clip = AudioFileClip(str(audio_file_path))
-            audio_durations.append(audio_clip.duration)
-            print(f"[OK] Audio {i}: {audio_clip.duration:.2f}s")
-            audio_clip.close()  # Zwolnij pamięć
-        except Exception as e:
-            print(f"[BLAD] Error loading audio file {i}: {e}")
-            return False
+        audio_paths.append(audio_file_path)
+
+    try:
+        audio_durations = read_durations(audio_paths, audio_dir)
+    except Exception as e:
+        print(f"[BLAD] Error reading audio durations: {e}")
+        return False
+    for i, duration in enumerate(audio_durations):
+        print(f"[OK] Audio {i}: {duration:.2f}s")
 
     # Dopasuj timestampy
     print("\n--- Adjusting timestamps ---")
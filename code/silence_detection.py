@@ -0,0 +1,217 @@
+import math
+import re
+import subprocess
+from collections import deque
+
+import numpy as np
+
+from audio_chunking import probe_duration
+
+# Wykrywanie ciszy w ścieżce audio wideo bez wczytywania jej w całości do pamięci.
+# ffmpeg dekoduje audio do pipe (s16le, mono), a RMS okien min_silence_len przesuwanych
+# co 1 ms liczymy blokami w NumPy (sumy kwadratów przez cumsum) - ta sama definicja ciszy
+# co w pydub.silence.detect_silence, ale bez pliku WAV i bez pętli w Pythonie po oknach.
+# W pamięci jest tylko bieżący blok i ogon jednego okna, niezależnie od długości wideo.
+# Ten sam rdzeń (iter_pcm_silent_ranges) liczy VAD transcribe_improved.py na audio już w pamięci.
+#
+# Drugi silnik, 'silencedetect', zostawia całe dekodowanie i wykrywanie filtrowi ffmpeg
+# i tylko parsuje jego log. Uwaga: silencedetect uznaje za ciszę fragment, w którym
+# każda próbka ma amplitudę poniżej progu (a nie RMS okna), więc przy szumie tła blisko
+# progu wykrywa mniej niż pydub - porównanie: benchmark_silence.py.
+ENGINES = ('rms', 'silencedetect')
+SAMPLE_RATE = 22050       # Jak w dotychczasowym WAV dla pydub
+BLOCK_SECONDS = 30        # Ile sekund PCM czytamy z pipe ffmpeg na raz
+MAX_AMPLITUDE = 32768     # Pełna skala s16 (0 dBFS)
+SILENCEDETECT_PATTERN = re.compile(r'silence_(start|end): (-?[\d.]+)')
+
+def _frame(ms, sample_rate):
+    """Indeks próbki dla czasu w ms - tak samo jak wycinanie AudioSegment[ms:ms]."""
+    return ms * sample_rate // 1000
+
+def iter_pcm_silent_ranges(blocks, sample_rate, min_silence_len=2000, silence_thresh=-40):
+    """
+    Generator zakresów ciszy [start_ms, end_ms], jak pydub detect_silence (seek_step=1):
+    okno min_silence_len ms jest ciche, gdy jego poziom RMS w dBFS nie przekracza silence_thresh,
+    a nachodzące na siebie ciche okna łączą się w jeden zakres. Zakres jest oddawany,
+    gdy tylko wiadomo, że się skończył.
+    blocks - kolejne bloki próbek mono w skali s16 (pełna skala MAX_AMPLITUDE), dowolnej długości.
+    """
+    window = int(min_silence_len)
+    # pydub porównuje audioop.rms (obcięte do int) z progiem w amplitudzie:
+    # int(sqrt(mean)) <= threshold  <=>  mean < (floor(threshold) + 1) ** 2
+    threshold = 10 ** (silence_thresh / 20) * MAX_AMPLITUDE
+    mean_square_limit = (math.floor(threshold) + 1) ** 2
+
+    pending = np.zeros(0, dtype=np.float64)  # Kwadraty próbek od pending_start
+    pending_start = 0
+    next_ms = 0          # Początek następnego okna do sprawdzenia
+    current = None       # [pierwsze, ostatnie] ciche okno bieżącego zakresu
+
+    def silent_windows(last_ms, total_samples):
+        """Początki cichych okien next_ms..last_ms (okna ucięte na total_samples)."""
+        starts_ms = np.arange(next_ms, last_ms + 1, dtype=np.int64)
+        ends = np.minimum(_frame(starts_ms + window, sample_rate), total_samples) - pending_start
+        starts = np.minimum(_frame(starts_ms, sample_rate) - pending_start, ends)
+        sums = np.concatenate(([0.0], np.cumsum(pending)))
+        counts = ends - starts
+        mean_squares = (sums[ends] - sums[starts]) / np.maximum(counts, 1)
+        return starts_ms[mean_squares < mean_square_limit]
+
+    def merge(silent):
+        """Dołącza ciche okna do bieżącego zakresu; zwraca zakresy, które się zakończyły."""
+        nonlocal current
+        finished = []
+        if len(silent) == 0:
+            return finished
+        breaks = np.flatnonzero(np.diff(silent) > window)
+        firsts = np.concatenate((silent[:1], silent[breaks + 1])).tolist()
+        lasts = np.concatenate((silent[breaks], silent[-1:])).tolist()
+        for first, last in zip(firsts, lasts):
+            if current is not None and first <= current[1] + window:
+                current[1] = last
+            else:
+                if current is not None:
+                    finished.append((current[0], current[1] + window))
+                current = [first, last]
+        return finished
+
+    for block in blocks:
+        pcm = np.asarray(block, dtype=np.float64)
+        pending = np.concatenate((pending, pcm * pcm))
+        total_samples = pending_start + len(pending)
+
+        # Ostatnie okno mieszczące się w całości w odczytanych próbkach: _frame(ms + window) <= total
+        last_ms = ((total_samples + 1) * 1000 - 1) // sample_rate - window
+        if last_ms < next_ms:
+            continue
+        yield from merge(silent_windows(last_ms, total_samples))
+        next_ms = last_ms + 1
+        cut = _frame(next_ms, sample_rate) - pending_start
+        pending = pending[cut:]
+        pending_start += cut
+
+    # Ostatnie okna - pydub sprawdza starty do len(audio) - min_silence_len, z uciętym końcem
+    total_samples = pending_start + len(pending)
+    last_ms = round(1000 * total_samples / sample_rate) - window
+    if last_ms >= next_ms:
+        yield from merge(silent_windows(last_ms, total_samples))
+    if current is not None:
+        yield (current[0], current[1] + window)
+
+def iter_silent_ranges(path, min_silence_len=2000, silence_thresh=-40, sample_rate=SAMPLE_RATE,
+                       block_seconds=BLOCK_SECONDS):
+    """
+    Zakresy ciszy [start_ms, end_ms] ścieżki audio pliku (iter_pcm_silent_ranges na PCM
+    z pipe ffmpeg, blok po bloku). Przy błędzie ffmpeg rzuca RuntimeError.
+    """
+    cmd = [
+        'ffmpeg', '-loglevel', 'error',
+        '-i', str(path),
+        '-vn',
+        '-f', 's16le',
+        '-acodec', 'pcm_s16le',
+        '-ac', '1',
+        '-ar', str(sample_rate),
+        'pipe:1'
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def read_blocks():
+        block_bytes = sample_rate * block_seconds * 2
+        while True:
+            block = process.stdout.read(block_bytes)
+            if not block:
+                break
+            yield np.frombuffer(block, dtype=np.int16)
+        # Błąd ffmpeg przed ostatnimi oknami - nie oddajemy zakresu liczonego z uciętego audio
+        stderr = process.stderr.read()
+        process.wait()
+        if process.returncode != 0:
+            raise RuntimeError(stderr.decode('utf-8', errors='replace'))
+
+    try:
+        yield from iter_pcm_silent_ranges(read_blocks(), sample_rate, min_silence_len, silence_thresh)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+def find_speech_regions(samples, sample_rate, silence_thresh=-40.0, min_silence_len=2.0, margin=0.25,
+                        block_seconds=BLOCK_SECONDS):
+    """
+    VAD dla audio w pamięci (float32 w [-1, 1]) - ta sama definicja ciszy co delete_sm_fast
+    (iter_pcm_silent_ranges): cisza to co najmniej min_silence_len sekund poniżej silence_thresh dBFS.
+    Krótsze pauzy zostają w mowie. Z każdej długiej ciszy zostawiamy margin sekund
+    po obu stronach, żeby nie ucinać końcówek słów.
+    Zwraca listę (start, end) w sekundach fragmentów do zachowania.
+    """
+    total_seconds = len(samples) / sample_rate
+    block = sample_rate * block_seconds
+    blocks = (samples[offset:offset + block] * MAX_AMPLITUDE for offset in range(0, len(samples), block))
+
+    regions = []
+    position = 0.0
+    for start_ms, end_ms in iter_pcm_silent_ranges(blocks, sample_rate, int(min_silence_len * 1000), silence_thresh):
+        start, end = start_ms / 1000, min(end_ms / 1000, total_seconds)
+        cut_start = start + margin if start > 0 else 0.0
+        cut_end = end - margin if end < total_seconds else total_seconds
+        if cut_start > position:
+            regions.append((position, cut_start))
+        position = cut_end
+    if position < total_seconds:
+        regions.append((position, total_seconds))
+
+    return regions
+
+def iter_silencedetect_ranges(path, min_silence_len=2000, silence_thresh=-40):
+    """
+    Generator zakresów ciszy [start_ms, end_ms] z filtra ffmpeg silencedetect
+    (noise=silence_thresh dB, d=min_silence_len ms) - zakresy czytane z logu na bieżąco.
+    Przy błędzie ffmpeg rzuca RuntimeError.
+    """
+    cmd = [
+        'ffmpeg', '-hide_banner', '-nostats',
+        '-i', str(path),
+        '-vn',
+        '-ac', '1',
+        '-af', f'silencedetect=noise={silence_thresh}dB:d={min_silence_len / 1000}',
+        '-f', 'null', '-'
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                               text=True, encoding='utf-8', errors='replace')
+    last_lines = deque(maxlen=20)  # Do komunikatu błędu
+    start = None
+    try:
+        for line in process.stderr:
+            last_lines.append(line)
+            match = SILENCEDETECT_PATTERN.search(line)
+            if not match:
+                continue
+            value = max(0.0, float(match.group(2)))
+            if match.group(1) == 'start':
+                start = value
+            elif start is not None:
+                yield (start * 1000, value * 1000)
+                start = None
+
+        process.wait()
+        if process.returncode != 0:
+            raise RuntimeError(''.join(last_lines))
+        # Starsze ffmpeg nie wypisują silence_end, gdy cisza trwa do końca pliku
+        if start is not None:
+            yield (start * 1000, probe_duration(path) * 1000)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stderr.close()
+
+def iter_silent_ranges_with(engine, path, min_silence_len=2000, silence_thresh=-40):
+    """Zakresy ciszy [start_ms, end_ms] z wybranego silnika (ENGINES)."""
+    if engine == 'silencedetect':
+        return iter_silencedetect_ranges(path, min_silence_len, silence_thresh)
+    if engine == 'rms':
+        return iter_silent_ranges(path, min_silence_len, silence_thresh)
+    raise ValueError(f"Unknown silence detection engine: {engine}")
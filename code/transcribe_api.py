@@ -2,6 +2,7 @@ import os
 import sys
 import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import argparse
 
@@ -26,6 +27,13 @@ except ImportError:
     os.system("pip install openai")
     from openai import OpenAI
 
+from audio_chunking import decode_audio_samples, find_silence_split_points, probe_duration
+from transcription_cache import TranscriptionCache
+
+MAX_UPLOAD_BYTES = 24 * 1024 * 1024  # Limit API to 25 MB - zostawiamy margines
+MIN_PIECE_SECONDS = 60               # Krótszych kawałków nie opłaca się wysyłać osobno
+DEFAULT_UPLOAD_CONCURRENCY = 4       # Ile kawałków wysyłamy naraz, gdy plik trzeba podzielić
+
 def extract_audio(video_path, audio_path):
     """Wyciąga audio z video dla API OpenAI."""
     log(f"Starting audio extraction from {video_path}")
@@ -42,6 +50,7 @@ def extract_audio(video_path, audio_path):
             .output(
                 str(audio_path),
                 acodec='mp3',
+                ac=1,       # Mono - mniejszy plik do wysłania
                 ar='16000'  # 16kHz
             )
             .run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
@@ -55,11 +64,11 @@ def extract_audio(video_path, audio_path):
         log(f"Unexpected error during audio extraction: {str(e)}")
         return False
 
-def transcribe_with_openai_api(audio_path, api_key):
+def transcribe_with_openai_api(audio_path, api_key, client=None):
     """Transkrybuje audio używając OpenAI API."""
     log("Starting transcription using OpenAI API...")
     
-    client = OpenAI(api_key=api_key)
+    client = client or OpenAI(api_key=api_key)
     
     try:
         with open(audio_path, 'rb') as audio_file:
@@ -78,6 +87,89 @@ def transcribe_with_openai_api(audio_path, api_key):
         log(f"Error during API transcription: {str(e)}")
         return None
 
+def split_audio_for_upload(audio_path, max_bytes=None, pieces_hint=1):
+    """
+    Tnie MP3 w miejscach ciszy na kawałki mieszczące się w limicie rozmiaru API.
+    pieces_hint > 1 dzieli plik na tyle mniej więcej równych części, nawet gdy mieści się w limicie.
+    Zwraca listę (ścieżka, offset w sekundach).
+    """
+    audio_path = Path(audio_path)
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    size = audio_path.stat().st_size
+    duration = probe_duration(audio_path)
+    if duration <= 0 or (size <= max_bytes and pieces_hint <= 1):
+        return [(audio_path, 0.0)]
+
+    # Długość kawałka wynikająca z limitu rozmiaru (5% zapasu na nierówny bitrate)
+    max_seconds = duration * max_bytes / size * 0.95
+    chunk_seconds = min(max_seconds, max(MIN_PIECE_SECONDS, duration / max(pieces_hint, 1)))
+    if chunk_seconds >= duration:
+        return [(audio_path, 0.0)]
+
+    samples = decode_audio_samples(audio_path)
+    split_points = find_silence_split_points(samples, chunk_seconds, max_seconds=max_seconds)
+    boundaries = [0.0] + split_points + [duration]
+    log(f"Splitting audio into {len(boundaries) - 1} pieces at silences (max {max_seconds:.0f}s each)")
+
+    pieces = []
+    for i, (start, end) in enumerate(zip(boundaries[:-1], boundaries[1:])):
+        piece_path = audio_path.with_name(f"{audio_path.stem}_part{i:03d}.mp3")
+        (
+            ffmpeg
+            .input(str(audio_path), ss=start, t=end - start)
+            .output(str(piece_path), acodec='mp3', ac=1, ar='16000')
+            .run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
+        )
+        pieces.append((piece_path, start))
+
+    return pieces
+
+def transcribe_pieces_parallel(pieces, api_key, concurrency=DEFAULT_UPLOAD_CONCURRENCY):
+    """Wysyła kawałki audio równolegle (wspólny klient, ograniczona pula wątków). Zwraca odpowiedzi w kolejności kawałków."""
+    log(f"Uploading {len(pieces)} pieces with concurrency {concurrency}...")
+    client = OpenAI(api_key=api_key)
+
+    transcripts = [None] * len(pieces)
+    done = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(transcribe_with_openai_api, piece_path, api_key, client): i
+            for i, (piece_path, _) in enumerate(pieces)
+        }
+        for future in as_completed(futures):
+            transcripts[futures[future]] = future.result()
+            done += 1
+            log(f"Transcribed piece {done}/{len(pieces)}")
+
+    if any(transcript is None for transcript in transcripts):
+        log("Error: some pieces failed to transcribe")
+        return None
+
+    return transcripts
+
+def merge_api_transcripts(transcripts, offsets):
+    """Łączy segmenty z kilku odpowiedzi verbose_json, przesuwając je o offset kawałka."""
+    sentences = []
+    for transcript, offset in zip(transcripts, offsets):
+        for segment in convert_api_response_to_segments(transcript):
+            sentences.append({
+                "start": round(segment["start"] + offset, 2),
+                "end": round(segment["end"] + offset, 2),
+                "sentence": segment["sentence"]
+            })
+
+    if len(transcripts) > 1:
+        log(f"Merged {len(transcripts)} pieces into {len(sentences)} segments")
+    return sentences
+
+def transcript_to_dict(transcript):
+    """Zamienia odpowiedź klienta OpenAI na zwykły słownik (do zapisu w cache)."""
+    if hasattr(transcript, 'model_dump'):
+        return transcript.model_dump()
+    if isinstance(transcript, dict):
+        return transcript
+    return {'text': getattr(transcript, 'text', '')}
+
 def convert_api_response_to_segments(transcript):
     """Konwertuje odpowiedź API na format segmentów."""
     segments = []
@@ -130,7 +222,7 @@ def save_sentences_to_file(sentences, output_filename):
     
     log("Sentences saved successfully")
 
-def process_video_api(input_path, api_key):
+def process_video_api(input_path, api_key, parallel=1, use_cache=True):
     """Główna funkcja przetwarzająca video przez API."""
     log(f"Starting API processing of video: {input_path}")
     
@@ -154,14 +246,51 @@ def process_video_api(input_path, api_key):
 
         # Przetwarzanie
         if extract_audio(input_path, audio_path):
-            transcript = transcribe_with_openai_api(audio_path, api_key)
+            # Cache: to samo audio + model + tryb podziału = ten sam wynik
+            cache = TranscriptionCache() if use_cache else None
+            cached = None
+            if cache:
+                cache_key = cache.make_key(audio_path, {
+                    'engine': 'openai-api',
+                    'model': 'whisper-1',
+                    'language': 'pl',
+                    'parallel': parallel
+                })
+                cached = cache.get(cache_key)
+
+            if cached:
+                log("Transcription cache hit - skipping API call")
+                sentences = cached['sentences']
+            else:
+                # Plik za duży dla API albo tryb równoległy - dzielimy na kawałki
+                pieces = split_audio_for_upload(audio_path, pieces_hint=parallel)
+                if len(pieces) > 1:
+                    concurrency = parallel if parallel > 1 else DEFAULT_UPLOAD_CONCURRENCY
+                    transcripts = transcribe_pieces_parallel(pieces, api_key, concurrency)
+                else:
+                    transcript = transcribe_with_openai_api(audio_path, api_key)
+                    transcripts = [transcript] if transcript else None
+                
+                # Usuń tymczasowe audio (również kawałki)
+                for piece_path, _ in pieces:
+                    if piece_path != audio_path and piece_path.exists():
+                        piece_path.unlink()
+                
+                sentences = None
+                if transcripts:
+                    # Konwertuj na format segmentów
+                    offsets = [offset for _, offset in pieces]
+                    sentences = merge_api_transcripts(transcripts, offsets)
+                    if cache:
+                        raw_result = [
+                            {'offset': offset, 'response': transcript_to_dict(transcript)}
+                            for transcript, offset in zip(transcripts, offsets)
+                        ]
+                        cache.put(cache_key, raw_result, sentences)
             
-            if transcript:
-                # Konwertuj na format segmentów
-                sentences = convert_api_response_to_segments(transcript)
+            if sentences is not None:
                 save_sentences_to_file(sentences, sentences_path)
                 
-                # Usuń tymczasowe audio
                 if audio_path.exists():
                     audio_path.unlink()
                     log("Temporary audio file removed")
@@ -197,6 +326,11 @@ def main():
     parser = argparse.ArgumentParser(description="Transcribe video using OpenAI API")
     parser.add_argument("input_path", help="Path to the video file")
     parser.add_argument("--api-key", help="OpenAI API key (optional, has default)")
+    parser.add_argument("--parallel", type=int, default=1, metavar="N",
+                        help="Split audio at silences into N pieces and upload them concurrently "
+                             "(files above the API size limit are always split)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ignore the transcription cache and always call the API")
     
     args = parser.parse_args()
 
@@ -211,7 +345,7 @@ def main():
 
     try:
         if os.path.isfile(args.input_path):
-            result = process_video_api(args.input_path, api_key)
+            result = process_video_api(args.input_path, api_key, args.parallel, not args.no_cache)
             if result:
                 log(f"Success! Transcription saved to: {result}")
             else:
@@ -1,13 +1,16 @@
 import argparse
-import json
 import os
 import sys
 import time
 import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+import numpy as np
+
 def log(message):
-    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}")
+    # Jedno wywołanie write - linie z wątku wyciągającego audio nie mieszają się z postępem
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}\n", end='', flush=True)
 
 def safe_import(module_name):
     try:
@@ -17,70 +20,196 @@ def safe_import(module_name):
         log(f"Please ensure {module_name} is installed correctly in your virtual environment.")
         sys.exit(1)
 
-ffmpeg = safe_import('ffmpeg')
-whisper = safe_import('whisper')
+import transcription_worker
+from transcription_engines import DEFAULT_ENGINE, ENGINES, get_engine
+from transcription_cache import TranscriptionCache
+from transcription_profiles import DEFAULT_PROFILE, PROFILES, get_profile
+from transcription_store import save_transcription
+from audio_chunking import SAMPLE_RATE, decode_audio_samples, find_silence_split_points
+from silence_detection import find_speech_regions
 
-def extract_audio(video_path, audio_path):
-    """Wyciąga audio z video z optymalnymi parametrami dla Whisper."""
+def extract_audio_samples(video_path):
+    """
+    Dekoduje audio z video prosto do pamięci (s16le, mono, 16kHz) jako float32 dla Whisper.
+    Bez pliku tymczasowego - Whisper dostaje gotową tablicę i nie dekoduje pliku drugi raz.
+    """
     log(f"Starting audio extraction from {video_path}")
     if not os.path.exists(video_path):
         log(f"Error: Video file {video_path} does not exist")
-        return False
+        return None
 
     try:
-        log("Running ffmpeg for audio extraction with optimized settings...")
-        # Konwertuj ścieżki na stringi żeby uniknąć problemów z Path
-        video_str = str(video_path)
-        audio_str = str(audio_path)
-        
-        # Optymalne ustawienia dla Whisper: 16kHz, mono, wav
-        (
-            ffmpeg
-            .input(video_str)
-            .output(
-                audio_str,
-                acodec='pcm_s16le',  # 16-bit PCM
-                ac=1,                # Mono
-                ar='16000'           # 16kHz - optymalne dla Whisper
-            )
-            .run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
-        )
-        log("Audio extraction successful")
-        return True
-    except ffmpeg.Error as e:
-        log(f"Error occurred during audio extraction: {e.stderr.decode('utf-8')}")
-        return False
+        log("Running ffmpeg for audio extraction (in-memory PCM pipe)...")
+        samples = decode_audio_samples(video_path)
+        log(f"Audio extraction successful ({len(samples) / SAMPLE_RATE:.1f}s of audio in memory)")
+        return samples
+    except RuntimeError as e:
+        log(f"Error occurred during audio extraction: {e}")
+        return None
     except Exception as e:
         log(f"Unexpected error during audio extraction: {str(e)}")
-        return False
+        return None
 
-def transcribe_audio_with_whisper(audio_path, model_size="large-v2"):
-    """Transkrybuje audio używając Whisper z optymalnymi ustawieniami dla polskiego."""
-    log(f"Loading Whisper model '{model_size}' (this may take a moment)...")
-    model = whisper.load_model(model_size)
-    log("Whisper model loaded successfully")
-    
-    log(f"Starting transcription of {audio_path}")
+# Parametry dekodowania profilu domyślnego (pozostałe profile w transcription_profiles.py)
+WHISPER_OPTIONS = get_profile(DEFAULT_PROFILE)[1]
+
+def log_progress(percent):
+    """Wypisuje postęp w formacie rozpoznawanym przez GUI."""
+    log(f"Transcribing... {percent:.0f}%")
+
+def transcribe_audio_with_whisper(samples, model_size="large-v2", use_worker=False, options=None,
+                                  engine=DEFAULT_ENGINE):
+    """Transkrybuje audio (tablica float32 16kHz) używając Whisper z optymalnymi ustawieniami dla polskiego."""
+    options = options or WHISPER_OPTIONS
+    if use_worker and engine != 'whisper':
+        log(f"Transcription worker supports only the 'whisper' engine - running '{engine}' in process")
+    elif use_worker:
+        log(f"Submitting audio to transcription worker (model: {model_size})")
+        result = transcription_worker.submit_transcription(samples, model_size, options, log_progress)
+        if result is not None:
+            log("Transcription completed successfully")
+            return result
+        log("Transcription worker unavailable - falling back to in-process model")
+
+    backend = get_engine(engine)
+    model = backend.load_model(model_size)
     
-    # Optymalne parametry dla polskiego języka
-    result = model.transcribe(
-        str(audio_path),
-        language='pl',           # Wymuszamy polski język
-        task='transcribe',       # Tylko transkrypcja (nie tłumaczenie)
-        temperature=0.0,         # Deterministyczne wyniki
-        best_of=5,              # Próbuje 5 razy i bierze najlepszy
-        beam_size=5,            # Beam search dla lepszej jakości
-        patience=1.0,           # Czeka na lepsze wyniki
-        word_timestamps=True,   # Timestampy na poziomie słów
-        condition_on_previous_text=True,  # Wykorzystuje kontekst
-        compression_ratio_threshold=2.4,  # Filtruje powtórzenia
-        logprob_threshold=-1.0,          # Filtruje niepewne fragmenty
-        no_speech_threshold=0.6          # Filtruje ciszę
-    )
+    log(f"Starting transcription of {len(samples) / SAMPLE_RATE:.1f}s of audio (engine: {engine})")
+    result = backend.transcribe(model, samples, options, log_progress)
     
     log("Transcription completed successfully")
     return result
 
+def _init_chunk_worker(engine, model_size, threads):
+    """Inicjalizuje proces puli - ogranicza wątki i ładuje model raz na proces."""
+    get_engine(engine).load_model(model_size, threads)
+
+def _transcribe_chunk(engine, model_size, samples, options):
+    backend = get_engine(engine)
+    return backend.transcribe(backend.load_model(model_size), samples, options)
+
+def merge_chunk_results(chunk_results, offsets):
+    """Łączy wyniki chunków w jeden wynik Whisper, przesuwając timestampy o offset chunka."""
+    segments = []
+    texts = []
+    for result, offset in zip(chunk_results, offsets):
+        for segment in result['segments']:
+            segment = dict(segment)
+            segment['id'] = len(segments)
+            segment['start'] = segment['start'] + offset
+            segment['end'] = segment['end'] + offset
+            if 'seek' in segment:
+                segment['seek'] = segment['seek'] + int(offset * 100)  # seek jest w ramkach mel (100/s)
+            if 'words' in segment:
+                segment['words'] = [
+                    dict(word, start=word['start'] + offset, end=word['end'] + offset)
+                    for word in segment['words']
+                ]
+            segments.append(segment)
+        texts.append(result['text'])
+
+    return {
+        'text': ''.join(texts),
+        'segments': segments,
+        'language': chunk_results[0].get('language', 'pl') if chunk_results else 'pl'
+    }
+
+def create_chunk_pool(model_size, workers, engine=DEFAULT_ENGINE):
+    """Tworzy pulę procesów z modelem załadowanym w każdym procesie (wątki CPU dzielone po równo)."""
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    log(f"Starting {workers} transcription processes x {threads} threads")
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_chunk_worker,
+                               initargs=(engine, model_size, threads))
+
+def transcribe_audio_parallel(samples, model_size="large-v2", workers=4, chunk_minutes=5.0, options=None,
+                              engine=DEFAULT_ENGINE, pool=None):
+    """
+    Dzieli audio w miejscach ciszy i transkrybuje chunki równolegle w puli procesów.
+    Każdy proces ładuje własny model, więc pamięć rośnie liniowo z liczbą workerów.
+    pool pozwala użyć istniejącej puli (tryb wsadowy) zamiast ładować modele od nowa.
+    """
+    options = options or WHISPER_OPTIONS
+    split_points = find_silence_split_points(samples, chunk_minutes * 60)
+    boundaries = [0.0] + split_points + [len(samples) / SAMPLE_RATE]
+    chunks = [
+        (start, samples[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)])
+        for start, end in zip(boundaries[:-1], boundaries[1:])
+    ]
+    log(f"Split audio into {len(chunks)} chunks at silences")
+
+    chunk_results = [None] * len(chunks)
+    done_seconds = 0.0
+    total_seconds = boundaries[-1]
+    own_pool = pool is None
+    executor = create_chunk_pool(model_size, max(1, min(workers, len(chunks))), engine) if own_pool else pool
+    try:
+        futures = {
+            executor.submit(_transcribe_chunk, engine, model_size, chunk_samples, options): index
+            for index, (_, chunk_samples) in enumerate(chunks)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            chunk_results[index] = future.result()
+            done_seconds += len(chunks[index][1]) / SAMPLE_RATE
+            log_progress(done_seconds * 100.0 / total_seconds if total_seconds else 100.0)
+    finally:
+        if own_pool:
+            executor.shutdown()
+
+    log("Transcription completed successfully")
+    return merge_chunk_results(chunk_results, [start for start, _ in chunks])
+
+def remove_non_speech(samples, silence_thresh=-40.0, min_silence_len=2.0):
+    """
+    Wycina długie fragmenty ciszy (np. pisanie na tablicy) przed dekodowaniem.
+    Zwraca (skrócone audio, mapa fragmentów) - mapa to lista
+    (początek w skróconym audio, początek w oryginale, długość) potrzebna do
+    przeliczenia timestampów z powrotem na oś czasu oryginalnego nagrania.
+    """
+    regions = find_speech_regions(samples, SAMPLE_RATE, silence_thresh=silence_thresh, min_silence_len=min_silence_len)
+    total_seconds = len(samples) / SAMPLE_RATE
+    speech_seconds = sum(end - start for start, end in regions)
+    skipped_seconds = total_seconds - speech_seconds
+    log(f"VAD: kept {speech_seconds:.1f}s of speech in {len(regions)} regions, "
+        f"skipped {skipped_seconds:.1f}s of {total_seconds:.1f}s "
+        f"({skipped_seconds * 100.0 / total_seconds if total_seconds else 0.0:.1f}%)")
+
+    region_map = []
+    position = 0.0
+    for start, end in regions:
+        region_map.append((position, start, end - start))
+        position += end - start
+
+    speech_samples = np.concatenate([
+        samples[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)] for start, end in regions
+    ]) if regions else samples[:0]
+    return speech_samples, region_map
+
+def restore_timestamps(transcription_result, region_map):
+    """Przelicza timestampy wyniku Whisper ze skróconego audio (po VAD) na oryginalną oś czasu."""
+    import bisect
+
+    if not region_map:
+        return transcription_result
+
+    compact_starts = [compact_start for compact_start, _, _ in region_map]
+
+    def to_original(t, is_end=False):
+        # Koniec leżący dokładnie na granicy należy do poprzedniego fragmentu
+        index = (bisect.bisect_left if is_end else bisect.bisect_right)(compact_starts, t) - 1
+        compact_start, original_start, length = region_map[max(index, 0)]
+        return original_start + min(max(t - compact_start, 0.0), length)
+
+    for segment in transcription_result['segments']:
+        segment['start'] = to_original(segment['start'])
+        segment['end'] = to_original(segment['end'], is_end=True)
+        if 'seek' in segment:
+            segment['seek'] = int(to_original(segment['seek'] / 100) * 100)  # seek jest w ramkach mel (100/s)
+        for word in segment.get('words') or []:
+            word['start'] = to_original(word['start'])
+            word['end'] = to_original(word['end'], is_end=True)
+    return transcription_result
+
 def clean_text(text):
     """Czyści tekst z niepotrzebnych znaków i poprawia interpunkcję."""
     import re
@@ -129,8 +258,15 @@ def save_sentences_to_file(sentences, output_filename):
     
     log("Sentences saved successfully")
 
-def process_video(input_path, model_size="large-v2"):
-    """Główna funkcja przetwarzająca video."""
+def process_video(input_path, model_size=None, use_worker=False, parallel=0, chunk_minutes=5.0, use_cache=True,
+                  vad=False, vad_threshold=-40.0, vad_min_silence=2.0, profile=DEFAULT_PROFILE,
+                  engine=DEFAULT_ENGINE, samples=None, pool=None):
+    """
+    Główna funkcja przetwarzająca video. model_size nadpisuje model z profilu.
+    samples to opcjonalnie wcześniej wyciągnięte audio (tryb wsadowy), pool - istniejąca pula dla --parallel.
+    """
+    profile_model, options = get_profile(profile)
+    model_size = model_size or profile_model
     log(f"Starting processing of video: {input_path}")
     
     try:
@@ -141,42 +277,62 @@ def process_video(input_path, model_size="large-v2"):
         text_dir = base_dir / 'text'
         text_dir.mkdir(exist_ok=True)
         
-        # Tymczasowy katalog na audio (będzie usunięty)
-        temp_audio_dir = base_dir / 'temp_audio'
-        temp_audio_dir.mkdir(exist_ok=True)
-        
-        log(f"Created output directories")
+        log(f"Created output directory")
 
         # Ścieżki plików
         video_name = input_path.stem
-        audio_path = temp_audio_dir / f"{video_name}.wav"
-        transcription_path = text_dir / f"{video_name}_transcription.json"
+        transcription_path = text_dir / f"{video_name}_transcription.npz"
         sentences_path = text_dir / f"{video_name}.txt"  # Zgodne z oczekiwanym formatem
 
         # Przetwarzanie
-        if extract_audio(input_path, audio_path):
-            transcription_result = transcribe_audio_with_whisper(audio_path, model_size)
+        if samples is None:
+            samples = extract_audio_samples(input_path)
+        if samples is not None:
+            # Cache: ten sam dźwięk + model + parametry = ten sam wynik
+            cache = TranscriptionCache() if use_cache else None
+            cached = None
+            if cache:
+                cache_key = cache.make_key(samples, {
+                    'engine': engine,
+                    'model': model_size,
+                    'options': options,
+                    'chunk_minutes': chunk_minutes if parallel > 1 else None,
+                    'vad': [vad_threshold, vad_min_silence] if vad else None
+                })
+                cached = cache.get(cache_key)
+
+            if cached:
+                log("Transcription cache hit - skipping Whisper")
+                transcription_result = cached['result']
+                sentences = cached['sentences']
+            else:
+                region_map = None
+                if vad:
+                    samples, region_map = remove_non_speech(samples, vad_threshold, vad_min_silence)
+
+                if region_map == []:
+                    # Same cisze (albo bardzo ciche nagranie) - nie wysyłamy pustego audio do silnika
+                    log("VAD: no speech found - skipping transcription")
+                    transcription_result = {'text': '', 'segments': [], 'language': options.get('language')}
+                elif parallel > 1:
+                    transcription_result = transcribe_audio_parallel(samples, model_size, parallel, chunk_minutes, options,
+                                                                     engine, pool)
+                else:
+                    transcription_result = transcribe_audio_with_whisper(samples, model_size, use_worker, options, engine)
+
+                if region_map is not None:
+                    transcription_result = restore_timestamps(transcription_result, region_map)
+                sentences = split_into_sentences(transcription_result)
+                if cache:
+                    cache.put(cache_key, transcription_result, sentences)
             
-            # Zapisz pełną transkrypcję JSON (opcjonalnie)
+            # Zapisz pełną transkrypcję w zwartym formacie kolumnowym (transcription_store.py)
             log(f"Saving full transcription to {transcription_path}")
-            with open(transcription_path, "w", encoding='utf-8') as f:
-                json.dump(transcription_result, f, indent=4, ensure_ascii=False)
+            save_transcription(transcription_result, transcription_path)
             
             # Zapisz zdania w oczekiwanym formacie
-            sentences = split_into_sentences(transcription_result)
             save_sentences_to_file(sentences, sentences_path)
             
-            # Usuń tymczasowe audio
-            if audio_path.exists():
-                audio_path.unlink()
-                log("Temporary audio file removed")
-            
-            # Usuń tymczasowy katalog jeśli pusty
-            try:
-                temp_audio_dir.rmdir()
-            except OSError:
-                pass
-            
             log(f"Processing complete for {input_path}")
             log(f"Transcription saved to: {sentences_path}")
             
@@ -193,27 +349,135 @@ def process_video(input_path, model_size="large-v2"):
         log(traceback.format_exc())
         return None
 
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+# Katalogi z plikami pochodnymi (output/ z wideo po synchronizacji, wycięciu ciszy, logo, intro/outro;
+# generated/ z audio TTS; text/ z transkrypcjami) - ich zawartość nie jest materiałem źródłowym
+DERIVED_DIRS = {'output', 'generated', 'text'}
+
+def find_pending_videos(folder, force=False):
+    """
+    Szuka wideo w drzewie katalogów, które nie mają aktualnej transkrypcji
+    (brak text/<nazwa>.txt albo plik starszy niż wideo).
+    Pomija katalogi DERIVED_DIRS (np. output/ z *_synchronized.mp4 i innymi renderami),
+    żeby nie transkrybować wideo wygenerowanych z już przetworzonych źródeł.
+    """
+    pending = []
+    up_to_date = 0
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = sorted(d for d in dirs if d.lower() not in DERIVED_DIRS)
+        for file in sorted(files):
+            if not file.lower().endswith(VIDEO_EXTENSIONS):
+                continue
+            video_path = Path(root) / file
+            sentences_path = video_path.parent / 'text' / f"{video_path.stem}.txt"
+            if not force and sentences_path.exists() and sentences_path.stat().st_mtime >= video_path.stat().st_mtime:
+                up_to_date += 1
+                continue
+            pending.append(video_path)
+    return pending, up_to_date
+
+def process_folder(folder, force=False, **options):
+    """
+    Tryb wsadowy: transkrybuje wszystkie wideo bez aktualnej transkrypcji jednym załadowanym modelem.
+    Audio następnego pliku jest wyciągane przez ffmpeg w tle, podczas dekodowania bieżącego.
+    Zwraca (liczba udanych, liczba nieudanych).
+    """
+    pending, up_to_date = find_pending_videos(folder, force)
+    log(f"Batch mode: {len(pending)} videos to transcribe, {up_to_date} already up to date")
+    if not pending:
+        return 0, 0
+
+    parallel = options.get('parallel', 0)
+    pool = None
+    if parallel > 1:
+        model_size = options.get('model_size') or get_profile(options.get('profile', DEFAULT_PROFILE))[0]
+        pool = create_chunk_pool(model_size, parallel, options.get('engine', DEFAULT_ENGINE))
+
+    done, failed = 0, 0
+    start_time = time.time()
+    try:
+        with ThreadPoolExecutor(max_workers=1) as prefetcher:
+            next_samples = prefetcher.submit(extract_audio_samples, pending[0])
+            for index, video_path in enumerate(pending):
+                samples = next_samples.result()
+                if index + 1 < len(pending):
+                    next_samples = prefetcher.submit(extract_audio_samples, pending[index + 1])
+
+                log(f"[{index + 1}/{len(pending)}] {video_path}")
+                if samples is not None and process_video(video_path, samples=samples, pool=pool, **options):
+                    done += 1
+                else:
+                    failed += 1
+                    log(f"Failed to transcribe {video_path}")
+                del samples
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    log(f"Batch finished in {time.time() - start_time:.1f}s: {done} transcribed, {failed} failed, "
+        f"{up_to_date} skipped (up to date)")
+    return done, failed
+
 def main():
     parser = argparse.ArgumentParser(description="Transcribe video files using Whisper with optimal settings for Polish.")
-    parser.add_argument("input_path", help="Path to the video file")
-    parser.add_argument("--model", default="large-v2", 
+    parser.add_argument("input_path", help="Path to the video file or a folder (batch mode)")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, choices=list(PROFILES),
+                       help=f"Speed/quality profile (default: {DEFAULT_PROFILE})")
+    parser.add_argument("--engine", default=DEFAULT_ENGINE, choices=list(ENGINES),
+                       help="Inference backend: whisper (reference, PyTorch) or faster-whisper "
+                            f"(CTranslate2, int8 on CPU) (default: {DEFAULT_ENGINE})")
+    parser.add_argument("--model", default=None,
                        choices=["tiny", "base", "small", "medium", "large", "large-v2"],
-                       help="Whisper model size (default: large-v2)")
+                       help="Whisper model size (default: taken from the profile)")
+    parser.add_argument("--worker", action="store_true",
+                       help="Use resident transcription worker (keeps the model loaded between runs)")
+    parser.add_argument("--parallel", type=int, default=0, metavar="N",
+                       help="Split audio at silences and transcribe chunks in N processes (each loads its own model)")
+    parser.add_argument("--chunk-minutes", type=float, default=5.0,
+                       help="Target chunk length for --parallel (default: 5 minutes)")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Ignore the transcription cache and always run Whisper")
+    parser.add_argument("--vad", action="store_true",
+                       help="Remove long silences before decoding (timestamps are mapped back to the original video)")
+    parser.add_argument("--vad-threshold", type=float, default=-40.0,
+                       help="Silence threshold in dBFS for --vad (default: -40)")
+    parser.add_argument("--vad-min-silence", type=float, default=2.0,
+                       help="Minimum silence length in seconds removed by --vad (default: 2.0)")
+    parser.add_argument("--force", action="store_true",
+                       help="Batch mode: also re-transcribe videos whose text/<name>.txt is up to date")
     
     args = parser.parse_args()
+    safe_import(ENGINES[args.engine].package)
 
     log("Starting improved video transcription")
     log(f"Input path: {args.input_path}")
-    log(f"Using Whisper model: {args.model}")
+    log(f"Using profile: {args.profile} (model: {args.model or PROFILES[args.profile]['model']}, engine: {args.engine})")
+
+    options = {
+        'model_size': args.model,
+        'use_worker': args.worker,
+        'parallel': args.parallel,
+        'chunk_minutes': args.chunk_minutes,
+        'use_cache': not args.no_cache,
+        'vad': args.vad,
+        'vad_threshold': args.vad_threshold,
+        'vad_min_silence': args.vad_min_silence,
+        'profile': args.profile,
+        'engine': args.engine
+    }
 
     try:
         if os.path.isfile(args.input_path):
-            result = process_video(args.input_path, args.model)
+            result = process_video(args.input_path, **options)
             if result:
                 log(f"Success! Transcription saved to: {result}")
             else:
                 log("Transcription failed!")
                 sys.exit(1)
+        elif os.path.isdir(args.input_path):
+            _, failed = process_folder(args.input_path, args.force, **options)
+            if failed:
+                sys.exit(1)
         else:
             log(f"Error: Invalid input path: {args.input_path}")
             sys.exit(1)
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+# Cache transkrypcji adresowany treścią: klucz to hash wyciągniętego audio + modelu
+# i parametrów dekodowania, więc ponowne uruchomienie kroku 1 na tym samym wideo
+# nie powtarza transkrypcji. Najdawniej używane wpisy są usuwane po przekroczeniu limitu.
+DEFAULT_CACHE_DIR = Path.home() / '.cache' / 'video_translation' / 'transcriptions'
+DEFAULT_MAX_MB = 500
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def log(message):
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+class TranscriptionCache:
+    """Przechowuje surowy wynik transkrypcji i listę zdań w plikach <klucz>.json."""
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = Path(cache_dir or os.getenv('TRANSCRIPTION_CACHE_DIR') or DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv('TRANSCRIPTION_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+
+    def make_key(self, audio, params):
+        """
+        Liczy klucz z audio (ścieżka do pliku, bajty albo tablica NumPy)
+        i parametrów wpływających na wynik (silnik, model, opcje dekodowania).
+        """
+        hasher = hashlib.sha256()
+        if isinstance(audio, (str, Path)):
+            with open(audio, 'rb') as f:
+                for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                    hasher.update(block)
+        else:
+            hasher.update(memoryview(audio).cast('B'))
+        hasher.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+        return hasher.hexdigest()
+
+    def _entry_path(self, key):
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key):
+        """Zwraca {'result': ..., 'sentences': [...]} albo None. Trafienie odświeża wpis w LRU."""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)  # mtime = czas ostatniego użycia
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key, result, sentences):
+        """Zapisuje wpis atomowo (plik tymczasowy + rename) i usuwa nadmiarowe stare wpisy."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._entry_path(key)
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'result': result, 'sentences': sentences, 'created': time.time()},
+                          f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            log(f"Warning: could not write transcription cache entry: {e}")
+            if tmp_path.exists():
+                tmp_path.unlink()
+            return
+        self.evict()
+
+    def evict(self):
+        """Usuwa najdawniej używane wpisy, aż łączny rozmiar zmieści się w limicie."""
+        entries = []
+        for path in self.cache_dir.glob('*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+                log(f"Evicted transcription cache entry: {path.name}")
+            except OSError:
+                pass
@@ -0,0 +1,131 @@
+import os
+import time
+from abc import ABC, abstractmethod
+
+import transcription_worker
+
+# Wymienne backendy transkrypcji. Każdy zwraca wynik w kształcie wyniku openai-whisper
+# ({'text', 'segments': [{'id', 'seek', 'start', 'end', 'text', ..., 'words'}], 'language'}),
+# więc split_into_sentences, scalanie chunków i VAD działają bez zmian.
+DEFAULT_ENGINE = 'whisper'
+
+def log(message):
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}\n", end='', flush=True)
+
+class TranscriptionEngine(ABC):
+    """Interfejs backendu: ładowanie modelu i transkrypcja tablicy float32 16kHz."""
+    name = None
+    package = None  # Moduł, który musi być zainstalowany
+
+    @abstractmethod
+    def load_model(self, model_size, threads=None):
+        """Zwraca model gotowy do transcribe (może być buforowany między wywołaniami)."""
+
+    @abstractmethod
+    def transcribe(self, model, audio, options, progress_callback=None):
+        """Zwraca wynik w kształcie openai-whisper; options to opcje model.transcribe z openai-whisper."""
+
+class WhisperEngine(TranscriptionEngine):
+    """Referencyjny pakiet openai-whisper (PyTorch)."""
+    name = 'whisper'
+    package = 'whisper'
+
+    def load_model(self, model_size, threads=None):
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return transcription_worker.load_model(model_size)
+
+    def transcribe(self, model, audio, options, progress_callback=None):
+        return transcription_worker.transcribe_with_progress(model, audio, options, progress_callback)
+
+class FasterWhisperEngine(TranscriptionEngine):
+    """
+    faster-whisper (CTranslate2) z kwantyzacją int8 na CPU.
+    Te same wagi Whisper, ale kilkukrotnie szybciej i z mniejszym zużyciem pamięci.
+    """
+    name = 'faster-whisper'
+    package = 'faster_whisper'
+    compute_type = 'int8'
+
+    def __init__(self):
+        self._models = {}
+
+    def load_model(self, model_size, threads=None):
+        if model_size not in self._models:
+            from faster_whisper import WhisperModel
+            log(f"Loading faster-whisper model '{model_size}' ({self.compute_type}, CPU)...")
+            self._models[model_size] = WhisperModel(model_size, device='cpu', compute_type=self.compute_type,
+                                                    cpu_threads=threads or os.cpu_count() or 4)
+            log("faster-whisper model loaded successfully")
+        return self._models[model_size]
+
+    @staticmethod
+    def convert_options(options):
+        """Tłumaczy opcje openai-whisper na argumenty WhisperModel.transcribe."""
+        kwargs = {
+            'language': options.get('language'),
+            'task': options.get('task', 'transcribe'),
+            'temperature': options.get('temperature', 0.0),
+            # None w openai-whisper oznacza dekodowanie zachłanne
+            'beam_size': options.get('beam_size') or 1,
+            'best_of': options.get('best_of') or 1,
+            'condition_on_previous_text': options.get('condition_on_previous_text', True),
+            'compression_ratio_threshold': options.get('compression_ratio_threshold'),
+            'log_prob_threshold': options.get('logprob_threshold'),
+            'no_speech_threshold': options.get('no_speech_threshold'),
+            'word_timestamps': options.get('word_timestamps', False)
+        }
+        if options.get('patience') is not None:
+            kwargs['patience'] = options['patience']
+        return kwargs
+
+    def transcribe(self, model, audio, options, progress_callback=None):
+        segments_iter, info = model.transcribe(audio, **self.convert_options(options))
+
+        # Segmenty są generowane leniwie - dekodowanie dzieje się w trakcie iteracji
+        segments = []
+        for segment in segments_iter:
+            item = {
+                'id': len(segments),
+                'seek': segment.seek,
+                'start': segment.start,
+                'end': segment.end,
+                'text': segment.text,
+                'tokens': list(segment.tokens),
+                'temperature': segment.temperature,
+                'avg_logprob': segment.avg_logprob,
+                'compression_ratio': segment.compression_ratio,
+                'no_speech_prob': segment.no_speech_prob
+            }
+            if segment.words:
+                item['words'] = [
+                    {'word': word.word, 'start': word.start, 'end': word.end, 'probability': word.probability}
+                    for word in segment.words
+                ]
+            segments.append(item)
+            if progress_callback and info.duration:
+                progress_callback(min(100.0, segment.end * 100.0 / info.duration))
+
+        if progress_callback and (not segments or segments[-1]['end'] < info.duration):
+            progress_callback(100.0)
+        return {
+            'text': ''.join(segment['text'] for segment in segments),
+            'segments': segments,
+            'language': info.language
+        }
+
+ENGINES = {
+    WhisperEngine.name: WhisperEngine,
+    FasterWhisperEngine.name: FasterWhisperEngine
+}
+
+_INSTANCES = {}
+
+def get_engine(name):
+    """Zwraca (współdzieloną w procesie) instancję backendu o podanej nazwie."""
+    if name not in ENGINES:
+        raise ValueError(f"Unknown transcription engine: {name} (available: {', '.join(ENGINES)})")
+    if name not in _INSTANCES:
+        _INSTANCES[name] = ENGINES[name]()
+    return _INSTANCES[name]
@@ -0,0 +1,54 @@
+# Nazwane profile transkrypcji Whisper: kompromis szybkość / jakość.
+# Wybór profilu na podstawie danych: python benchmark_transcription.py run
+
+# Parametry wspólne dla wszystkich profili (polski wykład)
+BASE_OPTIONS = {
+    'language': 'pl',                   # Wymuszamy polski język
+    'task': 'transcribe',               # Tylko transkrypcja (nie tłumaczenie)
+    'temperature': 0.0,                 # Deterministyczne wyniki
+    'condition_on_previous_text': True, # Wykorzystuje kontekst
+    'compression_ratio_threshold': 2.4, # Filtruje powtórzenia
+    'logprob_threshold': -1.0,          # Filtruje niepewne fragmenty
+    'no_speech_threshold': 0.6          # Filtruje ciszę
+}
+
+PROFILES = {
+    'fast': {
+        'description': "Mały model, dekodowanie zachłanne - szybki podgląd",
+        'model': 'base',
+        'options': {
+            'best_of': None,            # Przy temperature 0 bez beam search = greedy
+            'beam_size': None,
+            'word_timestamps': False
+        }
+    },
+    'balanced': {
+        'description': "Średni model, węższy beam search",
+        'model': 'small',
+        'options': {
+            'best_of': 3,
+            'beam_size': 3,
+            'patience': 1.0,
+            'word_timestamps': False
+        }
+    },
+    'accurate': {
+        'description': "Największy model, pełny beam search i timestampy słów",
+        'model': 'large-v2',
+        'options': {
+            'best_of': 5,               # Próbuje 5 razy i bierze najlepszy
+            'beam_size': 5,             # Beam search dla lepszej jakości
+            'patience': 1.0,            # Czeka na lepsze wyniki
+            'word_timestamps': True     # Timestampy na poziomie słów
+        }
+    }
+}
+
+DEFAULT_PROFILE = 'accurate'
+
+def get_profile(name):
+    """Zwraca (model, opcje dekodowania) dla profilu o podanej nazwie."""
+    if name not in PROFILES:
+        raise ValueError(f"Unknown transcription profile: {name} (available: {', '.join(PROFILES)})")
+    profile = PROFILES[name]
+    return profile['model'], dict(BASE_OPTIONS, **profile['options'])
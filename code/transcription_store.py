@@ -0,0 +1,207 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Zwarty, kolumnowy zapis pełnego wyniku Whisper (text/<nazwa>_transcription.npz).
+# Zamiast JSON z wcięciami każde pole segmentów i słów to osobna tablica NumPy,
+# a teksty trzymamy w tablicy stringów (jeden blob UTF-8 + offsety).
+# np.load na .npz czyta tablice dopiero przy pierwszym dostępie, więc narzędzia,
+# które potrzebują np. tylko timestampów segmentów, nie dekodują słów ani tekstów.
+FORMAT_VERSION = 1
+SUFFIX = '_transcription.npz'
+LEGACY_SUFFIX = '_transcription.json'
+
+SEGMENT_FLOAT_FIELDS = ('start', 'end', 'temperature', 'avg_logprob', 'compression_ratio', 'no_speech_prob')
+SEGMENT_INT_FIELDS = ('id', 'seek')
+WORD_FLOAT_FIELDS = ('start', 'end', 'probability')
+
+def log(message):
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+def _pack_strings(strings):
+    """Zamienia listę stringów na (blob UTF-8, offsety) - offsets[i]:offsets[i+1] to i-ty string."""
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+def _unpack_string(blob, offsets, index):
+    return blob[offsets[index]:offsets[index + 1]].tobytes().decode('utf-8')
+
+def save_transcription(result, path):
+    """Zapisuje wynik Whisper (dict z 'text', 'segments', 'language') w formacie kolumnowym."""
+    segments = result.get('segments', [])
+    words = [segment.get('words') or [] for segment in segments]
+    tokens = [segment.get('tokens') or [] for segment in segments]
+
+    arrays = {
+        'format_version': np.array(FORMAT_VERSION),
+        'language': np.array(result.get('language') or ''),
+        'has_words': np.array([segment.get('words') is not None for segment in segments], dtype=bool),
+        'word_offsets': np.cumsum([0] + [len(w) for w in words], dtype=np.int64),
+        'token_offsets': np.cumsum([0] + [len(t) for t in tokens], dtype=np.int64),
+        'tokens': np.array([token for segment_tokens in tokens for token in segment_tokens], dtype=np.int32)
+    }
+    arrays['text_blob'], arrays['text_offsets'] = _pack_strings([result.get('text', '')])
+    arrays['segment_text_blob'], arrays['segment_text_offsets'] = _pack_strings([s.get('text', '') for s in segments])
+    for field in SEGMENT_FLOAT_FIELDS:
+        arrays[f'segment_{field}'] = np.array([s.get(field, np.nan) for s in segments], dtype=np.float64)
+    for field in SEGMENT_INT_FIELDS:
+        arrays[f'segment_{field}'] = np.array([s.get(field, -1) for s in segments], dtype=np.int64)
+
+    flat_words = [word for segment_words in words for word in segment_words]
+    arrays['word_blob'], arrays['word_text_offsets'] = _pack_strings([w.get('word', '') for w in flat_words])
+    for field in WORD_FLOAT_FIELDS:
+        arrays[f'word_{field}'] = np.array([w.get(field, np.nan) for w in flat_words], dtype=np.float64)
+
+    with open(path, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    return path
+
+class StoredTranscription:
+    """
+    Leniwy widok na zapisany wynik. Tablice (np. segment_start) są czytane z pliku
+    przy pierwszym dostępie; segments() i to_result() odtwarzają kształt wyniku Whisper.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._npz = np.load(self.path, allow_pickle=False)
+        self._cache = {}
+        version = int(self._array('format_version'))
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Unsupported transcription format version {version} in {self.path}")
+
+    def _array(self, name):
+        if name not in self._cache:
+            self._cache[name] = self._npz[name]
+        return self._cache[name]
+
+    def close(self):
+        self._npz.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._array('segment_start'))
+
+    @property
+    def language(self):
+        return str(self._array('language'))
+
+    @property
+    def text(self):
+        return _unpack_string(self._array('text_blob'), self._array('text_offsets'), 0)
+
+    @property
+    def segment_starts(self):
+        return self._array('segment_start')
+
+    @property
+    def segment_ends(self):
+        return self._array('segment_end')
+
+    def segment_text(self, index):
+        return _unpack_string(self._array('segment_text_blob'), self._array('segment_text_offsets'), index)
+
+    def words(self, index):
+        """Słowa segmentu (lista dictów) albo None, jeśli wynik był bez word_timestamps."""
+        if not self._array('has_words')[index]:
+            return None
+        offsets = self._array('word_offsets')
+        blob, text_offsets = self._array('word_blob'), self._array('word_text_offsets')
+        starts, ends, probs = (self._array(f'word_{field}') for field in WORD_FLOAT_FIELDS)
+        return [
+            {'word': _unpack_string(blob, text_offsets, i), 'start': float(starts[i]),
+             'end': float(ends[i]), 'probability': float(probs[i])}
+            for i in range(offsets[index], offsets[index + 1])
+        ]
+
+    def segment(self, index):
+        token_offsets = self._array('token_offsets')
+        segment = {field: int(self._array(f'segment_{field}')[index]) for field in SEGMENT_INT_FIELDS}
+        segment.update({field: float(self._array(f'segment_{field}')[index]) for field in SEGMENT_FLOAT_FIELDS})
+        segment['text'] = self.segment_text(index)
+        segment['tokens'] = self._array('tokens')[token_offsets[index]:token_offsets[index + 1]].tolist()
+        words = self.words(index)
+        if words is not None:
+            segment['words'] = words
+        return segment
+
+    def segments(self):
+        for index in range(len(self)):
+            yield self.segment(index)
+
+    def to_result(self):
+        """Pełny wynik w kształcie zwracanym przez Whisper."""
+        return {'text': self.text, 'segments': list(self.segments()), 'language': self.language}
+
+def load_transcription(path):
+    """Otwiera zapisany wynik: .npz leniwie, stary .json w całości (dla zgodności)."""
+    path = Path(path)
+    if path.suffix == '.json':
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return StoredTranscription(path)
+
+def convert_json_file(json_path, remove_json=False):
+    """Konwertuje stary text/<nazwa>_transcription.json do .npz obok niego."""
+    json_path = Path(json_path)
+    npz_path = json_path.with_name(json_path.name[:-len(LEGACY_SUFFIX)] + SUFFIX) \
+        if json_path.name.endswith(LEGACY_SUFFIX) else json_path.with_suffix('.npz')
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        result = json.load(f)
+    save_transcription(result, npz_path)
+
+    # Weryfikacja przed ewentualnym usunięciem oryginału
+    with StoredTranscription(npz_path) as stored:
+        if len(stored) != len(result.get('segments', [])) or stored.text != result.get('text', ''):
+            raise ValueError(f"Verification failed for {npz_path}")
+
+    old_size, new_size = json_path.stat().st_size, npz_path.stat().st_size
+    log(f"Converted {json_path.name}: {old_size / 1024:.0f} KB -> {new_size / 1024:.0f} KB")
+    if remove_json:
+        json_path.unlink()
+    return npz_path
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact storage for full Whisper transcription results.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = subparsers.add_parser("convert", help="Convert *_transcription.json files to .npz")
+    convert_parser.add_argument("path", help="JSON file or folder (searched recursively)")
+    convert_parser.add_argument("--remove-json", action="store_true", help="Delete JSON files after conversion")
+
+    info_parser = subparsers.add_parser("info", help="Show a summary of a stored transcription")
+    info_parser.add_argument("path")
+
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        path = Path(args.path)
+        files = sorted(path.rglob(f"*{LEGACY_SUFFIX}")) if path.is_dir() else [path]
+        failed = 0
+        for json_path in files:
+            try:
+                convert_json_file(json_path, args.remove_json)
+            except (OSError, ValueError) as e:
+                log(f"Error converting {json_path}: {e}")
+                failed += 1
+        log(f"Converted {len(files) - failed} of {len(files)} files")
+        sys.exit(1 if failed else 0)
+    elif args.command == "info":
+        with StoredTranscription(args.path) as stored:
+            duration = float(stored.segment_ends[-1]) if len(stored) else 0.0
+            log(f"{args.path}: {len(stored)} segments, {duration:.1f}s, language: {stored.language}")
+
+if __name__ == "__main__":
+    main()
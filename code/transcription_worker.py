@@ -0,0 +1,306 @@
+import argparse
+import importlib
+import json
+import os
+import secrets
+import subprocess
+import sys
+import time
+import traceback
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+
+# Lokalny worker transkrypcji - trzyma załadowane modele Whisper w pamięci,
+# żeby każde uruchomienie transkrypcji nie płaciło za whisper.load_model().
+WORKER_HOST = '127.0.0.1'
+WORKER_PORT = int(os.getenv('WHISPER_WORKER_PORT', '50917'))
+# multiprocessing.connection odpakowuje (unpickle) każdą wiadomość, więc klucz musi być tajny:
+# worker losuje go przy starcie i zapisuje razem z portem w pliku czytelnym tylko dla właściciela.
+# Klient bez tego pliku (inny użytkownik) nie połączy się z workerem.
+WORKER_STATE_DIR = Path.home() / '.cache' / 'video_translation'
+STARTUP_TIMEOUT = 30  # Ile sekund czekamy aż świeżo uruchomiony worker zacznie odpowiadać
+
+# Modele załadowane w tym procesie (model_size -> model)
+_MODELS = {}
+
+def log(message):
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}\n", end='', flush=True)
+
+def key_file_path(port=WORKER_PORT):
+    return WORKER_STATE_DIR / f"whisper_worker_{port}.key"
+
+def write_key_file(port, authkey):
+    """Zapisuje port i klucz workera do pliku z prawami 0600 (plik tymczasowy + rename)."""
+    WORKER_STATE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+    path = key_file_path(port)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump({'port': port, 'pid': os.getpid(), 'authkey': authkey.hex()}, f)
+    os.replace(tmp_path, path)
+
+def read_authkey(port=WORKER_PORT):
+    """Klucz działającego workera z pliku albo None, jeśli pliku nie ma (worker nie działa)."""
+    try:
+        with open(key_file_path(port), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('port') != port:
+            return None
+        return bytes.fromhex(data['authkey'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def remove_key_file(port, authkey):
+    """Usuwa plik klucza, o ile nie nadpisał go już inny worker."""
+    if read_authkey(port) == authkey:
+        try:
+            key_file_path(port).unlink()
+        except OSError:
+            pass
+
+def connect(port=WORKER_PORT):
+    """Połączenie z workerem uwierzytelnione kluczem z pliku; None, gdy worker nie działa."""
+    authkey = read_authkey(port)
+    if authkey is None:
+        return None
+    try:
+        return Client((WORKER_HOST, port), authkey=authkey)
+    except AuthenticationError:
+        # Plik po workerze, który się zakończył, albo na porcie słucha obcy proces
+        log(f"Warning: could not authenticate with the process on {WORKER_HOST}:{port}")
+        return None
+    except (ConnectionRefusedError, OSError, EOFError):
+        return None
+
+def load_model(model_size):
+    """Zwraca model Whisper z cache procesu, ładując go tylko za pierwszym razem."""
+    if model_size not in _MODELS:
+        import whisper
+        log(f"Loading Whisper model '{model_size}' (this may take a moment)...")
+        _MODELS[model_size] = whisper.load_model(model_size)
+        log("Whisper model loaded successfully")
+    return _MODELS[model_size]
+
+class _WhisperProgress:
+    """Podmienia pasek tqdm w whisper.transcribe i przekazuje postęp (0-100%) do callbacka."""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.total = 0
+        self.done = 0
+
+    def tqdm(self, total=None, **kwargs):
+        self.total = total or 0
+        self.done = 0
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def update(self, n=1):
+        self.done += n
+        percent = min(100.0, self.done * 100.0 / self.total) if self.total else 100.0
+        self.callback(percent)
+
+def transcribe_with_progress(model, audio, options, progress_callback=None):
+    """Wywołuje model.transcribe, opcjonalnie raportując postęp dekodowania segmentów."""
+    if progress_callback is None:
+        return model.transcribe(audio, **options)
+
+    # whisper/__init__ eksportuje funkcję transcribe, więc moduł bierzemy z sys.modules
+    transcribe_module = importlib.import_module('whisper.transcribe')
+    original_tqdm = transcribe_module.tqdm
+    transcribe_module.tqdm = _WhisperProgress(progress_callback)
+    try:
+        return model.transcribe(audio, **dict(options, verbose=False))
+    finally:
+        transcribe_module.tqdm = original_tqdm
+
+def handle_job(conn, job):
+    """Obsługuje jedno zlecenie transkrypcji i odsyła postęp oraz wynik przez połączenie."""
+    audio = job['audio']
+    model_size = job.get('model_size', 'large-v2')
+    options = job.get('options', {})
+    description = audio if isinstance(audio, str) else f"{len(audio)} samples in memory"
+
+    log(f"Job received: {description} (model: {model_size})")
+    if model_size not in _MODELS:
+        conn.send({'type': 'status', 'message': f"Loading Whisper model '{model_size}' in worker..."})
+    model = load_model(model_size)
+
+    last_percent = [-1]
+
+    def report(percent):
+        if int(percent) != last_percent[0]:
+            last_percent[0] = int(percent)
+            conn.send({'type': 'progress', 'percent': percent})
+
+    start_time = time.time()
+    result = transcribe_with_progress(model, audio, options, report)
+    log(f"Job finished in {time.time() - start_time:.1f}s: {description}")
+    conn.send({'type': 'result', 'result': result})
+
+def serve(port=WORKER_PORT, preload=None):
+    """Główna pętla workera - przyjmuje zlecenia po kolei i trzyma modele w pamięci."""
+    for model_size in preload or []:
+        load_model(model_size)
+
+    authkey = secrets.token_bytes(32)
+    with Listener((WORKER_HOST, port), authkey=authkey) as listener:
+        write_key_file(port, authkey)
+        log(f"Transcription worker listening on {WORKER_HOST}:{port} (key: {key_file_path(port)})")
+        try:
+            _accept_jobs(listener)
+        finally:
+            remove_key_file(port, authkey)
+
+def _accept_jobs(listener):
+    """Obsługuje połączenia po kolei, aż przyjdzie polecenie shutdown."""
+    while True:
+        try:
+            conn = listener.accept()
+        except Exception as e:
+            log(f"Error accepting connection: {e}")
+            continue
+
+        with conn:
+            try:
+                job = conn.recv()
+                command = job.get('cmd')
+                if command == 'ping':
+                    conn.send({'type': 'pong', 'models': list(_MODELS), 'pid': os.getpid()})
+                elif command == 'shutdown':
+                    conn.send({'type': 'bye'})
+                    log("Shutdown requested - stopping worker")
+                    return
+                elif command == 'transcribe':
+                    handle_job(conn, job)
+                else:
+                    conn.send({'type': 'error', 'message': f"Unknown command: {command}"})
+            except (EOFError, ConnectionError, BrokenPipeError):
+                log("Client disconnected before job finished")
+            except Exception as e:
+                log(f"Error while handling job: {e}")
+                log(traceback.format_exc())
+                try:
+                    conn.send({'type': 'error', 'message': str(e)})
+                except Exception:
+                    pass
+
+def _request(message, port=WORKER_PORT):
+    """Wysyła krótkie polecenie do workera i zwraca odpowiedź (albo None gdy worker nie działa)."""
+    conn = connect(port)
+    if conn is None:
+        return None
+    try:
+        with conn:
+            conn.send(message)
+            return conn.recv()
+    except (OSError, EOFError):
+        return None
+
+def is_worker_running(port=WORKER_PORT):
+    response = _request({'cmd': 'ping'}, port)
+    return bool(response and response.get('type') == 'pong')
+
+def start_worker(port=WORKER_PORT, preload=None):
+    """Uruchamia worker w tle (odłączony od bieżącego procesu) i czeka aż zacznie odpowiadać."""
+    if is_worker_running(port):
+        return True
+
+    cmd = [sys.executable, str(Path(__file__).resolve()), 'serve', '--port', str(port)]
+    for model_size in preload or []:
+        cmd.extend(['--preload', model_size])
+
+    log_path = Path(__file__).resolve().parent / 'transcription_worker.log'
+    popen_kwargs = {}
+    if os.name == 'nt':
+        popen_kwargs['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        popen_kwargs['start_new_session'] = True
+
+    log(f"Starting transcription worker (log: {log_path})")
+    with open(log_path, 'a', encoding='utf-8') as worker_log:
+        subprocess.Popen(cmd, stdout=worker_log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, **popen_kwargs)
+
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        if is_worker_running(port):
+            log("Transcription worker is ready")
+            return True
+        time.sleep(0.5)
+
+    log("Error: transcription worker did not start in time")
+    return False
+
+def submit_transcription(audio, model_size, options, progress_callback=None, port=WORKER_PORT, autostart=True):
+    """
+    Zleca transkrypcję workerowi i czeka na wynik.
+    audio to ścieżka do pliku albo tablica float32 16kHz (przesyłana przez socket).
+    Zwraca wynik Whisper (dict) albo None, jeśli worker jest niedostępny.
+    Błąd podczas samej transkrypcji jest zgłaszany jako RuntimeError.
+    """
+    if not is_worker_running(port):
+        if not autostart or not start_worker(port):
+            return None
+
+    conn = connect(port)
+    if conn is None:
+        return None
+
+    with conn:
+        conn.send({
+            'cmd': 'transcribe',
+            'audio': str(Path(audio).resolve()) if isinstance(audio, (str, Path)) else audio,
+            'model_size': model_size,
+            'options': options
+        })
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                raise RuntimeError("Transcription worker closed the connection")
+
+            if message['type'] == 'progress':
+                if progress_callback:
+                    progress_callback(message['percent'])
+            elif message['type'] == 'status':
+                log(message['message'])
+            elif message['type'] == 'result':
+                return message['result']
+            elif message['type'] == 'error':
+                raise RuntimeError(f"Transcription worker error: {message['message']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident Whisper transcription worker.")
+    parser.add_argument("command", choices=["serve", "start", "status", "stop"],
+                       help="serve - run in foreground, start - run in background, status/stop - control running worker")
+    parser.add_argument("--port", type=int, default=WORKER_PORT, help=f"Local port (default: {WORKER_PORT})")
+    parser.add_argument("--preload", action="append", default=[],
+                       help="Model size to load at startup (can be repeated)")
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args.port, args.preload)
+    elif args.command == 'start':
+        sys.exit(0 if start_worker(args.port, args.preload) else 1)
+    elif args.command == 'status':
+        response = _request({'cmd': 'ping'}, args.port)
+        if response:
+            models = ', '.join(response['models']) or 'none'
+            log(f"Worker running (pid {response['pid']}), loaded models: {models}")
+        else:
+            log("Worker is not running")
+            sys.exit(1)
+    elif args.command == 'stop':
+        if _request({'cmd': 'shutdown'}, args.port):
+            log("Worker stopped")
+        else:
+            log("Worker is not running")
+
+if __name__ == "__main__":
+    main()
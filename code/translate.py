@@ -1,48 +1,120 @@
 import os
+import re
 import sys
+import json
+import random
 import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 print(f"Python executable: {sys.executable}")
 print(f"Python path: {sys.path}")
-from openai import OpenAI
+from openai import OpenAI, APIConnectionError, APIStatusError, RateLimitError
+from translation_memory import TranslationMemory, normalize_sentence
 
 # Hardcoded API key
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
+DEFAULT_CONCURRENCY = 4   # Ile chunków tłumaczymy jednocześnie
+MAX_RETRIES = 6           # Ile razy ponawiamy chunk po 429 / błędzie serwera
+BASE_BACKOFF = 1.0        # Pierwsze opóźnienie po błędzie (s), potem rośnie wykładniczo
+MAX_BACKOFF = 60.0
+
+MODEL = "gpt-4o"
+SYSTEM_PROMPT = "Translate the following text to English, keep timestamps and format intact"
+PROMPT_VERSION = "1"      # Zmień przy każdej zmianie SYSTEM_PROMPT - stare wpisy pamięci tłumaczeń przestaną pasować
+
+# Budżety tokenów jednego zapytania. Wejście pakujemy blisko limitu, a odpowiedź
+# (tłumaczenie z tymi samymi timestampami) szacujemy jako OUTPUT_RATIO x wejście.
+INPUT_TOKEN_BUDGET = 8000
+OUTPUT_TOKEN_BUDGET = 12000   # max_tokens odpowiedzi (gpt-4o pozwala na 16384)
+OUTPUT_RATIO = 1.2            # Angielski jest zwykle krótszy od polskiego - zapas bezpieczeństwa
+CHARS_PER_TOKEN = 3.0         # Ostrożne przybliżenie, gdy tiktoken nie jest dostępny
+
+# Tryb JSON: segmenty {id, text} zamiast wolnego tekstu - odpowiedź da się zwalidować
+# i ponowić tylko brakujące segmenty zamiast całego chunka.
+JSON_SYSTEM_PROMPT = (
+    "Translate the 'text' of every segment from Polish to English. "
+    "Reply with a JSON object {\"segments\": [{\"id\": <id>, \"text\": <translation>}]} "
+    "that contains every input id exactly once, in the same order. Never merge or split segments."
+)
+JSON_PROMPT_VERSION = "json-1"
+MAX_SEGMENT_RETRIES = 3   # Ile razy ponawiamy segmenty brakujące/niepoprawne w odpowiedzi
+
+PARTIAL_SUFFIX = '.partial'   # Znacznik "tłumaczenie w toku" dla trybu --stream (patrz generate.py --follow)
+
+LINE_PATTERN = re.compile(r'^Start: ([\d.]+), End: ([\d.]+), Sentence: (.*)$')
+
 def read_file(file_path):
     with open(file_path, 'r', encoding='utf-8') as file:
         content = file.read()
     return content
 
-def split_text(text, max_tokens=3800):
-    lines = text.split('\n')
-    chunks = []
-    current_chunk = []
-    current_length = 0
-    
-    for line in lines:
-        line_length = len(line) + 1  # +1 for the newline character
-        if current_length + line_length > max_tokens:
-            chunks.append('\n'.join(current_chunk))
-            current_chunk = [line]
-            current_length = line_length
-        else:
-            current_chunk.append(line)
-            current_length += line_length
-    
-    if current_chunk:
-        chunks.append('\n'.join(current_chunk))
-    
-    return chunks
+_encoding = None
+
+def count_tokens(text):
+    """Liczba tokenów według tokenizera modelu (tiktoken) albo ostrożne przybliżenie."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            try:
+                _encoding = tiktoken.encoding_for_model(MODEL)
+            except KeyError:
+                _encoding = tiktoken.get_encoding('o200k_base')
+        except Exception as e:  # Brak pakietu albo brak dostępu do pliku tokenizera
+            print(f"Warning: tiktoken unavailable ({type(e).__name__}), estimating tokens from length")
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+def pack_items(items, input_budget=INPUT_TOKEN_BUDGET, output_budget=OUTPUT_TOKEN_BUDGET,
+               system_prompt=SYSTEM_PROMPT, render=str):
+    """
+    Pakuje elementy (linie albo segmenty) w grupy jak najbliżej budżetu tokenów zapytania.
+    Limit grupy to mniejszy z: budżet wejścia minus prompt, budżet odpowiedzi / OUTPUT_RATIO.
+    Element nigdy nie jest dzielony - zbyt długi trafia do osobnej grupy.
+    """
+    limit = min(input_budget - count_tokens(system_prompt), int(output_budget / OUTPUT_RATIO))
+    groups = []
+    current_group = []
+    current_tokens = 0
+
+    for item in items:
+        item_tokens = count_tokens(render(item)) + 1  # +1 for the separator
+        if item_tokens > limit:
+            print(f"Warning: line exceeds the chunk budget ({item_tokens} > {limit} tokens), sending it alone")
+        if current_group and current_tokens + item_tokens > limit:
+            groups.append(current_group)
+            current_group = []
+            current_tokens = 0
+        current_group.append(item)
+        current_tokens += item_tokens
+
+    if current_group:
+        groups.append(current_group)
+
+    return groups
 
-def translate_text(text):
-    client = OpenAI(api_key=OPENAI_API_KEY)
+def pack_chunks(text, input_budget=INPUT_TOKEN_BUDGET, output_budget=OUTPUT_TOKEN_BUDGET):
+    """Pakuje całe linie tekstu w chunki; linia Start: nigdy nie jest dzielona między chunki."""
+    lines = [line for line in text.split('\n') if line.strip()]
+    return ['\n'.join(group) for group in pack_items(lines, input_budget, output_budget)]
+
+def create_client():
+    """Jeden klient (i pula połączeń) na cały przebieg. Ponowienia obsługuje translate_chunks."""
+    return OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+
+def translate_text(text, client=None, max_tokens=OUTPUT_TOKEN_BUDGET):
+    client = client or create_client()
 
     response = client.chat.completions.create(
-        model="gpt-4o",
+        model=MODEL,
         messages=[
             {
                 "role": "system",
-                "content": "Translate the following text to English, keep timestamps and format intact"
+                "content": SYSTEM_PROMPT
             },
             {
                 "role": "user",
@@ -50,13 +122,284 @@ def translate_text(text):
             },
         ],
         temperature=1,
-        max_tokens=4000,
+        max_tokens=max_tokens,
         top_p=1,
         frequency_penalty=0,
         presence_penalty=0
     )
     return response.choices[0].message.content
 
+class RateLimitGate:
+    """
+    Wspólna pauza dla wszystkich wątków: po 429 nikt nie wysyła zapytań do czasu
+    resume_at, zamiast każdy wątek osobno uderzać w limit.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.resume_at = 0.0
+
+    def wait(self):
+        while True:
+            with self.lock:
+                delay = self.resume_at - time.time()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.resume_at = max(self.resume_at, time.time() + seconds)
+
+def retry_delay(error, attempt):
+    """Opóźnienie przed ponowieniem: Retry-After z odpowiedzi albo wykładniczy backoff z jitterem."""
+    response = getattr(error, 'response', None)
+    if response is not None:
+        retry_after = response.headers.get('retry-after')
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), MAX_BACKOFF)
+        except ValueError:
+            pass
+    return min(BASE_BACKOFF * 2 ** attempt, MAX_BACKOFF) * random.uniform(0.5, 1.0)
+
+def call_with_backoff(request, gate, label=""):
+    """Wywołuje request() ponawiając po 429, błędach połączenia i 5xx."""
+    for attempt in range(MAX_RETRIES + 1):
+        gate.wait()
+        try:
+            return request()
+        except (RateLimitError, APIConnectionError, APIStatusError) as e:
+            retryable = isinstance(e, (RateLimitError, APIConnectionError)) or e.status_code >= 500
+            if not retryable or attempt == MAX_RETRIES:
+                raise
+            delay = retry_delay(e, attempt)
+            if isinstance(e, RateLimitError):
+                gate.pause(delay)  # Limit jest wspólny dla klucza API - wstrzymujemy wszystkie wątki
+            print(f"{label}: {type(e).__name__}, retrying in {delay:.1f}s ({attempt + 1}/{MAX_RETRIES})")
+            time.sleep(delay)
+
+def translate_with_backoff(chunk, client, gate, label="", max_tokens=OUTPUT_TOKEN_BUDGET):
+    return call_with_backoff(lambda: translate_text(chunk, client, max_tokens), gate, label)
+
+def run_chunks(translate_chunk, chunks, concurrency=DEFAULT_CONCURRENCY, on_result=None):
+    """
+    Wywołuje translate_chunk(chunk, label) równolegle (najwyżej concurrency naraz).
+    Wyniki wracają w kolejności chunków, niezależnie od kolejności odpowiedzi.
+    on_result(indeks, wynik) jest wołane w wątku głównym zaraz po ukończeniu chunka.
+    """
+    results = [None] * len(chunks)
+    total_chunks = len(chunks)
+    done = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {
+            executor.submit(translate_chunk, chunk, f"Chunk {i + 1}/{total_chunks}"): i
+            for i, chunk in enumerate(chunks)
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            if on_result:
+                on_result(futures[future], results[futures[future]])
+            done += 1
+            print(f"Translating chunk {done}/{total_chunks}...", flush=True)
+
+    return results
+
+def translate_chunks(chunks, client=None, concurrency=DEFAULT_CONCURRENCY, max_tokens=OUTPUT_TOKEN_BUDGET):
+    """Tłumaczy chunki tekstu równolegle jednym klientem, z zachowaniem kolejności."""
+    client = client or create_client()
+    gate = RateLimitGate()
+    return run_chunks(lambda chunk, label: translate_with_backoff(chunk, client, gate, label, max_tokens),
+                      chunks, concurrency)
+
+def request_json_translation(segments, client, max_tokens=OUTPUT_TOKEN_BUDGET):
+    response = client.chat.completions.create(
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": JSON_SYSTEM_PROMPT},
+            {"role": "user", "content": json.dumps({"segments": segments}, ensure_ascii=False)},
+        ],
+        response_format={"type": "json_object"},
+        temperature=1,
+        max_tokens=max_tokens,
+        top_p=1
+    )
+    return response.choices[0].message.content
+
+def parse_json_translation(reply, expected_ids):
+    """Zwraca {id: tłumaczenie} tylko dla poprawnych segmentów o oczekiwanych id."""
+    try:
+        data = json.loads(reply or '')
+    except ValueError:
+        return {}
+    items = data.get('segments') if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return {}
+
+    translations = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        segment_id, text = item.get('id'), item.get('text')
+        if isinstance(segment_id, str) and segment_id.isdigit():
+            segment_id = int(segment_id)
+        # Id z odpowiedzi modelu może być listą albo słownikiem (niehaszowalne) - tylko int, bez bool
+        if not isinstance(segment_id, int) or isinstance(segment_id, bool):
+            continue
+        if segment_id in expected_ids and segment_id not in translations and isinstance(text, str) and text.strip():
+            translations[segment_id] = text.strip()
+    return translations
+
+def translate_segments_json(segments, client, gate, label="", max_tokens=OUTPUT_TOKEN_BUDGET):
+    """
+    Tłumaczy listę segmentów {id, text}. Segmenty brakujące albo niepoprawne
+    w odpowiedzi są wysyłane ponownie same (do MAX_SEGMENT_RETRIES razy).
+    """
+    translations = {}
+    remaining = segments
+    for attempt in range(MAX_SEGMENT_RETRIES + 1):
+        reply = call_with_backoff(lambda: request_json_translation(remaining, client, max_tokens), gate, label)
+        translations.update(parse_json_translation(reply, {segment['id'] for segment in remaining}))
+        remaining = [segment for segment in remaining if segment['id'] not in translations]
+        if not remaining:
+            break
+        if attempt < MAX_SEGMENT_RETRIES:
+            print(f"{label}: {len(remaining)} segments missing or invalid, re-requesting only those")
+    return translations
+
+def timestamp_key(start, end):
+    return (round(float(start), 2), round(float(end), 2))
+
+class StreamingWriter:
+    """
+    Zapisuje przetłumaczone linie do pliku wyjściowego na bieżąco, zawsze w kolejności:
+    linia trafia do pliku, gdy wszystkie wcześniejsze są już gotowe. Dopóki istnieje
+    plik <wyjście>.partial, generate.py --follow wie, że tłumaczenie jeszcze trwa.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.marker = Path(f"{path}{PARTIAL_SUFFIX}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.marker.write_text('running', encoding='utf-8')
+        self.file = open(self.path, 'w', encoding='utf-8')
+        self.written = 0
+
+    def update(self, output):
+        start = self.written
+        while self.written < len(output) and output[self.written] is not None:
+            self.file.write(output[self.written] + '\n')
+            self.written += 1
+        if self.written > start:
+            self.file.flush()
+
+    def close(self, failed=False):
+        self.file.close()
+        if failed:
+            self.marker.write_text('failed', encoding='utf-8')
+        else:
+            self.marker.unlink()
+
+def translate_with_memory(content, memory=None, concurrency=DEFAULT_CONCURRENCY,
+                          input_budget=INPUT_TOKEN_BUDGET, output_budget=OUTPUT_TOKEN_BUDGET, json_mode=False,
+                          writer=None):
+    """
+    Najpierw szuka każdej linii Sentence: w pamięci tłumaczeń (jeśli podana), do API wysyła
+    tylko brakujące zdania (każde unikalne raz). Nowe tłumaczenia trafiają do pamięci.
+    Linie, których nie ma w odpowiedzi modelu, są wysyłane ponownie same (do MAX_SEGMENT_RETRIES
+    razy); jeśli nadal ich brak, rzuca RuntimeError zamiast zostawić w wyniku polski tekst.
+    json_mode - zdania idą jako segmenty JSON z walidacją i ponawianiem pojedynczych segmentów.
+    writer - StreamingWriter, który dostaje gotowe linie zaraz po przetłumaczeniu ich chunka.
+    """
+    prompt_version = JSON_PROMPT_VERSION if json_mode else PROMPT_VERSION
+    lines = [line.strip() for line in content.split('\n') if line.strip()]
+    output = [None] * len(lines)
+    pending = {}  # znormalizowane zdanie -> indeksy linii, które go używają
+    hits = 0
+
+    for i, line in enumerate(lines):
+        match = LINE_PATTERN.match(line)
+        if not match:
+            output[i] = line
+            continue
+        cached = memory.lookup(match.group(3), MODEL, prompt_version) if memory else None
+        if cached is not None:
+            output[i] = f"Start: {match.group(1)}, End: {match.group(2)}, Sentence: {cached}"
+            hits += 1
+        else:
+            pending.setdefault(normalize_sentence(match.group(3)), []).append(i)
+
+    if memory:
+        misses = sum(len(indexes) for indexes in pending.values())
+        print(f"Translation memory: {hits} sentences reused, {misses} to translate ({len(pending)} unique)")
+    if writer:
+        writer.update(output)
+
+    if pending:
+        pending_indexes = list(pending.values())
+        sources = [LINE_PATTERN.match(lines[indexes[0]]) for indexes in pending_indexes]
+        new_entries = []
+        untranslated = []
+
+        def apply_translation(k, translation):
+            source = sources[k]
+            if translation is None:
+                untranslated.append(source.group(0))
+                return
+            new_entries.append((source.group(3), translation))
+            for i in pending_indexes[k]:
+                match = LINE_PATTERN.match(lines[i])
+                output[i] = f"Start: {match.group(1)}, End: {match.group(2)}, Sentence: {translation}"
+
+        client = create_client()
+        gate = RateLimitGate()
+        if json_mode:
+            groups = pack_items(range(len(sources)), input_budget, output_budget, JSON_SYSTEM_PROMPT,
+                                render=lambda k: json.dumps({'id': k, 'text': sources[k].group(3)}, ensure_ascii=False))
+
+            def translate_group(group, label):
+                segments = [{'id': k, 'text': sources[k].group(3)} for k in group]
+                translations = translate_segments_json(segments, client, gate, label, output_budget)
+                return [translations.get(k) for k in group]
+        else:
+            groups = pack_items(range(len(sources)), input_budget, output_budget, render=lambda k: sources[k].group(0))
+
+            def translate_group(group, label):
+                keys = {k: timestamp_key(sources[k].group(1), sources[k].group(2)) for k in group}
+                translated = {}
+                remaining = list(group)
+                for attempt in range(MAX_SEGMENT_RETRIES + 1):
+                    chunk = '\n'.join(sources[k].group(0) for k in remaining)
+                    for line in translate_with_backoff(chunk, client, gate, label, output_budget).split('\n'):
+                        match = LINE_PATTERN.match(line.strip())
+                        if match and match.group(3).strip():
+                            translated[timestamp_key(match.group(1), match.group(2))] = match.group(3).strip()
+                    remaining = [k for k in remaining if keys[k] not in translated]
+                    if not remaining:
+                        break
+                    if attempt < MAX_SEGMENT_RETRIES:
+                        print(f"{label}: {len(remaining)} lines missing in the reply, re-requesting only those")
+                return [translated.get(keys[k]) for k in group]
+
+        def on_group_done(group_index, translations):
+            for k, translation in zip(groups[group_index], translations):
+                apply_translation(k, translation)
+            if writer:
+                writer.update(output)
+
+        try:
+            run_chunks(translate_group, groups, concurrency, on_group_done)
+        finally:
+            # Udane tłumaczenia zostają w pamięci także wtedy, gdy część linii się nie powiodła
+            if memory:
+                memory.store_many(new_entries, MODEL, prompt_version)
+        if untranslated:
+            raise RuntimeError(f"No translation returned for {len(untranslated)} lines after "
+                               f"{MAX_SEGMENT_RETRIES} retries, first: {untranslated[0]}")
+
+    return '\n'.join(output)
+
 from pathlib import Path
 
 def save_translated_text(file_path, content):
@@ -70,24 +413,54 @@ def main():
     parser = argparse.ArgumentParser(description="Translate a text file to English using OpenAI's API.")
     parser.add_argument("input_file", help="Path to the input file")
     parser.add_argument("output_file", help="Path to the output file")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Number of chunks translated at the same time (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--use-memory", action="store_true",
+                        help="Reuse and store translations in the translation memory (off by default)")
+    parser.add_argument("--memory", help="Translation memory database path (implies --use-memory)")
+    parser.add_argument("--json-segments", action="store_true",
+                        help="Send sentences as validated JSON segments and re-request only the failing ones")
+    parser.add_argument("--input-tokens", type=int, default=INPUT_TOKEN_BUDGET,
+                        help=f"Token budget for the text sent in one request (default: {INPUT_TOKEN_BUDGET})")
+    parser.add_argument("--output-tokens", type=int, default=OUTPUT_TOKEN_BUDGET,
+                        help=f"max_tokens for one response (default: {OUTPUT_TOKEN_BUDGET})")
+    parser.add_argument("--stream", action="store_true",
+                        help="Write translated lines to the output file as soon as they are ready "
+                             "(for generate.py --follow)")
     args = parser.parse_args()
 
     # Read content from the file
     content = read_file(args.input_file)
 
-    # Split content into manageable chunks
-    chunks = split_text(content)
+    use_memory = args.use_memory or args.memory is not None
+    if not use_memory and not args.json_segments and not args.stream:
+        # Pack whole lines into chunks close to the token budget
+        chunks = pack_chunks(content, args.input_tokens, args.output_tokens)
+        print(f"Packed {len(chunks)} chunks (budget: {args.input_tokens} input / {args.output_tokens} output tokens)")
 
-     # Translate each chunk and display progress
-    translated_chunks = []
-    total_chunks = len(chunks)
-    for i, chunk in enumerate(chunks, start=1):
-        print(f"Translating chunk {i}/{total_chunks}...")
-        translated_chunk = translate_text(chunk)
-        translated_chunks.append(translated_chunk)
+        # Translate chunks concurrently and display progress
+        translated_chunks = translate_chunks(chunks, concurrency=args.concurrency, max_tokens=args.output_tokens)
 
-          # Combine the results
-    translated_content = '\n'.join(translated_chunks)
+        # Combine the results
+        translated_content = '\n'.join(translated_chunks)
+    else:
+        memory = TranslationMemory(args.memory) if use_memory else None
+        writer = StreamingWriter(args.output_file) if args.stream else None
+        try:
+            translated_content = translate_with_memory(content, memory, args.concurrency,
+                                                       args.input_tokens, args.output_tokens, args.json_segments,
+                                                       writer)
+        except BaseException:
+            if writer:
+                writer.close(failed=True)
+            raise
+        finally:
+            if memory:
+                memory.close()
+        if writer:
+            writer.close()
+            print(f"Translation completed. Output streamed to {args.output_file}")
+            return
 
     # Save the translated content to a new file
     save_translated_text(args.output_file, translated_content)
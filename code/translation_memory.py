@@ -0,0 +1,88 @@
+import argparse
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from pathlib import Path
+
+# Pamięć tłumaczeń: zdania powtarzające się między wykładami ("Sprawdzenie lewej strony",
+# standardowe zwroty z wyprowadzeń) tłumaczymy raz, potem bierzemy z bazy SQLite.
+# Klucz: znormalizowane zdanie źródłowe + model + wersja promptu - zmiana promptu
+# albo modelu nie miesza starych tłumaczeń z nowymi.
+DEFAULT_MEMORY_PATH = Path.home() / '.cache' / 'video_translation' / 'translation_memory.sqlite'
+
+def log(message):
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+def normalize_sentence(sentence):
+    """Ujednolica zapis zdania: Unicode NFC, bez różnic w wielkości liter i białych znakach."""
+    sentence = unicodedata.normalize('NFC', sentence)
+    return re.sub(r'\s+', ' ', sentence).strip().casefold()
+
+class TranslationMemory:
+    def __init__(self, path=None):
+        self.path = Path(path or os.getenv('TRANSLATION_MEMORY_PATH') or DEFAULT_MEMORY_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.path))
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS translations (
+                source_key TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                source TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                created REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (source_key, model, prompt_version)
+            )
+        ''')
+        self.connection.commit()
+
+    def lookup(self, source, model, prompt_version):
+        """Zwraca zapamiętane tłumaczenie zdania albo None."""
+        key = normalize_sentence(source)
+        row = self.connection.execute(
+            'SELECT translation FROM translations WHERE source_key = ? AND model = ? AND prompt_version = ?',
+            (key, model, prompt_version)
+        ).fetchone()
+        if row is None:
+            return None
+        self.connection.execute(
+            'UPDATE translations SET hits = hits + 1 WHERE source_key = ? AND model = ? AND prompt_version = ?',
+            (key, model, prompt_version)
+        )
+        return row[0]
+
+    def store_many(self, pairs, model, prompt_version):
+        """Zapisuje pary (zdanie źródłowe, tłumaczenie) w jednej transakcji."""
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO translations (source_key, model, prompt_version, source, translation, created) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(normalize_sentence(source), model, prompt_version, source, translation, now)
+                 for source, translation in pairs]
+            )
+
+    def stats(self):
+        entries, hits = self.connection.execute('SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM translations').fetchone()
+        return {'entries': entries, 'hits': hits}
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the translation memory.")
+    parser.add_argument("command", choices=["stats"], help="stats - number of stored sentences and reuse count")
+    parser.add_argument("--memory", help=f"Database path (default: {DEFAULT_MEMORY_PATH})")
+    args = parser.parse_args()
+
+    memory = TranslationMemory(args.memory)
+    stats = memory.stats()
+    log(f"{memory.path}: {stats['entries']} sentences, reused {stats['hits']} times")
+    memory.close()
+
+if __name__ == "__main__":
+    main()
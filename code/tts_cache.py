@@ -0,0 +1,125 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+# Cache syntezy mowy adresowany treścią: klucz to hash tekstu zdania + głosu, modelu
+# i ustawień głosu. Po poprawieniu jednego zdania w pliku _en generate.py syntezuje
+# tylko to zdanie, a resztę output_audio_{i}.mp3 bierze z cache (kopia pliku).
+# Najdawniej używane wpisy są usuwane po przekroczeniu limitu.
+DEFAULT_CACHE_DIR = Path.home() / '.cache' / 'video_translation' / 'tts'
+DEFAULT_MAX_MB = 1000
+
+def log(message):
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}\n", end='', flush=True)
+
+def _copy_atomic(source, destination):
+    """
+    Umieszcza kopię source pod destination atomowo (plik tymczasowy + rename).
+    Celowo kopia, nie hardlink: wspólny i-węzeł z output_audio_{i}.mp3 oznaczałby,
+    że każdy zapis w miejscu do pliku wyjściowego nadpisuje też wpis w cache.
+    """
+    tmp_path = Path(f"{destination}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, destination)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+class TTSCache:
+    """Przechowuje wygenerowane pliki mp3 jako <klucz>.mp3."""
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = Path(cache_dir or os.getenv('TTS_CACHE_DIR') or DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv('TTS_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, voice_id, payload):
+        """Liczy klucz z głosu i treści zapytania TTS (text, model_id, voice_settings)."""
+        params = {
+            'voice_id': voice_id,
+            'text': payload['text'],
+            'model_id': payload.get('model_id'),
+            'voice_settings': payload.get('voice_settings')
+        }
+        return hashlib.sha256(json.dumps(params, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return self.cache_dir / f"{key}.mp3"
+
+    def fetch(self, key, output_path):
+        """Umieszcza zapamiętane audio pod output_path. Zwraca False, jeśli wpisu nie ma."""
+        path = self._entry_path(key)
+        try:
+            _copy_atomic(path, output_path)
+            os.utime(path)  # mtime = czas ostatniego użycia
+        except OSError:
+            with self.lock:
+                self.misses += 1
+            return False
+        with self.lock:
+            self.hits += 1
+        return True
+
+    def put(self, key, audio_path):
+        """Zapamiętuje wygenerowany plik i usuwa nadmiarowe stare wpisy."""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            _copy_atomic(audio_path, self._entry_path(key))
+        except OSError as e:
+            log(f"Warning: could not write TTS cache entry: {e}")
+            return
+        self.evict()
+
+    def evict(self):
+        """Usuwa najdawniej używane wpisy, aż łączny rozmiar zmieści się w limicie."""
+        with self.lock:
+            entries = []
+            for path in self.cache_dir.glob('*.mp3'):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                    total -= size
+                    log(f"Evicted TTS cache entry: {path.name}")
+                except OSError:
+                    pass
+
+    def stats(self):
+        sizes = [path.stat().st_size for path in self.cache_dir.glob('*.mp3')] if self.cache_dir.exists() else []
+        return {'entries': len(sizes), 'bytes': sum(sizes)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or trim the TTS audio cache.")
+    parser.add_argument("command", choices=["stats", "evict"],
+                        help="stats - number and size of cached files, evict - apply the size limit now")
+    parser.add_argument("--cache-dir", help=f"Cache directory (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--max-mb", type=float, help=f"Size limit in MB (default: {DEFAULT_MAX_MB})")
+    args = parser.parse_args()
+
+    cache = TTSCache(args.cache_dir, int(args.max_mb * 1024 * 1024) if args.max_mb is not None else None)
+    if args.command == "evict" and cache.cache_dir.exists():
+        cache.evict()
+    stats = cache.stats()
+    log(f"{cache.cache_dir}: {stats['entries']} files, {stats['bytes'] / 1024 / 1024:.1f} MB "
+        f"(limit {cache.max_bytes / 1024 / 1024:.0f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,9 @@ def safe_import(module_name):
 ffmpeg = safe_import('ffmpeg')
 whisper = safe_import('whisper')
 
+import transcription_worker
+from transcription_profiles import PROFILES, get_profile
+
 def extract_audio(video_path, audio_path):
     log(f"Starting audio extraction from {video_path}")
     if not os.path.exists(video_path):
@@ -35,13 +38,21 @@ def extract_audio(video_path, audio_path):
         log(f"Error occurred during audio extraction: {e.stderr.decode('utf-8')}")
         return False
 
-def transcribe_audio_with_whisper(audio_path):
-    log("Loading Whisper model (this may take a moment)...")
-    model = whisper.load_model("base")  # Changed to "base" for faster loading
-    log("Whisper model loaded successfully")
+def transcribe_audio_with_whisper(audio_path, model_size="base", use_worker=False, options=None):
+    if use_worker:
+        log(f"Submitting {audio_path} to transcription worker (model: {model_size})")
+        result = transcription_worker.submit_transcription(
+            audio_path, model_size, options or {},
+            lambda percent: log(f"Transcribing... {percent:.0f}%"))
+        if result is not None:
+            log("Transcription completed successfully")
+            return result
+        log("Transcription worker unavailable - falling back to in-process model")
+
+    model = transcription_worker.load_model(model_size)  # "base" by default for faster loading
     
     log(f"Starting transcription of {audio_path}")
-    result = model.transcribe(audio_path)
+    result = model.transcribe(audio_path, **(options or {}))
     log("Transcription completed successfully")
     return result
 
@@ -64,8 +75,11 @@ def save_sentences_to_file(sentences, output_filename):
             f.write(f"Start: {sentence['start']:.2f}, End: {sentence['end']:.2f}, Sentence: {sentence['sentence']}\n")
     log("Sentences saved successfully")
 
-def process_video(input_path):
+def process_video(input_path, model_size=None, use_worker=False, profile=None):
     log(f"Starting processing of video: {input_path}")
+    # Bez profilu jak dotąd: model base i domyślne opcje Whisper (wykrywanie języka, fallback temperatur)
+    profile_model, options = get_profile(profile) if profile else ("base", None)
+    model_size = model_size or profile_model
     
     try:
         # Create subfolders
@@ -84,7 +98,7 @@ def process_video(input_path):
 
         # Process video
         if extract_audio(input_path, audio_path):
-            transcription_result = transcribe_audio_with_whisper(audio_path)
+            transcription_result = transcribe_audio_with_whisper(audio_path, model_size, use_worker, options)
             
             log(f"Saving transcription to {transcription_path}")
             with open(transcription_path, "w", encoding='utf-8') as f:
@@ -109,6 +123,11 @@ def process_video(input_path):
 def main():
     parser = argparse.ArgumentParser(description="Process video files for transcription.")
     parser.add_argument("input_path", help="Path to the video file or directory containing video files")
+    parser.add_argument("--profile", default=None, choices=list(PROFILES),
+                        help="Speed/quality profile (default: none - model base with Whisper's default decoding)")
+    parser.add_argument("--model", default=None, help="Whisper model size (default: from the profile, otherwise base)")
+    parser.add_argument("--worker", action="store_true",
+                        help="Use resident transcription worker (keeps the model loaded between runs)")
     args = parser.parse_args()
 
     log("Starting video transcription CLI")
@@ -116,14 +135,14 @@ def main():
 
     try:
         if os.path.isfile(args.input_path):
-            process_video(args.input_path)
+            process_video(args.input_path, args.model, args.worker, args.profile)
         elif os.path.isdir(args.input_path):
             log(f"Processing directory: {args.input_path}")
             for root, _, files in os.walk(args.input_path):
                 for file in files:
                     if file.lower().endswith(('.mp4', '.avi', '.mov', '.mkv')):
                         video_path = os.path.join(root, file)
-                        process_video(video_path)
+                        process_video(video_path, args.model, args.worker, args.profile)
         else:
             log(f"Error: Invalid input path: {args.input_path}")
     except Exception as e:
@@ -72,6 +72,8 @@ class VideoTranslationApp:
         self.youtube_url = tk.StringVar()
         self.video_path = tk.StringVar()
         self.current_step = tk.StringVar(value="Gotowy do rozpoczęcia")
+        # Silnik transkrypcji w Kroku 1: "api" (OpenAI) lub "local" (Whisper w workerze)
+        self.transcription_engine = tk.StringVar(value=self.config.get('transcription_engine', 'api'))
         
         # Zmienne dla kluczy API
         self.openai_api_key = tk.StringVar(value=os.getenv('OPENAI_API_KEY', ''))
@@ -190,6 +192,7 @@ class VideoTranslationApp:
         """Zapisuje konfigurację do pliku"""
         try:
             self.config['working_dir'] = self.working_dir.get()
+            self.config['transcription_engine'] = self.transcription_engine.get()
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 json.dump(self.config, f, indent=2, ensure_ascii=False)
         except Exception as e:
@@ -446,7 +449,7 @@ FACEBOOK_ACCESS_TOKEN={self.facebook_access_token.get()}
         step_descriptions = {
             'translate': "1. 🌐 Tłumaczenie na angielski",
             'generate': "2. 🎵 Generowanie audio",
-            'overlay': "3. 🎬 Nakładanie audio na wideo (STABILNIE)",
+            'overlay': "3. 🎬 Nakładanie audio na wideo (SZYBKO)",
             'delete_sm': "4. 🔇 Usuwanie ciszy i bezruchu (STABILNIE)",
             'white_logo': "5. 🖼️ Usuń białą stopkę i dodaj logo",
             'detect_polish': "6. 🔍 Wykrywanie polskiego tekstu",
@@ -536,6 +539,15 @@ FACEBOOK_ACCESS_TOKEN={self.facebook_access_token.get()}
         ttk.Button(file_select_frame, text="🎬 Transkrybuj plik", 
                   command=lambda: self.run_step1("file"), style='Accent.TButton').pack(side=tk.LEFT)
         
+        # Silnik transkrypcji
+        engine_frame = ttk.LabelFrame(self.step1_tab, text="⚙️ Silnik transkrypcji", padding="15")
+        engine_frame.pack(fill=tk.X, pady=(0, 20))
+        
+        ttk.Radiobutton(engine_frame, text="OpenAI API", variable=self.transcription_engine, value="api",
+                       command=self.save_config).pack(side=tk.LEFT, padx=(0, 20))
+        ttk.Radiobutton(engine_frame, text="Lokalny Whisper (model trzymany w pamięci)", variable=self.transcription_engine,
+                       value="local", command=self.save_config).pack(side=tk.LEFT)
+        
     def setup_extra_tab(self):
         """Konfiguruje zakładkę Dodatkowe funkcje"""
         # Cofnij usunięcie luki
@@ -1182,7 +1194,7 @@ FACEBOOK_ACCESS_TOKEN={self.facebook_access_token.get()}
         all_steps = {
             'translate': ("Tłumaczenie na angielski", self.run_translate_for_combo),
             'generate': ("Generowanie audio", self.run_generate_for_combo),
-            'overlay': ("Nakładanie audio na wideo (STABILNIE)", self.run_overlay_for_combo),
+            'overlay': ("Nakładanie audio na wideo (SZYBKO)", self.run_overlay_for_combo),
             'delete_sm': ("Usuwanie ciszy i bezruchu (STABILNIE)", self.run_delete_sm_for_combo),
             'white_logo': ("Usuń białą stopkę i dodaj logo", self.run_white_logo_for_combo),
             'detect_polish': ("Wykrywanie polskiego tekstu", self.run_detect_polish_for_combo),
@@ -1190,10 +1202,16 @@ FACEBOOK_ACCESS_TOKEN={self.facebook_access_token.get()}
             'social_media': ("Generowanie posta social media", self.run_social_media_for_combo)
         }
         
+        # Tłumaczenie i generowanie audio razem: generate.py czyta plik _en na bieżąco,
+        # więc oba kroki trwają tyle, co wolniejszy z nich, a nie sumę czasów
+        if self.combo_steps_enabled['translate'].get() and self.combo_steps_enabled['generate'].get():
+            all_steps['translate'] = ("Tłumaczenie + generowanie audio (potokowo)", self.run_translate_generate_for_combo)
+            enabled_steps = [key for key in enabled_steps if key != 'generate']
+        
         # Buduj listę kroków do wykonania na podstawie checkboxów
         self.combo_steps = []
         for step_key in ['translate', 'generate', 'overlay', 'delete_sm', 'white_logo', 'detect_polish', 'intro_outro', 'social_media']:
-            if self.combo_steps_enabled[step_key].get():
+            if step_key in enabled_steps:
                 self.combo_steps.append(all_steps[step_key])
         
         self.current_combo_step = 0
@@ -1389,13 +1407,94 @@ FACEBOOK_ACCESS_TOKEN={self.facebook_access_token.get()}
             self.combo_failed = True
             self.root.after(0, self.execute_next_combo_step)
         
+    def run_translate_generate_for_combo(self):
+        """Uruchamia translate.py --stream i generate.py --follow równolegle dla przepływu KOMBO"""
+        thread = threading.Thread(target=self._run_translate_generate_combo_thread, daemon=False)
+        thread.start()
+        
+    def _run_translate_generate_combo_thread(self):
+        """Thread dla potokowego tłumaczenia i generowania audio w przepływie KOMBO"""
+        try:
+            working_dir = Path(self.working_dir.get()) if self.working_dir.get() else Path.cwd()
+            
+            # Znajdź plik _sentences.txt
+            sentences_files = list(working_dir.rglob("*_sentences.txt"))
+            if not sentences_files:
+                raise Exception("Nie znaleziono pliku *_sentences.txt")
+                
+            sentences_file = sentences_files[0]
+            output_file = sentences_file.with_name(sentences_file.stem.replace("_sentences", "_en") + ".txt")
+            
+            # Znajdź oryginalny plik wideo
+            video_extensions = ['.mp4', '.avi', '.mov', '.mkv']
+            video_files = []
+            for ext in video_extensions:
+                video_files.extend(working_dir.rglob(f"*{ext}"))
+            
+            if not video_files:
+                raise Exception("Nie znaleziono pliku wideo")
+                
+            video_file = video_files[0]
+            
+            # Stary plik _en nie może trafić do generate.py - znacznik .partial zakładamy
+            # przed startem obu procesów, żeby generate.py czekał na nowe linie
+            if output_file.exists():
+                output_file.unlink()
+            Path(f"{output_file}.partial").write_text('running', encoding='utf-8')
+            
+            python_exe = Path(__file__).parent.parent / "myenv" / "Scripts" / "python.exe"
+            translate_script = Path(__file__).parent / "translate.py"
+            generate_script = Path(__file__).parent / "generate.py"
+            
+            translate_process = subprocess.Popen([
+                str(python_exe), str(translate_script), str(sentences_file), str(output_file), "--stream"
+            ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, cwd=working_dir)
+            generate_process = subprocess.Popen([
+                str(python_exe), str(generate_script), str(output_file), str(video_file), "--follow"
+            ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, cwd=working_dir)
+            
+            # Potoki generate.py opróżnia osobny wątek, a tutaj czekamy na tłumaczenie
+            generate_result = {}
+            reader = threading.Thread(
+                target=lambda: generate_result.update(zip(('stdout', 'stderr'), generate_process.communicate()))
+            )
+            reader.start()
+            translate_stdout, translate_stderr = translate_process.communicate()
+            
+            if translate_process.returncode != 0:
+                # Przy twardym błędzie (np. brak pliku) znacznik mógł zostać "running" -
+                # "failed" zatrzymuje generate.py zamiast czekać na timeout
+                Path(f"{output_file}.partial").write_text('failed', encoding='utf-8')
+                reader.join()
+                error_msg = translate_stderr.strip() if translate_stderr else "Nieznany błąd"
+                raise Exception(f"Błąd translate.py: {error_msg}")
+            reader.join()
+            generate_stdout, generate_stderr = generate_result['stdout'], generate_result['stderr']
+            self.root.after(0, lambda: self.log("[KOMBO] Tłumaczenie zakończone pomyślnie"))
+            
+            if generate_process.returncode != 0:
+                error_msg = generate_stderr.strip() if generate_stderr else "Nieznany błąd"
+                if generate_stdout:
+                    self.root.after(0, lambda: self.log(f"[KOMBO] Stdout: {generate_stdout.strip()}"))
+                raise Exception(f"Błąd generate.py: {error_msg}")
+            
+            self.root.after(0, lambda: self.log("[KOMBO] Generowanie audio zakończone pomyślnie"))
+            if generate_stdout:
+                self.root.after(0, lambda: self.log(f"[KOMBO] Output: {generate_stdout.strip()}"))
+            self.root.after(0, self.finish_current_combo_step)
+                
+        except Exception as e:
+            self.root.after(0, lambda: self.log(f"[KOMBO] Błąd tłumaczenia/generowania audio: {str(e)}"))
+            self.combo_failed = True
+            self.root.after(0, self.execute_next_combo_step)
+        
     def run_overlay_for_combo(self):
-        """Uruchamia overlay_fixed.py dla przepływu KOMBO"""
+        """Uruchamia overlay_fast.py dla przepływu KOMBO"""
         thread = threading.Thread(target=self._run_overlay_combo_thread, daemon=False)
         thread.start()
         
     def _run_overlay_combo_thread(self):
-        """Thread dla overlay_fixed w przepływie KOMBO"""
+        """Thread dla overlay_fast w przepływie KOMBO"""
         try:
             working_dir = Path(self.working_dir.get()) if self.working_dir.get() else Path.cwd()
             
@@ -1418,7 +1517,9 @@ FACEBOOK_ACCESS_TOKEN={self.facebook_access_token.get()}
             video_file = video_files[0]
             
             python_exe = Path(__file__).parent.parent / "myenv" / "Scripts" / "python.exe"
-            overlay_script = Path(__file__).parent / "overlay_fixed.py"
+            # overlay_fast: te same przesunięcia zdań co overlay_fixed (bez nakładania się nagrań),
+            # ale wideo jest kopiowane (-c:v copy) zamiast rekodowania libx264 przez MoviePy
+            overlay_script = Path(__file__).parent / "overlay_fast.py"
             
             result = subprocess.run([
                 str(python_exe), str(overlay_script), str(en_file), str(video_file)
@@ -1431,10 +1532,10 @@ FACEBOOK_ACCESS_TOKEN={self.facebook_access_token.get()}
                 self.root.after(0, self.finish_current_combo_step)
             else:
                 error_msg = result.stderr.strip() if result.stderr else "Nieznany błąd"
-                self.root.after(0, lambda: self.log(f"[KOMBO] Błąd overlay_fixed.py: {error_msg}"))
+                self.root.after(0, lambda: self.log(f"[KOMBO] Błąd overlay_fast.py: {error_msg}"))
                 if result.stdout:
                     self.root.after(0, lambda: self.log(f"[KOMBO] Stdout: {result.stdout.strip()}"))
-                raise Exception(f"Błąd overlay_fixed.py: {error_msg}")
+                raise Exception(f"Błąd overlay_fast.py: {error_msg}")
                 
         except Exception as e:
             self.root.after(0, lambda: self.log(f"[KOMBO] Błąd nakładania audio: {str(e)}"))
@@ -2186,8 +2287,13 @@ FACEBOOK_ACCESS_TOKEN={self.facebook_access_token.get()}
     def run_transcription(self, video_path):
         """Uruchamia transkrypcję pliku wideo"""
         self.log(f"Rozpoczynam transkrypcję pliku: {video_path}")
-        self.run_script("transcribe_api.py", [video_path], "Transkrypcja", 
-                       lambda: self.on_transcription_complete(video_path), "step1")
+        if self.transcription_engine.get() == "local":
+            # Lokalny Whisper przez worker - model ładowany tylko przy pierwszym zleceniu
+            self.run_script("transcribe_improved.py", [video_path, "--worker"], "Transkrypcja",
+                           lambda: self.on_transcription_complete(video_path), "step1")
+        else:
+            self.run_script("transcribe_api.py", [video_path], "Transkrypcja", 
+                           lambda: self.on_transcription_complete(video_path), "step1")
         
     def on_transcription_complete(self, video_path):
         """Wywoływane po zakończeniu transkrypcji"""
@@ -2200,7 +2306,8 @@ FACEBOOK_ACCESS_TOKEN={self.facebook_access_token.get()}
         # Szukaj pliku transkrypcji
         transcription_file = None
         for txt_file in working_dir.rglob(f"{video_name}*.txt"):
-            if "_sentences" in txt_file.name:
+            # transcribe_api.py zapisuje *_sentences.txt, transcribe_improved.py - text/<nazwa>.txt
+            if "_sentences" in txt_file.name or (txt_file.stem == video_name and txt_file.parent.name == "text"):
                 transcription_file = txt_file
                 self.log(f"Znaleziono plik transkrypcji: {transcription_file}")
                 break